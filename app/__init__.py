@@ -1,6 +1,34 @@
-from .ingest import ingest_document_to_qdrant
-from .parser import iterate_page_paragraphs
+from typing import Any
 
-__all__ = ["ingest_document_to_qdrant", "iterate_page_paragraphs"]
+__all__ = [
+    "ingest_document_to_qdrant",
+    "CrawlOptions",
+    "ChunkOptions",
+    "EmbeddingOptions",
+    "StorageOptions",
+    "iterate_page_paragraphs",
+    "aiterate_page_paragraphs",
+]
 
+# Resolved on first access so that `import app.<light module>` does not pull in
+# LangChain, Qdrant and Playwright (PEP 562)
+_LAZY_EXPORTS = {
+    "ingest_document_to_qdrant": ".ingest",
+    "CrawlOptions": ".options",
+    "ChunkOptions": ".options",
+    "EmbeddingOptions": ".options",
+    "StorageOptions": ".options",
+    "iterate_page_paragraphs": ".parser",
+    "aiterate_page_paragraphs": ".parser",
+}
 
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
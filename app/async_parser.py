@@ -0,0 +1,742 @@
+from __future__ import annotations
+
+import asyncio
+import difflib
+import hashlib
+import random
+from typing import AsyncIterator, Callable, List, Optional
+
+from loguru import logger
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, Page, async_playwright
+
+from .page_scripts import (
+    CHANGE_STATE_JS,
+    FINGERPRINT_JS,
+    HIGHLIGHT_JS,
+    NEXT_FRAMES_JS,
+    WAIT_FOR_CHANGE_JS,
+    extraction_call,
+    html_from_result,
+    paragraphs_from_node_texts,
+    paragraphs_from_result,
+    split_container_text,
+)
+from .metrics import StageMetrics, timed
+from .resources import ResourcePolicy, install_resource_policy_async, log_resource_stats
+
+
+# on_end reason of a crawl that stopped because the document has no next page;
+# any other reason (max_pages, "unchanged", a missing page, ...) means the
+# crawl may have missed the end of the document
+END_OF_DOCUMENT = "end_of_document"
+
+_DEFAULT_USER_AGENTS = [
+    (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/124.0.0.0 Safari/537.36"
+    ),
+    (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15"
+    ),
+    (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
+    ),
+]
+
+
+async def aiterate_page_paragraphs(
+    start_url: str,
+    max_pages: Optional[int] = None,
+    next_selector: Optional[str] = None,
+    next_text: Optional[str] = None,
+    headless: bool = True,
+    slow_mo_ms: int = 0,
+    user_agent: Optional[str] = None,
+    navigation_timeout_ms: int = 15000,
+    content_selector: str = None,
+    # Human-like behavior tuning
+    humanize: bool = True,
+    dwell_min_s: float = 0.8,
+    dwell_max_s: float = 2.0,
+    read_scroll_min_steps: int = 2,
+    read_scroll_max_steps: int = 4,
+    read_scroll_pause_min_s: float = 0.2,
+    read_scroll_pause_max_s: float = 0.6,
+    incremental: bool = True,
+    observe_mutations: bool = True,
+    # Event-driven waits: upper bounds, not fixed delays
+    change_timeout_ms: int = 10000,
+    scroll_settle_timeout_ms: int = 1000,
+    resource_policy: Optional[ResourcePolicy] = None,
+    cdp_url: Optional[str] = None,
+    on_page: Optional[Callable[[List[str], str, str], None]] = None,
+    metrics: Optional[StageMetrics] = None,
+    on_end: Optional[Callable[[str], None]] = None,
+) -> AsyncIterator[List[str]]:
+    """Yield paragraphs for each page as they are parsed.
+
+    With incremental=True, content appended to the same DOM (e.g. "show more")
+    is yielded only once: each iteration returns just the new paragraphs.
+    Page changes are detected with a fingerprint scoped to the content
+    container; observe_mutations adds a MutationObserver-based change counter.
+    After a click the crawler waits for navigation or a content change for at
+    most change_timeout_ms, and for the next control to appear after
+    scrolling for at most scroll_settle_timeout_ms, instead of fixed sleeps.
+    With a resource_policy, requests the extractor does not need (images,
+    fonts, trackers, ...) are aborted and counted.
+    With cdp_url, a context is opened in an already running Chromium
+    (see SharedBrowser) instead of launching a new browser.
+    on_page, if given, is called with the paragraphs, their raw HTML and the
+    page URL just before each page is yielded (see PageCache).
+    With metrics, navigation, clicks, dwell, extraction and fingerprinting
+    are timed as stages of that StageMetrics.
+    on_end, if given, is called with the reason the crawl stopped:
+    END_OF_DOCUMENT when there is no next control, otherwise "repeated",
+    "max_pages" or "unchanged".
+
+    Several documents can be crawled concurrently on one event loop.
+    """
+    extract = _extract_new_paragraphs if incremental else _extract_paragraphs
+    async with async_playwright() as pw:
+        browser = await _launch_or_connect(pw, headless=headless, slow_mo_ms=slow_mo_ms, cdp_url=cdp_url)
+
+        viewport = {
+            "width": random.randint(1280, 1920),
+            "height": random.randint(720, 1080),
+        }
+        chosen_ua = user_agent or random.choice(_DEFAULT_USER_AGENTS)
+
+        context = await browser.new_context(
+            user_agent=chosen_ua,
+            locale="ru-RU",
+            timezone_id="Europe/Moscow",
+            viewport=viewport,
+            device_scale_factor=random.choice([1, 1.25, 1.5, 2]),
+            extra_http_headers={
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+                "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
+                "Upgrade-Insecure-Requests": "1",
+                "DNT": "1",
+            },
+        )
+        resource_stats = (
+            await install_resource_policy_async(context, resource_policy, start_url) if resource_policy else None
+        )
+        page = await context.new_page()
+        page.set_default_navigation_timeout(navigation_timeout_ms)
+        page.set_default_timeout(navigation_timeout_ms)
+        logger.info(f"Открываю стартовую страницу: {start_url}")
+        with timed(metrics, "goto"):
+            await page.goto(start_url, wait_until="domcontentloaded")
+
+        if humanize:
+            with timed(metrics, "humanize"):
+                await _human_read_page(
+                    page,
+                    read_steps=random.randint(read_scroll_min_steps, read_scroll_max_steps),
+                    pause_min_s=read_scroll_pause_min_s,
+                    pause_max_s=read_scroll_pause_max_s,
+                )
+                await _human_pause(dwell_min_s, dwell_max_s)
+
+        previous_url: Optional[str] = None
+        previous_fingerprint: Optional[str] = None
+        page_count = 0
+
+        while True:
+            page_count += 1
+            logger.info(f"Текущая страница #{page_count}: {page.url}")
+            with timed(metrics, "extract"):
+                if on_page is None:
+                    current_pars = await extract(page, content_selector)
+                else:
+                    current_pars, page_html = await _extract_paragraphs_with_html(page, content_selector, incremental)
+            if metrics is not None:
+                metrics.inc("pages_crawled")
+                metrics.inc("paragraphs_crawled", len(current_pars))
+            if current_pars:
+                if previous_url is not None and current_pars and not current_pars[0].strip():
+                    current_pars = current_pars[1:]
+                if current_pars:
+                    if on_page is not None:
+                        on_page(current_pars, page_html, page.url)
+                    yield current_pars
+
+            if humanize:
+                with timed(metrics, "humanize"):
+                    await _human_read_page(
+                        page,
+                        read_steps=random.randint(read_scroll_min_steps, read_scroll_max_steps),
+                        pause_min_s=read_scroll_pause_min_s,
+                        pause_max_s=read_scroll_pause_max_s,
+                    )
+                    await _human_pause(dwell_min_s, dwell_max_s)
+
+            with timed(metrics, "fingerprint"):
+                current_fingerprint = await _get_page_fingerprint(page, content_selector, observe_mutations)
+            if previous_url == page.url and previous_fingerprint == current_fingerprint:
+                logger.info("Содержимое страницы не изменилось — завершаю пагинацию.")
+                end_reason = "repeated"
+                break
+            previous_url = page.url
+            previous_fingerprint = current_fingerprint
+            if max_pages and page_count >= max_pages:
+                logger.info("Достигнут предел max_pages — завершаю.")
+                end_reason = "max_pages"
+                break
+
+            # Ensure the bottom area is revealed so the next control becomes available
+            with timed(metrics, "scroll_wait"):
+                try:
+                    await _scroll_to_bottom(page, next_selector, settle_timeout_ms=scroll_settle_timeout_ms)
+                except Exception:
+                    pass
+            next_btn = await _find_next_button(page, selector=next_selector, link_text=next_text)
+            if not next_btn:
+                logger.info("Кнопка/ссылка 'Следующая' не найдена — завершаю.")
+                end_reason = END_OF_DOCUMENT
+                break
+            if humanize:
+                with timed(metrics, "humanize"):
+                    try:
+                        await next_btn.scroll_into_view_if_needed(timeout=2000)
+                    except Exception:
+                        pass
+                    try:
+                        await next_btn.hover(timeout=2000)
+                    except Exception:
+                        pass
+                    await _human_pause(0.3, 0.8)
+            # Debug: highlight the next button in red before clicking
+            try:
+                await next_btn.evaluate(HIGHLIGHT_JS)
+            except Exception:
+                pass
+            with timed(metrics, "click_wait"):
+                outcome = await _click_and_wait_for_change(
+                    page,
+                    next_btn,
+                    content_selector,
+                    next_selector,
+                    navigation_timeout_ms=navigation_timeout_ms,
+                    change_timeout_ms=change_timeout_ms,
+                )
+            if metrics is not None:
+                metrics.inc(f"clicks_{outcome}")
+            if outcome == "navigated":
+                logger.info("Навигация выполнена — открыта следующая страница.")
+            elif outcome == "unchanged":
+                logger.info("Страница не изменилась после клика — завершаю.")
+                end_reason = "unchanged"
+                break
+
+        if on_end is not None:
+            on_end(end_reason)
+        log_resource_stats(resource_stats)
+        await context.close()
+        await browser.close()
+
+
+async def apaginate_until_end(
+    start_url: str,
+    max_pages: Optional[int] = None,
+    next_selector: Optional[str] = None,
+    next_text: Optional[str] = None,
+    headless: bool = False,
+    slow_mo_ms: int = 0,
+    user_agent: Optional[str] = None,
+    navigation_timeout_ms: int = 15000,
+    content_selector: str = ".reader_article_body",
+    merge_cross_page: bool = True,
+    incremental: bool = True,
+    observe_mutations: bool = True,
+    # Event-driven waits: upper bounds, not fixed delays
+    change_timeout_ms: int = 10000,
+    scroll_settle_timeout_ms: int = 1000,
+    resource_policy: Optional[ResourcePolicy] = None,
+    cdp_url: Optional[str] = None,
+) -> List[str]:
+    """Open the start URL and click "Next" until no more new pages load.
+
+    Stops when:
+    - No next button/control is found
+    - A click does not change URL and does not change DOM content
+    - max_pages (if provided) is reached
+
+    With incremental=True, paragraphs appended to the same DOM are read once.
+    With a resource_policy, unneeded requests are aborted and counted.
+    With cdp_url, an already running Chromium is used instead of launching one.
+    """
+    extract = _extract_new_paragraphs if incremental else _extract_paragraphs
+    extracted_paragraphs: list[str] = []
+    async with async_playwright() as playwright:
+        browser = await _launch_or_connect(playwright, headless=headless, slow_mo_ms=slow_mo_ms, cdp_url=cdp_url)
+
+        # Reasonable defaults to resemble a real user
+        context = await browser.new_context(
+            user_agent=(
+                user_agent
+                or (
+                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                    "AppleWebKit/537.36 (KHTML, like Gecko) "
+                    "Chrome/120.0.0.0 Safari/537.36"
+                )
+            ),
+            viewport={"width": 1366, "height": 768},
+            locale="ru-RU",
+        )
+        resource_stats = (
+            await install_resource_policy_async(context, resource_policy, start_url) if resource_policy else None
+        )
+
+        page = await context.new_page()
+        page.set_default_navigation_timeout(navigation_timeout_ms)
+        page.set_default_timeout(navigation_timeout_ms)
+
+        logger.info(f"Открываю стартовую страницу: {start_url}")
+        await page.goto(start_url, wait_until="domcontentloaded")
+
+        page_count = 0
+        previous_url: Optional[str] = None
+        previous_fingerprint: Optional[str] = None
+
+        while True:
+            page_count += 1
+            logger.info(f"Текущая страница #{page_count}: {page.url}")
+
+            # Extract content from the current page before attempting to click next
+            if content_selector:
+                page_paragraphs = await extract(page, content_selector)
+                if page_paragraphs:
+                    # Trim duplicated prefix on the first paragraph of the new page
+                    if extracted_paragraphs:
+                        page_paragraphs[0] = _trim_cross_page_overlap(
+                            extracted_paragraphs[-1], page_paragraphs[0]
+                        )
+                        # If trimming leaves the first paragraph empty, drop it
+                        if not page_paragraphs[0].strip():
+                            page_paragraphs = page_paragraphs[1:]
+
+                    if merge_cross_page and extracted_paragraphs and page_paragraphs:
+                        # Merge continuation across pages when previous paragraph
+                        # did not end with a sentence terminator
+                        if _should_merge_cross_page(
+                            extracted_paragraphs[-1], page_paragraphs[0]
+                        ):
+                            # Handle hyphenated line breaks at page boundary
+                            if extracted_paragraphs[-1].endswith("-"):
+                                extracted_paragraphs[-1] = (
+                                    extracted_paragraphs[-1][:-1] + page_paragraphs[0].lstrip()
+                                )
+                            else:
+                                extracted_paragraphs[-1] = (
+                                    extracted_paragraphs[-1].rstrip() + " " + page_paragraphs[0].lstrip()
+                                )
+                            extracted_paragraphs.extend(page_paragraphs[1:])
+                        else:
+                            extracted_paragraphs.extend(page_paragraphs)
+                    else:
+                        extracted_paragraphs.extend(page_paragraphs)
+
+            # Loop detection using URL and DOM fingerprint
+            current_fingerprint = await _get_page_fingerprint(page, content_selector, observe_mutations)
+            if previous_url == page.url and previous_fingerprint == current_fingerprint:
+                logger.warning("Содержимое страницы не изменилось — завершаю пагинацию.")
+                break
+
+            previous_url = page.url
+            previous_fingerprint = current_fingerprint
+
+            if max_pages and page_count >= max_pages:
+                logger.info("Достигнут предел max_pages — завершаю.")
+                break
+
+            # Ensure the bottom area is revealed so the next control becomes available
+            try:
+                await _scroll_to_bottom(page, next_selector, settle_timeout_ms=scroll_settle_timeout_ms)
+            except Exception:
+                pass
+            next_button = await _find_next_button(page, selector=next_selector, link_text=next_text)
+            if not next_button:
+                logger.info("Кнопка/ссылка 'Следующая' не найдена — завершаю.")
+                break
+
+            # Debug: highlight the next button in red before clicking
+            try:
+                await next_button.evaluate(HIGHLIGHT_JS)
+            except Exception:
+                pass
+            outcome = await _click_and_wait_for_change(
+                page,
+                next_button,
+                content_selector,
+                next_selector,
+                navigation_timeout_ms=navigation_timeout_ms,
+                change_timeout_ms=change_timeout_ms,
+            )
+            if outcome == "navigated":
+                logger.info("Навигация выполнена — открыта следующая страница.")
+            elif outcome == "changed":
+                logger.info("DOM обновился без навигации — продолжаю.")
+            else:
+                logger.info("Страница не изменилась после клика — завершаю.")
+                break
+
+        log_resource_stats(resource_stats)
+        await context.close()
+        await browser.close()
+
+    return extracted_paragraphs
+
+
+def _should_merge_cross_page(prev_par: str, next_par: str) -> bool:
+    """Heuristic to decide whether the first paragraph of the new page
+    should be merged with the last paragraph of the previous page.
+
+    Rules:
+    - If previous ends with a hard sentence terminator, do not merge.
+    - Otherwise, merge (handles mid-paragraph splits and hyphenation).
+    """
+    if not prev_par or not next_par:
+        return False
+
+    sentence_terminators = (".", "!", "?", "…", ":", ";", "\u00BB", ")", "\"")
+    trimmed = prev_par.rstrip()
+    return not trimmed.endswith(sentence_terminators)
+
+
+def _trim_cross_page_overlap(previous_paragraph: str, next_paragraph: str) -> str:
+    """Trim duplicated prefix in next_paragraph if it repeats the suffix of previous_paragraph.
+
+    Uses two strategies:
+    1) Exact suffix/prefix match (fast path)
+    2) Fuzzy match via difflib for near-duplicates (e.g., minor differences)
+    """
+    if not previous_paragraph or not next_paragraph:
+        return next_paragraph
+
+    # Normalize working windows
+    prev_tail = previous_paragraph[-400:]
+    next_head = next_paragraph[:400]
+
+    # 1) Exact match: try longest suffix of prev_tail that is a prefix of next_paragraph
+    max_suffix = min(len(prev_tail), 200)
+    for length in range(max_suffix, 29, -10):  # 200, 190, ..., 30
+        suffix = prev_tail[-length:]
+        if next_paragraph.startswith(suffix):
+            return next_paragraph[length:]
+
+    # 2) Fuzzy match at the very start of next paragraph
+    matcher = difflib.SequenceMatcher(None, prev_tail, next_head)
+    # Use get_matching_blocks for stable tuple shape (a, b, size)
+    best_size = 0
+    best_b = None
+    for block in matcher.get_matching_blocks():
+        a = block.a
+        b = block.b
+        size = block.size
+        # Prefer matches that start at the very beginning of next paragraph
+        if b == 0 and size >= 20:
+            # And that are close to the end of previous
+            if a >= len(prev_tail) - 250:
+                if size > best_size:
+                    best_size = size
+                    best_b = b
+    if best_size >= 20 and best_b == 0:
+        return next_paragraph[best_size:]
+
+    return next_paragraph
+
+
+async def _launch_or_connect(pw, headless: bool, slow_mo_ms: int = 0, cdp_url: Optional[str] = None):
+    """Launch a new Chromium, or attach to a shared one when cdp_url is given.
+
+    Closing a browser obtained via connect_over_cdp only disconnects from it.
+    """
+    if cdp_url:
+        return await pw.chromium.connect_over_cdp(cdp_url, slow_mo=slow_mo_ms or None)
+    return await pw.chromium.launch(headless=headless, slow_mo=slow_mo_ms or None)
+
+
+async def _human_pause(min_seconds: float, max_seconds: float) -> None:
+    try:
+        delay = random.uniform(min_seconds, max_seconds)
+        await asyncio.sleep(delay)
+    except Exception:
+        pass
+
+
+async def _human_read_page(
+    page: Page,
+    read_steps: int = 3,
+    pause_min_s: float = 0.2,
+    pause_max_s: float = 0.6,
+) -> None:
+    """Simulate a human reading: small scroll steps with pauses."""
+    read_steps = max(1, read_steps)
+    for _ in range(read_steps):
+        try:
+            # Random small scroll
+            delta_y = random.randint(200, 600)
+            await page.mouse.wheel(0, delta_y)
+        except Exception:
+            try:
+                await page.evaluate("window.scrollBy(0, Math.floor(200 + Math.random()*400))")
+            except Exception:
+                pass
+        await asyncio.sleep(random.uniform(pause_min_s, pause_max_s))
+
+
+async def _scroll_to_bottom(
+    page: Page,
+    next_selector: Optional[str] = None,
+    settle_timeout_ms: int = 1000,
+) -> None:
+    """Scroll to the bottom to reveal pagination controls located at the footer.
+
+    Instead of a fixed dwell, waits until the next control (if a selector is
+    given) becomes visible, or else for the next rendered frames, at most
+    `settle_timeout_ms`. Best-effort; errors are ignored.
+    """
+    try:
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+    except Exception:
+        try:
+            await page.mouse.wheel(0, 2000)
+        except Exception:
+            pass
+    # Let lazy elements appear
+    try:
+        if next_selector:
+            await page.locator(next_selector).first.wait_for(state="visible", timeout=settle_timeout_ms)
+        else:
+            await page.evaluate(NEXT_FRAMES_JS)
+    except Exception:
+        pass
+
+
+async def _get_full_page_fingerprint(page: Page) -> str:
+    """Hash of the whole serialized DOM; slow on large pages, used as fallback."""
+    # Using page.content() ensures we hash the current DOM, not just the URL
+    content_html = await page.content()
+    return hashlib.sha256(content_html.encode("utf-8")).hexdigest()
+
+
+async def _get_page_fingerprint(
+    page: Page,
+    content_selector: Optional[str] = None,
+    observe_mutations: bool = True,
+) -> str:
+    """Return a stable fingerprint of the current page content.
+
+    Used to detect whether a click resulted in any meaningful change when
+    there is no traditional navigation (common in SPAs).
+
+    With a content selector the fingerprint is scoped to the content container
+    and computed in the browser (see FINGERPRINT_JS); otherwise, or when the
+    container is missing, the whole DOM is hashed.
+    """
+    if content_selector:
+        try:
+            scoped = await page.evaluate(FINGERPRINT_JS, [content_selector, observe_mutations])
+        except Exception:
+            scoped = None
+        if scoped is not None:
+            return f"scoped:{scoped}"
+    return await _get_full_page_fingerprint(page)
+
+
+async def _click_and_wait_for_change(
+    page: Page,
+    next_btn,
+    content_selector: Optional[str],
+    next_selector: Optional[str],
+    navigation_timeout_ms: int = 15000,
+    change_timeout_ms: int = 10000,
+) -> str:
+    """Click the next control and wait for the page to react.
+
+    Waits on the actual condition rather than fixed sleeps: returns
+    "navigated" after a navigation reached domcontentloaded, "changed" when
+    the content changed in place (SPA / "show more"), or "unchanged" if
+    nothing happened within `change_timeout_ms`. A main-frame navigation
+    started by the click keeps the old document alive until the server
+    answers, so it is waited for up to `navigation_timeout_ms` instead.
+    """
+    try:
+        before = await page.evaluate(CHANGE_STATE_JS, [content_selector, next_selector])
+    except Exception:
+        before = None
+
+    navigation_requested = asyncio.Event()
+
+    def _on_request(request) -> None:
+        if request.is_navigation_request() and request.frame == page.main_frame:
+            navigation_requested.set()
+
+    page.on("request", _on_request)
+    try:
+        return await _wait_after_click(
+            page,
+            next_btn,
+            content_selector,
+            next_selector,
+            before,
+            navigation_requested,
+            navigation_timeout_ms,
+            change_timeout_ms,
+        )
+    finally:
+        page.remove_listener("request", _on_request)
+
+
+async def _wait_after_click(
+    page: Page,
+    next_btn,
+    content_selector: Optional[str],
+    next_selector: Optional[str],
+    before: Optional[dict],
+    navigation_requested: asyncio.Event,
+    navigation_timeout_ms: int,
+    change_timeout_ms: int,
+) -> str:
+    loop = asyncio.get_running_loop()
+    try:
+        await next_btn.click()
+    except PlaywrightTimeoutError:
+        return "unchanged"
+    clicked_at = loop.time()
+
+    if before is None:
+        # Cannot observe the page; fall back to waiting for navigation
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=navigation_timeout_ms)
+        except PlaywrightTimeoutError:
+            pass
+        return "changed"
+
+    try:
+        await page.wait_for_function(
+            WAIT_FOR_CHANGE_JS,
+            arg=[content_selector, next_selector, before],
+            timeout=change_timeout_ms,
+        )
+    except PlaywrightTimeoutError:
+        if page.url == before["href"]:
+            if not navigation_requested.is_set():
+                return "unchanged"
+            # The server has not answered yet: wait for the navigation to commit
+            remaining_ms = navigation_timeout_ms - (loop.time() - clicked_at) * 1000
+            try:
+                await page.wait_for_event(
+                    "framenavigated",
+                    predicate=lambda frame: frame == page.main_frame,
+                    timeout=max(remaining_ms, 1),
+                )
+            except PlaywrightTimeoutError:
+                return "unchanged"
+    except Exception:
+        # The execution context was destroyed by a navigation
+        pass
+
+    if page.url != before["href"]:
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=navigation_timeout_ms)
+        except PlaywrightTimeoutError:
+            pass
+        return "navigated"
+    return "changed"
+
+
+async def _find_next_button(
+    page: Page,
+    selector: Optional[str] = None,
+    link_text: Optional[str] = None,
+):
+    """Find the next control using only the provided CSS selector.
+
+    Returns the first visible element matching selector, or None if not found
+    or if no selector was provided.
+    """
+    if not selector:
+        return None
+    try:
+        element = _next_control_locator(page, selector, link_text)
+        if element and await element.is_visible():
+            return element
+    except Exception:
+        return None
+    return None
+
+
+def _next_control_locator(page, selector: str, link_text: Optional[str] = None):
+    """Locator of the next control; building it needs no round trip, so it serves the sync API too."""
+    # Prefer to filter by provided link_text; default to "Следующая"
+    return page.locator(selector).filter(has_text=link_text or "Следующая").first
+
+
+async def _extract_paragraphs_per_node(page: Page, content_selector: str) -> list[str]:
+    """Locator-based extraction: one Playwright round trip per paragraph.
+
+    Slow on large pages but works with any selector engine; kept as fallback.
+    """
+    # Try explicit paragraphs inside the content container
+    paragraph_locator = page.locator(f"{content_selector} p")
+    try:
+        p_count = await paragraph_locator.count()
+    except Exception:
+        p_count = 0
+
+    if p_count:
+        texts: list[str] = []
+        for index in range(p_count):
+            try:
+                texts.append(await paragraph_locator.nth(index).inner_text())
+            except Exception:
+                continue
+        return paragraphs_from_node_texts(texts)
+
+    # Fallback: take the container's text and split by blank lines
+    try:
+        container_text = await page.locator(content_selector).inner_text()
+    except Exception:
+        container_text = ""
+    return split_container_text(container_text)
+
+
+async def _extract(
+    page: Page, content_selector: str, incremental: bool, with_html: bool
+) -> tuple[list[str], str]:
+    """Paragraphs, and their raw HTML if asked for, from one in-page evaluation.
+
+    Per-node extraction, without HTML, is used only if the evaluation fails
+    (e.g. for Playwright-only selector syntax).
+    """
+    try:
+        result = await page.evaluate(*extraction_call(content_selector, incremental, with_html))
+    except Exception:
+        return await _extract_paragraphs_per_node(page, content_selector), ""
+    return paragraphs_from_result(result), html_from_result(result) if with_html else ""
+
+
+async def _extract_paragraphs(page: Page, content_selector: str) -> list[str]:
+    """Extract every paragraph of the content area."""
+    return (await _extract(page, content_selector, incremental=False, with_html=False))[0]
+
+
+async def _extract_new_paragraphs(page: Page, content_selector: str) -> list[str]:
+    """Extract only the paragraphs appended since the previous call on this page."""
+    return (await _extract(page, content_selector, incremental=True, with_html=False))[0]
+
+
+async def _extract_paragraphs_with_html(
+    page: Page, content_selector: str, incremental: bool = True
+) -> tuple[list[str], str]:
+    """Like _extract_new_paragraphs / _extract_paragraphs, also returning the raw HTML.
+
+    The HTML is empty when only the per-node fallback worked.
+    """
+    return await _extract(page, content_selector, incremental, with_html=True)
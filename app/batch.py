@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import csv
+import json
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from loguru import logger
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import FastEmbedSparse, SparseEmbeddings
+
+from .browser_pool import SharedBrowser
+from .embedders import dense_model_name, make_dense_embeddings
+from .embedding_adapters import DeferredEmbeddings, DeferredSparseEmbeddings
+from .embedding_pool import EmbeddingPool
+from .ingest import ingest_document_to_qdrant
+from .options import LEGACY_OPTIONS, ChunkOptions, CrawlOptions, EmbeddingOptions, StorageOptions, fold_legacy_options
+from .startup import STARTUP, load_in_background
+
+
+# Manifest columns that map onto ingest_document_to_qdrant crawl and chunking options.
+# Everything but doc_id/start_url is optional and overrides the CLI defaults.
+_MANIFEST_FIELDS = {
+    "doc_id": str,
+    "start_url": str,
+    "next_selector": str,
+    "next_text": str,
+    "content_selector": str,
+    "max_pages": int,
+    "article_regex": str,
+    "fetcher": str,
+    "next_url_template": str,
+    "parallel_pages": int,
+}
+
+
+@dataclass
+class BatchResult:
+    doc_id: str
+    start_url: str
+    ok: bool
+    chunks: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class _SerializedEmbeddings(Embeddings):
+    """Share one dense model between threads.
+
+    Fast HF tokenizers are not safe for concurrent use ("Already borrowed"),
+    so calls into the wrapped model are serialized.
+    """
+
+    def __init__(self, inner: Embeddings) -> None:
+        self._inner = inner
+        self._lock = threading.Lock()
+        self.model_name = getattr(inner, "model_name", type(inner).__name__)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            return self._inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            return self._inner.embed_query(text)
+
+
+class _SerializedSparseEmbeddings(SparseEmbeddings):
+    """Share one sparse model between threads; see _SerializedEmbeddings."""
+
+    def __init__(self, inner: SparseEmbeddings) -> None:
+        self._inner = inner
+        self._lock = threading.Lock()
+        self.model_name = getattr(inner, "model_name", type(inner).__name__)
+
+    def embed_documents(self, texts: List[str]):
+        with self._lock:
+            return self._inner.embed_documents(texts)
+
+    def embed_query(self, text: str):
+        with self._lock:
+            return self._inner.embed_query(text)
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """Read documents to ingest from a JSONL or CSV manifest.
+
+    Each record needs `doc_id` and `start_url`; see _MANIFEST_FIELDS for
+    optional per-document overrides. Empty values are ignored.
+    """
+    manifest = Path(path)
+    if manifest.suffix.lower() == ".csv":
+        with manifest.open(encoding="utf-8", newline="") as fh:
+            rows = list(csv.DictReader(fh))
+    else:
+        rows = []
+        with manifest.open(encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    rows.append(json.loads(line))
+
+    documents: List[Dict[str, Any]] = []
+    for line_no, row in enumerate(rows, start=1):
+        if not row.get("doc_id") or not row.get("start_url"):
+            raise ValueError(f"Manifest record #{line_no}: doc_id and start_url are required")
+        doc: Dict[str, Any] = {}
+        for key, cast in _MANIFEST_FIELDS.items():
+            value = row.get(key)
+            if value is None or value == "":
+                continue
+            doc[key] = cast(value)
+        documents.append(doc)
+    return documents
+
+
+def ingest_manifest(
+    documents: List[Dict[str, Any]],
+    concurrency: int = 2,
+    per_host_limit: int = 2,
+    crawl: Optional[CrawlOptions] = None,
+    chunking: Optional[ChunkOptions] = None,
+    embedding: Optional[EmbeddingOptions] = None,
+    storage: Optional[StorageOptions] = None,
+    **ingest_kwargs: Any,
+) -> List[BatchResult]:
+    """Ingest many documents concurrently with shared browser and models.
+
+    Up to `concurrency` documents are crawled at once, each in its own
+    context of a single Chromium process, with at most `per_host_limit`
+    documents per host (see _run_per_host). FRIDA and BM25 are loaded once, in the background
+    while the browser starts, and shared; with embedding.workers > 1 all
+    documents share one EmbeddingPool.
+    The option groups and `ingest_kwargs` are passed to
+    ingest_document_to_qdrant for every document; manifest fields override
+    the crawl and chunking options. Flat options of the old signature are
+    accepted as in ingest_document_to_qdrant.
+
+    Returns one result per document, in manifest order.
+    """
+    legacy = {key: ingest_kwargs.pop(key) for key in list(ingest_kwargs) if key in LEGACY_OPTIONS}
+    crawl, chunking, embedding, storage = fold_legacy_options(
+        crawl, chunking, embedding, storage, legacy, caller="ingest_manifest"
+    )
+    # The models load in the background while the shared browser starts
+    if embedding.workers > 1:
+        # The pool is thread-safe and spreads concurrent documents over its workers
+        def _load_dense() -> Embeddings:
+            return EmbeddingPool(embedding.workers, backend=embedding.backend, onnx_cache_dir=embedding.onnx_cache_dir)
+    else:
+        def _load_dense() -> Embeddings:
+            return _SerializedEmbeddings(
+                make_dense_embeddings(
+                    embedding.backend, onnx_cache_dir=embedding.onnx_cache_dir, threads=embedding.threads
+                )
+            )
+    dense_embeddings = DeferredEmbeddings(
+        load_in_background(_load_dense, "FRIDA", lambda s: STARTUP.record("dense_model", s)),
+        model_name=dense_model_name(embedding.backend),
+        parallelism=embedding.workers,
+    )
+    sparse_embeddings = DeferredSparseEmbeddings(
+        load_in_background(
+            lambda: _SerializedSparseEmbeddings(FastEmbedSparse(model_name="Qdrant/bm25")),
+            "BM25",
+            lambda s: STARTUP.record("sparse_model", s),
+        ),
+        model_name="Qdrant/bm25",
+    )
+
+    shared_models = replace(embedding, dense=dense_embeddings, sparse=sparse_embeddings)
+
+    def _run(doc: Dict[str, Any], cdp_url: Optional[str]) -> BatchResult:
+        started = time.perf_counter()
+        logger.info(f"[{doc['doc_id']}] Начинаю загрузку: {doc['start_url']}")
+        try:
+            chunks = ingest_document_to_qdrant(
+                doc["doc_id"],
+                doc["start_url"],
+                crawl=replace(_overrides(crawl, doc), cdp_url=cdp_url),
+                chunking=_overrides(chunking, doc),
+                embedding=shared_models,
+                storage=storage,
+                **ingest_kwargs,
+            )
+        except Exception as exc:
+            logger.exception(f"[{doc['doc_id']}] Ошибка загрузки документа")
+            return BatchResult(
+                doc_id=doc["doc_id"],
+                start_url=doc["start_url"],
+                ok=False,
+                seconds=time.perf_counter() - started,
+                error=f"{type(exc).__name__}: {exc}",
+            )
+        return BatchResult(
+            doc_id=doc["doc_id"],
+            start_url=doc["start_url"],
+            ok=True,
+            chunks=chunks,
+            seconds=time.perf_counter() - started,
+        )
+
+    needs_browser = not crawl.replay and any(doc.get("fetcher", crawl.fetcher) != "http" for doc in documents)
+    shared: Optional[SharedBrowser] = SharedBrowser(headless=crawl.headless).start() if needs_browser else None
+    try:
+        cdp_url = shared.cdp_url if shared else None
+        results = _run_per_host(documents, concurrency, per_host_limit, lambda doc: _run(doc, cdp_url))
+    finally:
+        if shared is not None:
+            shared.stop()
+        dense_embeddings.close()
+
+    _log_summary(results)
+    return results
+
+
+def _host(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+def _run_per_host(
+    documents: List[Dict[str, Any]],
+    concurrency: int,
+    per_host_limit: int,
+    run: Callable[[Dict[str, Any]], BatchResult],
+) -> List[BatchResult]:
+    """Run documents with at most `concurrency` at once and `per_host_limit` per host.
+
+    Documents wait in per-host queues until their host has a free slot, so a
+    busy host never ties up pool threads while other hosts have work. Among
+    hosts with a free slot, the document earliest in the manifest goes first.
+    Returns the results in manifest order.
+    """
+    concurrency = max(1, concurrency)
+    per_host_limit = max(1, per_host_limit)
+    queues: Dict[str, Deque[int]] = {}
+    for idx, doc in enumerate(documents):
+        queues.setdefault(_host(doc["start_url"]), deque()).append(idx)
+    active: Counter[str] = Counter()
+    running: Dict[Future, Tuple[int, str]] = {}
+    results: List[Optional[BatchResult]] = [None] * len(documents)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest") as executor:
+        while queues or running:
+            while len(running) < concurrency:
+                ready = [(queue[0], host) for host, queue in queues.items() if active[host] < per_host_limit]
+                if not ready:
+                    break
+                idx, host = min(ready)
+                queues[host].popleft()
+                if not queues[host]:
+                    del queues[host]
+                active[host] += 1
+                running[executor.submit(run, documents[idx])] = (idx, host)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx, host = running.pop(future)
+                active[host] -= 1
+                results[idx] = future.result()
+    return results  # type: ignore[return-value]
+
+
+def _overrides(options: Any, doc: Dict[str, Any]) -> Any:
+    """Copy of an option group with the manifest fields that belong to it replaced."""
+    names = {f.name for f in fields(options)}
+    return replace(options, **{key: value for key, value in doc.items() if key in names})
+
+
+def _log_summary(results: List[BatchResult]) -> None:
+    ok = sum(1 for r in results if r.ok)
+    logger.info(f"Итог пакетной загрузки: успешно {ok}, с ошибкой {len(results) - ok}")
+    for r in results:
+        if r.ok:
+            logger.info(f"  OK    {r.doc_id}: чанков {r.chunks}, {r.seconds:.1f} с")
+        else:
+            logger.error(f"  FAIL  {r.doc_id}: {r.error} ({r.seconds:.1f} с)")
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import urllib.request
+from typing import List, Optional
+
+from loguru import logger
+from playwright.sync_api import sync_playwright
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SharedBrowser:
+    """One Chromium process that several crawlers attach to over CDP.
+
+    Playwright's sync API is bound to the thread that created it, so every
+    worker thread keeps its own `sync_playwright()` and connects to this
+    browser with `connect_over_cdp(cdp_url)`, getting its own isolated
+    context. The browser is started as a plain subprocess so no Playwright
+    connection has to be serviced by the thread that owns it.
+
+    Usage:
+        with SharedBrowser(headless=True) as shared:
+            iterate_page_paragraphs(..., cdp_url=shared.cdp_url)
+    """
+
+    def __init__(
+        self,
+        headless: bool = True,
+        port: Optional[int] = None,
+        extra_args: Optional[List[str]] = None,
+        startup_timeout_s: float = 30.0,
+    ) -> None:
+        self.headless = headless
+        self.port = port or _free_port()
+        self.extra_args = list(extra_args or [])
+        self.startup_timeout_s = startup_timeout_s
+        self.cdp_url = f"http://127.0.0.1:{self.port}"
+        self._process: Optional[subprocess.Popen] = None
+        self._user_data_dir: Optional[str] = None
+
+    def start(self) -> "SharedBrowser":
+        with sync_playwright() as pw:
+            executable = pw.chromium.executable_path
+        self._user_data_dir = tempfile.mkdtemp(prefix="gov-ru-parser-chromium-")
+        args = [
+            executable,
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={self._user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            *self.extra_args,
+        ]
+        if self.headless:
+            args.append("--headless=new")
+        logger.info(f"Запускаю общий Chromium: {self.cdp_url}")
+        self._process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + self.startup_timeout_s
+        while True:
+            try:
+                with urllib.request.urlopen(f"{self.cdp_url}/json/version", timeout=1.0) as resp:
+                    json.load(resp)
+                return self
+            except Exception:
+                if self._process.poll() is not None:
+                    raise RuntimeError(f"Chromium exited with code {self._process.returncode}")
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise TimeoutError("Chromium did not expose the DevTools endpoint in time")
+                time.sleep(0.1)
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+        if self._user_data_dir:
+            shutil.rmtree(self._user_data_dir, ignore_errors=True)
+            self._user_data_dir = None
+
+    def __enter__(self) -> "SharedBrowser":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
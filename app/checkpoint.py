@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from loguru import logger
+
+from .files import safe_filename, write_atomic
+
+
+DEFAULT_CHECKPOINT_DIR = ".checkpoints"
+
+
+@dataclass
+class Checkpoint:
+    """Committed progress of one document ingest.
+
+    - pages_done: pages consumed by the chunker; everything they produced is in Qdrant
+    - resume_url / resume_skip: where to continue: open resume_url and drop the
+      first resume_skip pages crawled from it (1 for navigated pages, more for
+      "show more" pages sharing one URL)
+    - chunker: held-back page and open article state (see _iterate_chunk_batches)
+    - seen_ids: point IDs produced so far, so vanished articles can still be
+      told apart after a resume
+    """
+
+    doc_id: str
+    start_url: str
+    pages_done: int
+    resume_url: str
+    resume_skip: int
+    chunker: dict
+    seen_ids: List[str] = field(default_factory=list)
+    uploaded: int = 0
+    saved_at: str = ""
+
+    @property
+    def page_offset(self) -> int:
+        """Pages before the first one crawled from resume_url."""
+        return self.pages_done - self.resume_skip
+
+
+def checkpoint_path(checkpoint_dir: str, doc_id: str) -> Path:
+    return Path(checkpoint_dir) / f"{safe_filename(doc_id)}.json"
+
+
+def load_checkpoint(checkpoint_dir: str, doc_id: str) -> Optional[Checkpoint]:
+    path = checkpoint_path(checkpoint_dir, doc_id)
+    if not path.exists():
+        return None
+    with path.open(encoding="utf-8") as fh:
+        return Checkpoint(**json.load(fh))
+
+
+def save_checkpoint(checkpoint_dir: str, checkpoint: Checkpoint) -> None:
+    """Atomically replace the document's checkpoint."""
+    checkpoint.saved_at = datetime.now().astimezone().isoformat(timespec="seconds")
+    data = json.dumps(asdict(checkpoint), ensure_ascii=False).encode("utf-8")
+    write_atomic(checkpoint_path(checkpoint_dir, checkpoint.doc_id), data)
+    logger.debug(f"Контрольная точка: {checkpoint.doc_id}, страниц: {checkpoint.pages_done}")
+
+
+def clear_checkpoint(checkpoint_dir: str, doc_id: str) -> None:
+    try:
+        checkpoint_path(checkpoint_dir, doc_id).unlink()
+    except FileNotFoundError:
+        pass
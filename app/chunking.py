@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import bisect
+import math
+import re
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+from loguru import logger
+
+from .startup import load_in_background
+
+
+DEFAULT_MAX_CHUNK_TOKENS = 480
+DEFAULT_CHUNK_OVERLAP_TOKENS = 64
+
+# Part of an article: "1. ", "2.1. "
+_PART_START = re.compile(r"^\d+(?:\.\d+)*\.\s")
+# Point of a part: "а) ", "1) "
+_POINT_START = re.compile(r"^(?:[а-яё]|\d+)\)\s", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"(?<=[.;:!?…])\s+")
+
+TokenCounter = Callable[[str], int]
+
+
+def approximate_token_count(text: str) -> int:
+    """Upper-bound estimate for Russian text with BPE tokenizers (~3 chars per token)."""
+    return max(1, math.ceil(len(text) / 3))
+
+
+def make_token_counter(model_name: str) -> TokenCounter:
+    """Count tokens with the model's own tokenizer, or estimate if it cannot be loaded."""
+    try:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    except Exception as exc:
+        logger.warning(f"Токенизатор {model_name} недоступен ({exc}) — длина чанков оценивается по символам.")
+        return approximate_token_count
+
+    def _count(text: str) -> int:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    return _count
+
+
+def load_token_counter_in_background(
+    model_name: str, on_loaded: Optional[Callable[[float], None]] = None
+) -> TokenCounter:
+    """make_token_counter on a daemon thread; the counter waits for the tokenizer on first use.
+
+    Counts never fall back to the estimate while the tokenizer is loading,
+    so chunk boundaries do not depend on how fast it loads.
+    """
+    future = load_in_background(lambda: make_token_counter(model_name), f"токенизатор {model_name}", on_loaded)
+
+    def _count(text: str) -> int:
+        return future.result()(text)
+
+    return _count
+
+
+@dataclass
+class _Unit:
+    text: str
+    tokens: int
+    # 2: starts a part ("1."), 1: starts a point ("а)"), 0: anything else
+    boundary: int
+
+
+class ArticleSplitter:
+    """Split over-long chunks into parts that fit the embedder's token budget.
+
+    Cuts prefer part boundaries ("1."), then point boundaries ("а)"), then
+    any paragraph; a paragraph longer than the budget is cut at sentence
+    ends, a sentence longer than it at word boundaries. Consecutive parts
+    share up to `overlap_tokens` of trailing paragraphs. The article heading
+    is repeated at the top of every part so each one stays self-describing.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = DEFAULT_MAX_CHUNK_TOKENS,
+        overlap_tokens: int = DEFAULT_CHUNK_OVERLAP_TOKENS,
+        count_tokens: TokenCounter = approximate_token_count,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.overlap_tokens = max(0, overlap_tokens)
+        self.count_tokens = count_tokens
+
+    def split(self, text: str, heading: Optional[str] = None) -> List[str]:
+        """Return `text` as is if it fits, else its parts (heading included in each)."""
+        if self.count_tokens(text) <= self.max_tokens:
+            return [text]
+        paragraphs = text.split("\n\n")
+        if heading is not None and paragraphs and paragraphs[0] == heading:
+            paragraphs = paragraphs[1:]
+        else:
+            heading = None
+        heading_tokens = self.count_tokens(heading + "\n\n") if heading else 0
+        budget = max(self.max_tokens - heading_tokens, self.max_tokens // 2)
+
+        units: List[_Unit] = []
+        for para in paragraphs:
+            boundary = 2 if _PART_START.match(para) else 1 if _POINT_START.match(para) else 0
+            units.extend(self._split_paragraph(para, budget, boundary))
+
+        # Parts are joined with blank lines, and those count against the budget too
+        separator_tokens = self.count_tokens("\n\n")
+        groups = self._pack(units, budget, separator_tokens)
+        parts = ["\n\n".join(unit.text for unit in group) for group in groups]
+        if heading:
+            parts = [f"{heading}\n\n{part}" for part in parts]
+        return parts
+
+    def _split_paragraph(self, para: str, budget: int, boundary: int) -> List[_Unit]:
+        tokens = self.count_tokens(para)
+        if tokens <= budget:
+            return [_Unit(para, tokens, boundary)]
+        pieces: List[str] = []
+        for sentence in _SENTENCE_END.split(para):
+            if self.count_tokens(sentence) <= budget:
+                pieces.append(sentence)
+            else:
+                pieces.extend(self._split_words(sentence, budget))
+        # Re-join consecutive sentences while they fit
+        units: List[_Unit] = []
+        current = ""
+        for piece in pieces:
+            candidate = f"{current} {piece}" if current else piece
+            if current and self.count_tokens(candidate) > budget:
+                units.append(_Unit(current, self.count_tokens(current), boundary if not units else 0))
+                current = piece
+            else:
+                current = candidate
+        if current:
+            units.append(_Unit(current, self.count_tokens(current), boundary if not units else 0))
+        return units
+
+    def _split_words(self, sentence: str, budget: int) -> List[str]:
+        pieces: List[str] = []
+        current: List[str] = []
+        for word in self._split_long_word(sentence.split(), budget):
+            if current and self.count_tokens(" ".join(current + [word])) > budget:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def _split_long_word(self, words: List[str], budget: int) -> Iterator[str]:
+        # Tables and URLs flattened into one "word" are cut at character positions
+        for word in words:
+            tokens = self.count_tokens(word)
+            if tokens <= budget:
+                yield word
+                continue
+            step = max(1, len(word) * budget // tokens)
+            for start in range(0, len(word), step):
+                yield word[start : start + step]
+
+    def _pack(self, units: List[_Unit], budget: int, separator_tokens: int = 0) -> List[List[_Unit]]:
+        # prefix[i] = tokens of units[:i], each followed by a separator; units[a:b] joined
+        # take span(a, b) tokens
+        prefix = [0]
+        for unit in units:
+            prefix.append(prefix[-1] + unit.tokens + separator_tokens)
+
+        def span(a: int, b: int) -> int:
+            return prefix[b] - prefix[a] - separator_tokens
+
+        groups: List[List[_Unit]] = []
+        start = 0
+        while start < len(units):
+            # Longest run from `start` that fits (always at least one unit)
+            end = max(bisect.bisect_right(prefix, prefix[start] + budget + separator_tokens) - 1, start + 1)
+            if end < len(units):
+                # Prefer cutting before a part, then a point, in the second half of the run
+                for level in (2, 1):
+                    cut = next(
+                        (
+                            j
+                            for j in range(end, start, -1)
+                            if units[j].boundary >= level and span(start, j) >= budget // 2
+                        ),
+                        None,
+                    )
+                    if cut is not None:
+                        end = cut
+                        break
+            groups.append(units[start:end])
+            if end >= len(units):
+                break
+            # Overlap: repeat trailing units, leaving room for at least the next new one
+            next_start = end
+            while (
+                next_start - 1 > start
+                and span(next_start - 1, end) <= self.overlap_tokens
+                and span(next_start - 1, end + 1) <= budget
+            ):
+                next_start -= 1
+            start = next_start
+        return groups
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import contextlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+from loguru import logger
+
+# qdrant_client is imported where it is used: the CLI reads the profiles without it
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+
+# Payload fields filtered on by the query side
+KEYWORD_INDEX_FIELDS = ("metadata.article_number", "metadata.chapter_number")
+# Ordered by to find a collection's latest upload (query cache invalidation)
+DATETIME_INDEX_FIELDS = ("metadata.upload_time",)
+DEFAULT_COLLECTION_PROFILE = "plain"
+# Qdrant's default indexing threshold (kB of vectors per segment); restored
+# by bulk_load when a collection was left unindexed by an interrupted load
+DEFAULT_INDEXING_THRESHOLD = 20000
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    """How a document collection is stored and indexed.
+
+    - defer_indexing: build no HNSW graph while the collection is bulk-loaded
+      (indexing_threshold=0) and restore its indexing threshold once the load
+      is done, so the graph is built once instead of being updated per upsert
+    - on_disk: keep original vectors in memmapped files instead of RAM
+    - int8: add int8 scalar quantization, kept in RAM for search
+    - hnsw_m / hnsw_ef_construct: HNSW graph degree and build-time beam width
+      (None keeps the server defaults, 16 and 100)
+    """
+
+    defer_indexing: bool = False
+    on_disk: bool = False
+    int8: bool = False
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+
+
+COLLECTION_PROFILES: Dict[str, CollectionProfile] = {
+    # Qdrant defaults, as collections were created before profiles existed
+    "plain": CollectionProfile(),
+    # Fastest full reload: index once after the upload
+    "bulk": CollectionProfile(defer_indexing=True),
+    # Large codes on small nodes: vectors on disk, int8 copies in RAM for search
+    "low-memory": CollectionProfile(defer_indexing=True, on_disk=True, int8=True),
+}
+
+
+def create_collection(client: QdrantClient, collection_name: str, dim: int, profile: CollectionProfile) -> None:
+    """Create the hybrid (dense + sparse) collection of a document with `profile`."""
+    from qdrant_client.http.models import (
+        Distance,
+        HnswConfigDiff,
+        ScalarQuantization,
+        ScalarQuantizationConfig,
+        ScalarType,
+        SparseIndexParams,
+        SparseVectorParams,
+        VectorParams,
+    )
+
+    hnsw_config = None
+    if profile.hnsw_m is not None or profile.hnsw_ef_construct is not None:
+        hnsw_config = HnswConfigDiff(m=profile.hnsw_m, ef_construct=profile.hnsw_ef_construct)
+    quantization_config = None
+    if profile.int8:
+        quantization_config = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config={
+            "dense": VectorParams(size=dim, distance=Distance.COSINE, on_disk=profile.on_disk or None),
+        },
+        sparse_vectors_config={
+            "sparse": SparseVectorParams(index=SparseIndexParams(on_disk=profile.on_disk or None)),
+        },
+        hnsw_config=hnsw_config,
+        quantization_config=quantization_config,
+    )
+    ensure_payload_indexes(client, collection_name)
+
+
+def connect(
+    qdrant_url: Optional[str] = None,
+    qdrant_host: Optional[str] = None,
+    qdrant_port: Optional[int] = None,
+) -> QdrantClient:
+    """Client for a Qdrant server (gRPC preferred), or an in-memory instance if none is given."""
+    from qdrant_client import QdrantClient
+
+    if qdrant_url:
+        return QdrantClient(url=qdrant_url, prefer_grpc=True)
+    if qdrant_host:
+        return QdrantClient(host=qdrant_host, port=qdrant_port or 6333, prefer_grpc=True)
+    return QdrantClient(path=":memory:")
+
+
+def ensure_payload_indexes(client: QdrantClient, collection_name: str) -> None:
+    """Create the payload indexes (KEYWORD_INDEX_FIELDS, DATETIME_INDEX_FIELDS) the collection lacks."""
+    from qdrant_client.http.models import PayloadSchemaType
+
+    existing = client.get_collection(collection_name=collection_name).payload_schema or {}
+    wanted = [(name, PayloadSchemaType.KEYWORD) for name in KEYWORD_INDEX_FIELDS]
+    wanted += [(name, PayloadSchemaType.DATETIME) for name in DATETIME_INDEX_FIELDS]
+    for field_name, schema in wanted:
+        if field_name not in existing:
+            client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=schema,
+            )
+
+
+@contextlib.contextmanager
+def bulk_load(client: QdrantClient, collection_name: str, profile: CollectionProfile) -> Iterator[None]:
+    """Load a collection, with indexing switched off during the load if the profile defers it.
+
+    The collection's indexing threshold is read before it is set to 0 and
+    restored afterwards, also if the load failed: without this a failed load
+    would leave the collection unindexed for good (every search a full scan).
+    A threshold of 0 found on entry (left by a load that was killed) is
+    restored as DEFAULT_INDEXING_THRESHOLD.
+    """
+    if not profile.defer_indexing:
+        yield
+        return
+    threshold = _indexing_threshold(client, collection_name) or DEFAULT_INDEXING_THRESHOLD
+    _set_indexing_threshold(client, collection_name, 0)
+    try:
+        yield
+    except BaseException:
+        try:
+            _finish_bulk_load(client, collection_name, threshold)
+        except Exception as exc:
+            logger.warning(f"Не удалось включить индексирование коллекции {collection_name}: {exc}")
+        raise
+    _finish_bulk_load(client, collection_name, threshold)
+
+
+def _indexing_threshold(client: QdrantClient, collection_name: str) -> Optional[int]:
+    optimizer_config = client.get_collection(collection_name=collection_name).config.optimizer_config
+    return optimizer_config.indexing_threshold if optimizer_config is not None else None
+
+
+def _set_indexing_threshold(client: QdrantClient, collection_name: str, threshold: int) -> None:
+    from qdrant_client.http.models import OptimizersConfigDiff
+
+    client.update_collection(
+        collection_name=collection_name,
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold),
+    )
+
+
+def _finish_bulk_load(client: QdrantClient, collection_name: str, threshold: int) -> None:
+    """Switch indexing back on after a deferred-indexing load; Qdrant builds the graph in the background."""
+    _set_indexing_threshold(client, collection_name, threshold)
+    logger.info(f"Индексирование коллекции {collection_name} включено, HNSW строится в фоне")
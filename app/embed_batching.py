@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from .chunking import TokenCounter, approximate_token_count
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_qdrant import SparseEmbeddings
+
+
+DEFAULT_EMBED_BATCH_TOKENS = 8192
+DEFAULT_EMBED_MAX_DELAY_S = 2.0
+# Chunks buffered before a flush, in model batches: enough to sort into buckets
+BUFFER_BATCHES = 4
+
+T = TypeVar("T")
+
+_TICK = object()
+_END = object()
+
+
+@dataclass
+class BatchingStats:
+    """How well the dense model's batches were packed.
+
+    - tokens: real tokens embedded
+    - padded_tokens: tokens the model computed, i.e. batch size x longest text
+    """
+
+    calls: int = 0
+    texts: int = 0
+    tokens: int = 0
+    padded_tokens: int = 0
+
+    @property
+    def fill(self) -> float:
+        return self.tokens / self.padded_tokens if self.padded_tokens else 0.0
+
+    def summary(self) -> str:
+        avg = self.texts / self.calls if self.calls else 0.0
+        return f"вызовов {self.calls}, текстов {self.texts} (≈{avg:.1f} на вызов), заполнение {self.fill:.0%}"
+
+
+class BucketedEmbedder:
+    """Embed texts in length-sorted batches of at most `max_batch_tokens` padded tokens.
+
+    Texts are sorted by token count and cut into batches whose size times
+    longest text fits the budget, so similar lengths are padded together and
+    short texts go in large batches. Vectors are returned in input order.
+    Sparse vectors need no padding and are computed in one call.
+
+    If the dense model declares `parallelism` > 1 (e.g. an EmbeddingPool),
+    that many batches are in flight at once.
+    """
+
+    def __init__(
+        self,
+        dense: Embeddings,
+        sparse: SparseEmbeddings,
+        max_batch_tokens: int = DEFAULT_EMBED_BATCH_TOKENS,
+        count_tokens: TokenCounter = approximate_token_count,
+    ) -> None:
+        self.dense = dense
+        self.sparse = sparse
+        self.max_batch_tokens = max_batch_tokens
+        self.count_tokens = count_tokens
+        self.stats = BatchingStats()
+
+    def plan(self, lengths: List[int]) -> List[List[int]]:
+        """Split text indices into batches, longest texts first."""
+        order = sorted(range(len(lengths)), key=lambda idx: lengths[idx], reverse=True)
+        batches: List[List[int]] = []
+        current: List[int] = []
+        for idx in order:
+            # Sorted descending, so current[0] is the longest text of the batch
+            if current and (len(current) + 1) * lengths[current[0]] > self.max_batch_tokens:
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed(self, texts: List[str]) -> Tuple[List[List[float]], list]:
+        """Return (dense, sparse) vectors of `texts`, in order."""
+        lengths = [self.count_tokens(text) for text in texts]
+        dense: List[Optional[List[float]]] = [None] * len(texts)
+        batches = self.plan(lengths)
+        parallelism = getattr(self.dense, "parallelism", 1)
+        if parallelism > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=min(parallelism, len(batches))) as pool:
+                results = list(
+                    pool.map(lambda batch: self.dense.embed_documents([texts[idx] for idx in batch]), batches)
+                )
+        else:
+            results = (self.dense.embed_documents([texts[idx] for idx in batch]) for batch in batches)
+        for batch, vectors in zip(batches, results):
+            for idx, vector in zip(batch, vectors):
+                dense[idx] = vector
+            self.stats.calls += 1
+            self.stats.texts += len(batch)
+            self.stats.tokens += sum(lengths[idx] for idx in batch)
+            self.stats.padded_tokens += len(batch) * lengths[batch[0]]
+        sparse = self.sparse.embed_documents(texts)
+        return dense, sparse  # type: ignore[return-value]
+
+
+def _poll(items: Iterable[T], timeout: Callable[[], Optional[float]]) -> Iterator[object]:
+    """Iterate `items` from a reader thread, yielding _TICK when a wait times out."""
+    buffer: "queue.Queue" = queue.Queue(maxsize=1)
+    closed = threading.Event()
+    errors: List[BaseException] = []
+
+    def _put(item: object) -> bool:
+        while not closed.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read() -> None:
+        try:
+            for item in items:
+                if not _put(item):
+                    return
+        except BaseException as exc:  # noqa: BLE001 - re-raised by the consumer
+            errors.append(exc)
+        _put(_END)
+
+    reader = threading.Thread(target=_read, name="embed-batching-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            try:
+                item = buffer.get(timeout=timeout())
+            except queue.Empty:
+                yield _TICK
+                continue
+            if item is _END:
+                if errors:
+                    raise errors[0]
+                return
+            yield item
+    finally:
+        closed.set()
+
+
+def accumulate(
+    items: Iterable[T],
+    size: Callable[[T], int],
+    max_size: int,
+    max_delay_s: Optional[float] = None,
+    poll: bool = False,
+    flush_after: Optional[Callable[[T], bool]] = None,
+) -> Iterator[List[T]]:
+    """Group consecutive items until their total size reaches `max_size`.
+
+    A group is also flushed once its first item has waited `max_delay_s`,
+    after an item for which `flush_after` is true, and at the end of the
+    input. Without `poll` the deadline is only checked when
+    an item arrives; with it the input is read from a helper thread so a slow
+    producer cannot hold buffered items back.
+    """
+    group: List[T] = []
+    total = 0
+    deadline = 0.0
+
+    def _timeout() -> Optional[float]:
+        if not group or max_delay_s is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+
+    stream = _poll(items, _timeout) if (poll and max_delay_s is not None) else items
+    for item in stream:
+        boundary = False
+        if item is not _TICK:
+            if not group:
+                deadline = time.monotonic() + (max_delay_s or 0.0)
+            group.append(item)  # type: ignore[arg-type]
+            total += size(item)  # type: ignore[arg-type]
+            boundary = flush_after is not None and flush_after(item)  # type: ignore[arg-type]
+        if group and (
+            boundary or total >= max_size or (max_delay_s is not None and time.monotonic() >= deadline)
+        ):
+            yield group
+            group = []
+            total = 0
+    if group:
+        yield group
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+
+DENSE_MODEL_NAME = "ai-forever/FRIDA"
+# torch: sentence-transformers in PyTorch; onnx / onnx-int8: exported model in ONNX Runtime
+DENSE_BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_ONNX_CACHE_DIR = ".onnx_cache"
+
+
+def embedding_dimension(embeddings: Embeddings) -> int:
+    """Vector size of a dense embedder, read from the model config rather than by running it.
+
+    Wrappers (caches, locks) are looked through via their `_inner` model.
+    Falls back to embedding a probe text if the config cannot be read.
+    """
+    model = embeddings
+    while getattr(model, "dimension", None) is None and hasattr(model, "_inner"):
+        model = model._inner
+    if getattr(model, "dimension", None):
+        return model.dimension
+    model_name = getattr(embeddings, "model_name", None)
+    if model_name:
+        try:
+            from transformers import AutoConfig
+
+            config = AutoConfig.from_pretrained(model_name.split("@")[0])
+            dimension = getattr(config, "hidden_size", None) or getattr(config, "d_model", None)
+            if dimension:
+                return int(dimension)
+        except Exception as exc:
+            logger.warning(
+                f"Не удалось прочитать конфигурацию {model_name} ({exc}) — размерность определяется пробным эмбеддингом."
+            )
+    return len(embeddings.embed_query("test"))
+
+
+def dense_model_name(backend: str = "torch", model_name: str = DENSE_MODEL_NAME) -> str:
+    """`model_name` attribute of the embedder make_dense_embeddings builds (cache key, logs)."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def make_dense_embeddings(
+    backend: str = "torch",
+    model_name: str = DENSE_MODEL_NAME,
+    onnx_cache_dir: str = DEFAULT_ONNX_CACHE_DIR,
+    threads: Optional[int] = None,
+) -> Embeddings:
+    """Build the dense embedder for the selected backend (see DENSE_BACKENDS).
+
+    The runtimes (sentence-transformers, torch, ONNX Runtime) are imported
+    here, not with this module, so importing it stays cheap.
+    """
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        return HuggingFaceEmbeddings(model_name=model_name)
+    if backend in ("onnx", "onnx-int8"):
+        from .onnx_embeddings import OnnxEmbeddings
+
+        return OnnxEmbeddings(
+            model_name,
+            cache_dir=onnx_cache_dir,
+            quantize=(backend == "onnx-int8"),
+            threads=threads,
+        )
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {DENSE_BACKENDS}")
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import struct
+import time
+from array import array
+from concurrent.futures import Future
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import SparseEmbeddings, SparseVector
+
+from .embedding_cache import CacheStats, EmbeddingCache, decode_dense, embed_with_cache, encode_dense
+
+
+# LangChain adapters: cache-backed and background-loaded embeddings. EmbeddingCache itself
+# lives in embedding_cache.py so that it imports without LangChain.
+
+
+def _encode_sparse(vector: SparseVector) -> bytes:
+    indices = array("i", vector.indices)
+    values = array("f", vector.values)
+    return struct.pack("<I", len(indices)) + indices.tobytes() + values.tobytes()
+
+
+def _decode_sparse(data: bytes) -> SparseVector:
+    (count,) = struct.unpack_from("<I", data)
+    indices = array("i")
+    indices.frombytes(data[4 : 4 + 4 * count])
+    values = array("f")
+    values.frombytes(data[4 + 4 * count :])
+    return SparseVector(indices=indices.tolist(), values=values.tolist())
+
+
+class CachedEmbeddings(Embeddings):
+    """Dense embeddings that reuse vectors stored in an EmbeddingCache.
+
+    Only document embeddings are cached; queries go straight to the model.
+    Cached vectors come back as float32 values.
+    """
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache, model_name: Optional[str] = None) -> None:
+        self._inner = inner
+        self._cache = cache
+        self.model_name = model_name or getattr(inner, "model_name", type(inner).__name__)
+        self.parallelism = getattr(inner, "parallelism", 1)
+        self.stats = CacheStats()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return embed_with_cache(
+            self._cache,
+            f"dense:{self.model_name}",
+            texts,
+            self.stats,
+            self._inner.embed_documents,
+            encode_dense,
+            decode_dense,
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._inner.embed_query(text)
+
+
+class CachedSparseEmbeddings(SparseEmbeddings):
+    """Sparse (e.g. BM25) embeddings that reuse vectors stored in an EmbeddingCache."""
+
+    def __init__(self, inner: SparseEmbeddings, cache: EmbeddingCache, model_name: Optional[str] = None) -> None:
+        self._inner = inner
+        self._cache = cache
+        self.model_name = model_name or getattr(inner, "model_name", type(inner).__name__)
+        self.stats = CacheStats()
+
+    def embed_documents(self, texts: List[str]) -> List[SparseVector]:
+        return embed_with_cache(
+            self._cache,
+            f"sparse:{self.model_name}",
+            texts,
+            self.stats,
+            self._inner.embed_documents,
+            _encode_sparse,
+            _decode_sparse,
+        )
+
+    def embed_query(self, text: str) -> SparseVector:
+        return self._inner.embed_query(text)
+
+
+class _Deferred:
+    """Model loaded by load_in_background; callers block until it is ready."""
+
+    def __init__(self, future: Future, model_name: str) -> None:
+        self._future = future
+        self.model_name = model_name
+        # Seconds callers spent waiting for the model to finish loading
+        self.wait_s = 0.0
+
+    def model(self):
+        if not self._future.done():
+            started = time.perf_counter()
+            try:
+                return self._future.result()
+            finally:
+                self.wait_s += time.perf_counter() - started
+        return self._future.result()
+
+    def close(self) -> None:
+        """Close the model if it has resources of its own (e.g. an EmbeddingPool).
+
+        A model that is still loading is closed once it is ready, without blocking.
+        """
+        self._future.add_done_callback(_close_loaded)
+
+
+def _close_loaded(future: Future) -> None:
+    if future.exception() is None and hasattr(future.result(), "close"):
+        future.result().close()
+
+
+class DeferredEmbeddings(_Deferred, Embeddings):
+    """Dense embeddings whose model is still loading in the background.
+
+    `model_name` and `parallelism` are known up front, so caches, batching and
+    embedding_dimension (read from the model config) need not wait for it.
+    """
+
+    def __init__(self, future: Future, model_name: str, parallelism: int = 1) -> None:
+        super().__init__(future, model_name)
+        self.parallelism = parallelism
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model().embed_query(text)
+
+
+class DeferredSparseEmbeddings(_Deferred, SparseEmbeddings):
+    """Sparse embeddings whose model is still loading in the background."""
+
+    def embed_documents(self, texts: List[str]) -> List[SparseVector]:
+        return self.model().embed_documents(texts)
+
+    def embed_query(self, text: str) -> SparseVector:
+        return self.model().embed_query(text)
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, TypeVar
+
+from loguru import logger
+
+
+DEFAULT_EMBEDDING_CACHE_DIR = ".embedding_cache"
+DEFAULT_EMBEDDING_CACHE_MAX_MB = 2048
+
+_WHITESPACE = re.compile(r"\s+")
+
+T = TypeVar("T")
+
+
+def text_key(text: str) -> bytes:
+    """Cache key of a text: SHA-256 of its NFC-normalized, whitespace-collapsed form."""
+    normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).digest()
+
+
+def encode_dense(vector: Sequence[float]) -> bytes:
+    """Pack a dense vector as float32 for storage in an EmbeddingCache."""
+    return array("f", vector).tobytes()
+
+
+def decode_dense(data: bytes) -> List[float]:
+    """Inverse of encode_dense."""
+    values = array("f")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """Disk-backed store of document vectors keyed by (model name, text hash).
+
+    Vectors are kept as packed float32 (sparse ones as int32 indices plus
+    float32 values) in a SQLite file under `root`. When the stored vectors
+    exceed `max_bytes`, the least recently used ones are evicted down to 90%
+    of the limit. Safe to share between threads and processes.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_EMBEDDING_CACHE_DIR,
+        max_bytes: int = DEFAULT_EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+    ) -> None:
+        Path(root).mkdir(parents=True, exist_ok=True)
+        self.path = Path(root) / "embeddings.sqlite3"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " model TEXT NOT NULL, key BLOB NOT NULL, data BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, key)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors (last_used)")
+        self._conn.commit()
+        self._total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM vectors").fetchone()[0]
+
+    def get_many(self, model: str, keys: Sequence[bytes]) -> Dict[bytes, bytes]:
+        """Return the stored data for the keys that are present and mark them as used."""
+        found: Dict[bytes, bytes] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                part = unique[start : start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, data FROM vectors WHERE model = ? AND key IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                found.update((bytes(key), bytes(data)) for key, data in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE vectors SET last_used = ? WHERE model = ? AND key = ?",
+                    [(now, model, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, items: Dict[bytes, bytes]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (model, key, data, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(model, key, data, len(data), now) for key, data in items.items()],
+            )
+            self._conn.commit()
+            self._total_bytes += sum(len(data) for data in items.values())
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Other processes may have written or evicted too: recount before deleting
+        self._total_bytes = self._stored_bytes()
+        target = int(self.max_bytes * 0.9)
+        if self._total_bytes <= target:
+            return
+        evicted = 0
+        cursor = self._conn.execute("SELECT model, key, size FROM vectors ORDER BY last_used")
+        victims = []
+        for model, key, size in cursor:
+            if self._total_bytes - evicted <= target:
+                break
+            victims.append((model, key))
+            evicted += size
+        cursor.close()
+        self._conn.executemany("DELETE FROM vectors WHERE model = ? AND key = ?", victims)
+        self._conn.commit()
+        self._total_bytes -= evicted
+        logger.info(
+            f"Кэш эмбеддингов: вытеснено {len(victims)} векторов (≈{evicted / 1024 / 1024:.1f} МБ)"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return f"попаданий {self.hits}/{self.hits + self.misses} ({self.hit_rate:.0%})"
+
+
+def embed_with_cache(
+    cache: EmbeddingCache,
+    model: str,
+    texts: List[str],
+    stats: CacheStats,
+    embed: Callable[[List[str]], List[T]],
+    encode: Callable[[T], bytes],
+    decode: Callable[[bytes], T],
+) -> List[T]:
+    """Vectors of `texts` from `cache`, embedding only the ones not stored yet.
+
+    Missing texts are embedded with `embed` (each distinct text once) and
+    stored with `encode`; stored ones are read back with `decode`. Hits and
+    misses are counted in `stats`.
+    """
+    keys = [text_key(text) for text in texts]
+    stored = cache.get_many(model, keys)
+    results: List[Optional[T]] = [None] * len(texts)
+    missing: Dict[bytes, List[int]] = {}
+    for idx, key in enumerate(keys):
+        if key in stored:
+            results[idx] = decode(stored[key])
+        else:
+            missing.setdefault(key, []).append(idx)
+
+    stats.hits += len(texts) - sum(len(positions) for positions in missing.values())
+    stats.misses += sum(len(positions) for positions in missing.values())
+    if missing:
+        # Embed each distinct missing text once
+        computed = embed([texts[positions[0]] for positions in missing.values()])
+        fresh: Dict[bytes, bytes] = {}
+        for (key, positions), vector in zip(missing.items(), computed):
+            fresh[key] = encode(vector)
+            for idx in positions:
+                results[idx] = vector
+        cache.put_many(model, fresh)
+    return results  # type: ignore[return-value]
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import itertools
+import math
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Connection, wait
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+from langchain_core.embeddings import Embeddings
+
+from .embedders import DEFAULT_ONNX_CACHE_DIR, DENSE_MODEL_NAME, dense_model_name
+
+
+# Calls with more texts than this are split over several workers
+_SHARD_MIN_TEXTS = 32
+# How often the collector checks that the workers are alive
+_LIVENESS_INTERVAL_S = 1.0
+
+
+def core_slices(workers: int, cores: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """Split the usable CPU cores into `workers` contiguous, equally sized slices."""
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    per_worker = max(1, len(cores) // workers)
+    # More workers than cores: slices wrap around and share cores
+    return [[cores[(idx * per_worker + j) % len(cores)] for j in range(per_worker)] for idx in range(workers)]
+
+
+def _create_block(size: int) -> shared_memory.SharedMemory:
+    """Shared memory block handed over to the parent, which unlinks it.
+
+    The creating process must not track it: its resource tracker would
+    otherwise warn about, or unlink, a block the parent still has to read.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+    block = shared_memory.SharedMemory(create=True, size=size)
+    resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+def _read_block(name: str, shape: Tuple[int, ...]) -> List[List[float]]:
+    """Copy the vectors out of a worker's block and unlink it."""
+    import numpy as np
+
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=np.float32, buffer=block.buf).tolist()
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _worker_main(
+    index: int,
+    cores: List[int],
+    backend: str,
+    model_name: str,
+    onnx_cache_dir: str,
+    model_factory: Optional[Callable[[], Embeddings]],
+    tasks: "mp.Queue",
+    results: Connection,
+) -> None:
+    # Keep BLAS/OpenMP pools inside the slice before any of them starts
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(len(cores))
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    import numpy as np
+
+    from .embedders import make_dense_embeddings
+
+    try:
+        if model_factory is not None:
+            model = model_factory()
+        else:
+            model = make_dense_embeddings(backend, model_name, onnx_cache_dir=onnx_cache_dir, threads=len(cores))
+    except BaseException as exc:  # noqa: BLE001 - reported to the parent
+        results.send(("failed", index, None, f"{type(exc).__name__}: {exc}"))
+        return
+    results.send(("ready", index, None, os.getpid()))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, kind, texts = task
+        try:
+            if kind == "query":
+                vectors = np.asarray([model.embed_query(texts[0])], dtype=np.float32)
+            else:
+                vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+            # Vectors travel back through shared memory instead of being pickled
+            block = _create_block(max(1, vectors.nbytes))
+            np.ndarray(vectors.shape, dtype=np.float32, buffer=block.buf)[...] = vectors
+            results.send(("done", index, task_id, (block.name, vectors.shape)))
+            block.close()
+        except BaseException as exc:  # noqa: BLE001 - reported to the caller
+            results.send(("error", index, task_id, f"{type(exc).__name__}: {exc}"))
+
+
+class EmbeddingPool(Embeddings):
+    """Dense embeddings computed by N worker processes, one model copy each.
+
+    Worker i is pinned to its own slice of the CPU cores (see core_slices)
+    and runs the model with that many intra-op threads, so workers do not
+    compete for cores. The parent hands each free worker one task at a time
+    over its own queue (texts are pickled; they are small next to the
+    vectors), and result vectors come back through shared memory, announced
+    over the worker's own pipe: a worker killed mid-send cannot leave a lock
+    that the other workers' results wait on. The pool
+    is thread-safe: one pool can serve several documents ingested
+    concurrently, each call going to whichever worker is free. Large calls
+    are split over the workers.
+
+    A worker that dies fails only the call it was computing; the others keep
+    serving the queue, and calls fail only once no worker is left.
+    model_factory, if given, builds the model in each worker instead of
+    make_dense_embeddings; it must be picklable (a module-level callable).
+
+    Memory grows with the number of workers: every worker holds the model
+    (FRIDA is ~3.3 GB in fp32, about a quarter of that with onnx-int8).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        backend: str = "torch",
+        model_name: str = DENSE_MODEL_NAME,
+        onnx_cache_dir: str = DEFAULT_ONNX_CACHE_DIR,
+        cores: Optional[Sequence[int]] = None,
+        model_factory: Optional[Callable[[], Embeddings]] = None,
+    ) -> None:
+        self.model_name = dense_model_name(backend, model_name)
+        self.parallelism = workers
+        context = mp.get_context("spawn")
+        self._task_queues = [context.Queue() for _ in range(workers)]
+        pipes = [context.Pipe(duplex=False) for _ in range(workers)]
+        self._results: List[Connection] = [reader for reader, _ in pipes]
+        self._pending: Dict[int, Future] = {}
+        # Tasks waiting for a free worker, and the task each busy worker is computing
+        self._backlog: Deque[Tuple[int, str, List[str]]] = deque()
+        self._in_flight: Dict[int, int] = {}
+        self._idle: List[int] = []
+        self._dead: Set[int] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closing = False
+        self._processes = [
+            context.Process(
+                target=_worker_main,
+                args=(
+                    idx, slice_, backend, model_name, onnx_cache_dir, model_factory,
+                    self._task_queues[idx], pipes[idx][1],
+                ),
+                name=f"embedding-worker-{idx}",
+                daemon=True,
+            )
+            for idx, slice_ in enumerate(core_slices(workers, cores))
+        ]
+        for process in self._processes:
+            process.start()
+        # Only the worker holds the write end, so its pipe reads EOF once it dies
+        for _, writer in pipes:
+            writer.close()
+        try:
+            self._wait_ready()
+        except BaseException:
+            self.close()
+            raise
+        self._idle = list(range(workers))
+        self._stop = threading.Event()
+        self._collector = threading.Thread(target=self._collect, name="embedding-pool-results", daemon=True)
+        self._collector.start()
+        logger.info(f"Пул эмбеддингов: процессов {workers}, ядра: {core_slices(workers, cores)}")
+
+    def _wait_ready(self) -> None:
+        starting = {conn: index for index, conn in enumerate(self._results)}
+        while starting:
+            for conn in wait(list(starting)):
+                index = starting.pop(conn)
+                try:
+                    status, _, _, detail = conn.recv()
+                except EOFError:
+                    raise RuntimeError(f"Embedding worker {index} exited during startup") from None
+                if status == "failed":
+                    raise RuntimeError(f"Embedding worker {index} failed to load the model: {detail}")
+
+    def _dispatch(self) -> None:
+        """Hand backlog tasks to idle workers; the caller holds the lock."""
+        while self._backlog and self._idle:
+            worker = self._idle.pop(0)
+            task = self._backlog.popleft()
+            self._in_flight[worker] = task[0]
+            self._task_queues[worker].put(task)
+
+    def _collect(self) -> None:
+        readers = {conn: index for index, conn in enumerate(self._results)}
+        last_check = time.monotonic()
+        while not self._stop.is_set():
+            for conn in wait(list(readers), timeout=_LIVENESS_INTERVAL_S):
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    # The worker is gone: reap it so that the check below sees it dead
+                    self._processes[readers.pop(conn)].join(timeout=1.0)
+                    last_check = 0.0
+                    continue
+                self._handle(*message)
+            if time.monotonic() - last_check >= _LIVENESS_INTERVAL_S:
+                last_check = time.monotonic()
+                self._check_workers()
+
+    def _handle(self, status: str, index: int, task_id: int, detail) -> None:
+        vectors = None
+        if status == "done":
+            # Unlink the block even if its caller is gone, or /dev/shm leaks
+            vectors = _read_block(*detail)
+        with self._lock:
+            future = self._pending.pop(task_id, None)
+            if self._in_flight.get(index) == task_id:
+                del self._in_flight[index]
+                if index not in self._dead:
+                    self._idle.append(index)
+            self._dispatch()
+        if future is None:
+            return
+        if status == "error":
+            future.set_exception(RuntimeError(detail))
+        else:
+            future.set_result(vectors)
+
+    def _check_workers(self) -> None:
+        """Fail the calls of workers that died; a crashed worker never answers."""
+        failed: List[Tuple[Future, str]] = []
+        with self._lock:
+            if self._closing:
+                return
+            for index, process in enumerate(self._processes):
+                if index in self._dead or process.is_alive():
+                    continue
+                self._dead.add(index)
+                if index in self._idle:
+                    self._idle.remove(index)
+                reason = f"Embedding worker {index} died (exit code {process.exitcode})"
+                logger.error(f"Процесс эмбеддингов {index} завершился (код {process.exitcode})")
+                task_id = self._in_flight.pop(index, None)
+                future = self._pending.pop(task_id, None) if task_id is not None else None
+                if future is not None:
+                    failed.append((future, reason))
+            if len(self._dead) == len(self._processes):
+                self._backlog.clear()
+                failed.extend((future, "All embedding workers died") for future in self._pending.values())
+                self._pending.clear()
+        for future, reason in failed:
+            future.set_exception(RuntimeError(reason))
+
+    def _submit(self, kind: str, texts: List[str]) -> Future:
+        future: Future = Future()
+        task_id = next(self._ids)
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("Embedding pool is closed")
+            if len(self._dead) == len(self._processes):
+                raise RuntimeError("All embedding workers died")
+            self._pending[task_id] = future
+            self._backlog.append((task_id, kind, texts))
+            self._dispatch()
+        return future
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        shards = 1 if len(texts) <= _SHARD_MIN_TEXTS else min(self.parallelism, len(texts) // _SHARD_MIN_TEXTS)
+        size = math.ceil(len(texts) / shards)
+        futures = [self._submit("documents", texts[start : start + size]) for start in range(0, len(texts), size)]
+        vectors: List[List[float]] = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit("query", [text]).result()[0]
+
+    def close(self) -> None:
+        """Stop the workers; pending calls fail."""
+        with self._lock:
+            self._closing = True
+            self._backlog.clear()
+        for index, tasks in enumerate(self._task_queues):
+            if index in self._dead or not self._processes[index].is_alive():
+                # Nobody reads this queue any more; don't wait on its feeder at exit
+                tasks.cancel_join_thread()
+            else:
+                tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        collector = getattr(self, "_collector", None)
+        if collector is not None:
+            self._stop.set()
+            collector.join(timeout=5)
+        # Results that arrived after the collector stopped still own a block
+        for conn in self._results:
+            try:
+                while conn.poll():
+                    message = conn.recv()
+                    if message[0] == "done":
+                        _read_block(*message[3])
+            except (EOFError, OSError):
+                pass
+            conn.close()
+        self._fail_pending("Embedding pool is closed")
+
+    def _fail_pending(self, reason: str) -> None:
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            future.set_exception(RuntimeError(reason))
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
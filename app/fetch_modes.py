@@ -0,0 +1,4 @@
+# How document pages are fetched (see http_fetcher.iterate_document_pages).
+# Kept apart from http_fetcher so that the CLI can list the modes without
+# importing httpx, selectolax and Playwright.
+FETCHER_MODES = ("browser", "http", "auto")
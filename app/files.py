@@ -0,0 +1,31 @@
+"""Small file helpers shared by the on-disk stores (page cache, checkpoints, ONNX exports)."""
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+from pathlib import Path
+
+
+_UNSAFE_FILENAME = re.compile(r"[^\w.-]")
+
+
+def safe_filename(name: str) -> str:
+    """`name` with every character that is not safe in a file name replaced by "_"."""
+    return _UNSAFE_FILENAME.sub("_", name)
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write via a temp file in the same directory so readers never see half a file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
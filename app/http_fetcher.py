@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+from typing import Callable, Iterator, List, Optional
+from urllib.parse import urljoin
+
+import httpx
+from loguru import logger
+from selectolax.lexbor import LexborHTMLParser
+
+from .fetch_modes import FETCHER_MODES
+from .metrics import StageMetrics, timed
+from .parallel_crawl import iterate_page_paragraphs_parallel
+from .parser import END_OF_DOCUMENT, iterate_page_paragraphs
+
+_DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0.0.0 Safari/537.36"
+)
+
+_WHITESPACE = re.compile(r"[ \t\r\n\f]+")
+
+
+class NotServerRenderedError(RuntimeError):
+    """The page cannot be crawled without a browser (JS-rendered content or pagination).
+
+    `url` is the page to continue from in the browser; `pages_yielded` is how
+    many pages were already produced over HTTP.
+    """
+
+    def __init__(self, message: str, url: str, pages_yielded: int) -> None:
+        super().__init__(message)
+        self.url = url
+        self.pages_yielded = pages_yielded
+
+
+def parse_paragraphs_html(html: str, content_selector: str) -> List[str]:
+    """Extract `<p>` texts inside the content container from raw HTML.
+
+    Whitespace is collapsed and `<br>` kept as a line break, the way the
+    browser's innerText renders normal text. Returns an empty list when there are no paragraphs, which callers
+    treat as "content is rendered by JavaScript".
+    """
+    return _parse_paragraphs(LexborHTMLParser(html), content_selector)
+
+
+def _parse_paragraphs(tree: LexborHTMLParser, content_selector: str) -> List[str]:
+    paragraphs: List[str] = []
+    for node in tree.css(f"{content_selector} p"):
+        text = _inner_text(node)
+        if text:
+            paragraphs.append(text)
+    return paragraphs
+
+
+def _inner_text(node) -> str:
+    """Text of `node` with whitespace collapsed within each `<br>`-separated line."""
+    lines: List[List[str]] = [[]]
+    for child in node.traverse(include_text=True):
+        if child.tag == "br":
+            lines.append([])
+        elif child.tag == "-text":
+            lines[-1].append(child.text_content or "")
+    return "\n".join(_WHITESPACE.sub(" ", "".join(parts)).strip() for parts in lines).strip()
+
+
+def find_next_url(html: str, current_url: str, next_selector: Optional[str], next_text: Optional[str]) -> tuple[Optional[str], bool]:
+    """Locate the next-page link the same way `_find_next_button` does.
+
+    Returns (url, found): url is the absolute href of the next link, or None;
+    found tells whether a matching control exists at all, so a control
+    without href (a JS button) can be told apart from the last page.
+    """
+    if not next_selector:
+        return None, False
+    tree = LexborHTMLParser(html)
+    link_text = next_text or "Следующая"
+    for node in tree.css(next_selector):
+        if link_text not in (node.text(deep=True) or ""):
+            continue
+        anchor = node
+        while anchor is not None and anchor.tag != "a":
+            anchor = anchor.parent
+        if anchor is None:
+            anchor = node.css_first("a[href]")
+        href = anchor.attributes.get("href") if anchor is not None else None
+        if not href or href.startswith("#") or href.lower().startswith("javascript:"):
+            return None, True
+        return urljoin(current_url, href), True
+    return None, False
+
+
+def iterate_page_paragraphs_http(
+    start_url: str,
+    max_pages: Optional[int] = None,
+    next_selector: Optional[str] = None,
+    next_text: Optional[str] = None,
+    content_selector: str = ".reader_article_body",
+    next_url_template: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    timeout_s: float = 15.0,
+    min_delay_s: float = 0.0,
+    client: Optional[httpx.Client] = None,
+    on_page: Optional[Callable[[List[str], str, str], None]] = None,
+    start_page: int = 1,
+    metrics: Optional[StageMetrics] = None,
+    on_end: Optional[Callable[[str], None]] = None,
+) -> Iterator[List[str]]:
+    """Yield paragraphs for each page fetched over plain HTTP, without a browser.
+
+    Same output contract as `iterate_page_paragraphs`. The next page is either
+    `next_url_template.format(page=N)` (N starting at start_page + 1) or the
+    href of the next control found by `next_selector`/`next_text`.
+
+    Raises NotServerRenderedError when a page has no paragraphs in its HTML
+    or the next control is not a plain link; the error carries the URL to
+    continue from in the browser (`.url`) and how many pages were yielded.
+
+    on_page, if given, is called with the paragraphs, the raw HTML of the
+    content container and the page URL just before each page is yielded.
+    With metrics, fetching, parsing and fingerprinting are timed as stages.
+    on_end is called with the reason the crawl stopped, as in
+    `iterate_page_paragraphs`. With next_url_template, the crawl ends at the
+    first page without a next control (END_OF_DOCUMENT), like the browser
+    crawlers; a missing or empty page before that is reported as "not_found".
+    """
+    own_client = client is None
+    if client is None:
+        client = httpx.Client(
+            headers={
+                "User-Agent": user_agent or _DEFAULT_USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
+            },
+            timeout=timeout_s,
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=4, max_connections=8),
+        )
+
+    try:
+        url: Optional[str] = start_url
+        visited: set[str] = set()
+        previous_hash: Optional[str] = None
+        page_count = 0
+        end_reason = END_OF_DOCUMENT
+        while url:
+            page_count += 1
+            logger.info(f"Текущая страница #{page_count} (HTTP): {url}")
+            with timed(metrics, "fetch"):
+                response = client.get(url)
+            if next_url_template and page_count > 1 and response.status_code == 404:
+                logger.info("Страница не найдена — завершаю.")
+                end_reason = "not_found"
+                break
+            response.raise_for_status()
+            html = response.text
+            visited.add(url)
+            visited.add(str(response.url))
+
+            with timed(metrics, "extract"):
+                tree = LexborHTMLParser(html)
+                paragraphs = _parse_paragraphs(tree, content_selector)
+            if metrics is not None:
+                metrics.inc("pages_crawled")
+                metrics.inc("paragraphs_crawled", len(paragraphs))
+            if not paragraphs:
+                if next_url_template and page_count > 1:
+                    logger.info("Пустая страница — завершаю.")
+                    end_reason = "not_found"
+                    break
+                raise NotServerRenderedError("Контент не найден в HTML страницы", url, page_count - 1)
+
+            with timed(metrics, "fingerprint"):
+                content_hash = hashlib.sha256("\n".join(paragraphs).encode("utf-8")).hexdigest()
+            if content_hash == previous_hash:
+                logger.info("Содержимое страницы не изменилось — завершаю пагинацию.")
+                end_reason = "repeated"
+                break
+            previous_hash = content_hash
+
+            if next_url_template:
+                # The template only addresses pages: the next control tells whether there is one
+                next_url: Optional[str] = None
+                if find_next_url(html, str(response.url), next_selector, next_text)[1]:
+                    next_url = next_url_template.format(page=start_page + page_count)
+            else:
+                next_url, found = find_next_url(html, str(response.url), next_selector, next_text)
+                if found and not next_url:
+                    # Pagination is driven by JavaScript: the browser continues from this page
+                    raise NotServerRenderedError("Кнопка 'Следующая' не является ссылкой", url, page_count - 1)
+
+            if on_page is not None:
+                page_html = "\n".join(node.html or "" for node in tree.css(content_selector))
+                on_page(paragraphs, page_html, str(response.url))
+            yield paragraphs
+
+            if max_pages and page_count >= max_pages:
+                logger.info("Достигнут предел max_pages — завершаю.")
+                end_reason = "max_pages"
+                break
+            if not next_url:
+                logger.info("Кнопка/ссылка 'Следующая' не найдена — завершаю.")
+                break
+            if next_url in visited:
+                logger.info("Ссылка ведёт на уже обработанную страницу — завершаю.")
+                end_reason = "repeated"
+                break
+            url = next_url
+            if min_delay_s > 0:
+                time.sleep(min_delay_s)
+        if on_end is not None:
+            on_end(end_reason)
+    finally:
+        if own_client:
+            client.close()
+
+
+def iterate_document_pages(
+    start_url: str,
+    fetcher: str = "browser",
+    max_pages: Optional[int] = None,
+    next_selector: Optional[str] = None,
+    next_text: Optional[str] = None,
+    content_selector: str = ".reader_article_body",
+    next_url_template: Optional[str] = None,
+    parallel_pages: int = 1,
+    on_page: Optional[Callable[[List[str], str, str], None]] = None,
+    start_page: int = 1,
+    metrics: Optional[StageMetrics] = None,
+    on_end: Optional[Callable[[str], None]] = None,
+    **browser_kwargs,
+) -> Iterator[List[str]]:
+    """Yield page paragraphs using the requested fetcher.
+
+    - "browser": `iterate_page_paragraphs` (Playwright)
+    - "http": `iterate_page_paragraphs_http`; fails on JS-rendered documents
+    - "auto": HTTP while pages are server-rendered, then the browser takes over
+      from the first page that needs it (or from the start URL if the first
+      page already does)
+
+    With parallel_pages > 1 and a next_url_template, the browser loads that
+    many pages at once (`iterate_page_paragraphs_parallel`); pages are still
+    yielded in order.
+
+    on_page is passed to whichever crawler runs: it sees every yielded page
+    with its raw HTML and URL, in order. start_page is the number of start_url
+    in next_url_template's numbering (for resumed crawls). metrics and on_end
+    (the reason the crawl stopped, END_OF_DOCUMENT for a complete document),
+    if given, are passed on the same way.
+    """
+    if fetcher not in FETCHER_MODES:
+        raise ValueError(f"Unknown fetcher: {fetcher}")
+
+    def _browser(url: str, pages_left: Optional[int]) -> Iterator[List[str]]:
+        if parallel_pages > 1 and next_url_template and url == start_url:
+            return iterate_page_paragraphs_parallel(
+                start_url=url,
+                page_url_template=next_url_template,
+                workers=parallel_pages,
+                max_pages=pages_left,
+                content_selector=content_selector,
+                headless=browser_kwargs.get("headless", True),
+                resource_policy=browser_kwargs.get("resource_policy"),
+                cdp_url=browser_kwargs.get("cdp_url"),
+                next_selector=next_selector,
+                next_text=next_text,
+                scroll_settle_timeout_ms=browser_kwargs.get("scroll_settle_timeout_ms", 1000),
+                on_page=on_page,
+                start_page=start_page,
+                metrics=metrics,
+                on_end=on_end,
+            )
+        return iterate_page_paragraphs(
+            start_url=url,
+            max_pages=pages_left,
+            next_selector=next_selector,
+            next_text=next_text,
+            content_selector=content_selector,
+            on_page=on_page,
+            metrics=metrics,
+            on_end=on_end,
+            **browser_kwargs,
+        )
+
+    if fetcher == "browser":
+        yield from _browser(start_url, max_pages)
+        return
+
+    try:
+        yield from iterate_page_paragraphs_http(
+            start_url=start_url,
+            max_pages=max_pages,
+            next_selector=next_selector,
+            next_text=next_text,
+            content_selector=content_selector,
+            next_url_template=next_url_template,
+            on_page=on_page,
+            start_page=start_page,
+            metrics=metrics,
+            on_end=on_end,
+        )
+    except NotServerRenderedError as err:
+        if fetcher == "http":
+            raise
+        pages_left = max_pages - err.pages_yielded if max_pages else None
+        logger.info(f"{err} — переключаюсь на браузер: {err.url}")
+        yield from _browser(err.url, pages_left)
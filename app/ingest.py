@@ -1,391 +1,867 @@
 from __future__ import annotations
 
-from typing import List, Optional
-from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from datetime import datetime
+import hashlib
+import json
 import re
+import time
+import uuid
 
 from loguru import logger
 
-from .parser import iterate_page_paragraphs, _trim_cross_page_overlap, _should_merge_cross_page
+from .async_parser import _should_merge_cross_page, _trim_cross_page_overlap
+from .parser import END_OF_DOCUMENT
+from .chunking import ArticleSplitter, load_token_counter_in_background
+from .checkpoint import Checkpoint, clear_checkpoint, load_checkpoint, save_checkpoint
+from .embed_batching import BUFFER_BATCHES, BucketedEmbedder, accumulate
+from .collection import (
+    COLLECTION_PROFILES,
+    connect,
+    bulk_load,
+    create_collection,
+    ensure_payload_indexes,
+)
+from .embedders import dense_model_name, embedding_dimension, make_dense_embeddings
+from .embedding_pool import EmbeddingPool
+from .embedding_adapters import (
+    CachedEmbeddings,
+    CachedSparseEmbeddings,
+    DeferredEmbeddings,
+    DeferredSparseEmbeddings,
+)
+from .embedding_cache import EmbeddingCache
+from .http_fetcher import iterate_document_pages
+from .metrics import REGISTRY, StageMetrics, timed
+from .options import ChunkOptions, CrawlOptions, EmbeddingOptions, StorageOptions, fold_legacy_options
+from .page_cache import PageCache
+from .pipeline import run_pipeline
+from .qdrant_writer import BulkWriter
+from .startup import STARTUP, StartupProfile, load_in_background
 from qdrant_client import QdrantClient
-from langchain_qdrant import QdrantVectorStore, FastEmbedSparse, RetrievalMode
-from langchain_huggingface import HuggingFaceEmbeddings
-from qdrant_client.http.models import VectorParams, Distance, SparseVectorParams
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import FastEmbedSparse
+from qdrant_client.http.models import (
+    PointStruct,
+    PointIdsList,
+    SparseVector,
+)
+
+
+_CHAPTER_PAT = re.compile(r"^Глава\s+(\d+)[\.:\-]?\s*(.*)$", re.IGNORECASE)
+_ARTICLE_NUM_PAT = re.compile(r"^Статья\s+(\d+)[\.|\-]?\s*(.*)$", re.IGNORECASE)
+
+
+@dataclass
+class _ChunkBatch:
+    """Finalized chunks of one page, with vectors once the embed stage ran.
+
+    `unchanged_ids` are chunks of the page already stored as is; `state` is
+    the chunker state to checkpoint once the batch is in Qdrant.
+    """
+
+    texts: List[str]
+    metadatas: List[dict]
+    ids: List[str]
+    dense: Optional[List[List[float]]] = None
+    sparse: Optional[list] = None
+    unchanged_ids: List[str] = field(default_factory=list)
+    state: Optional[dict] = None
 
 
 def ingest_document_to_qdrant(
     doc_id: str,
     start_url: str,
-    recreate: bool = True,
-    next_selector: Optional[str] = ".show-more",
-    next_text: Optional[str] = "Следующая",
-    content_selector: str = ".reader_article_body",
-    headless: bool = False,
-    max_pages: Optional[int] = None,
-    # Article chunking
-    article_regex: Optional[str] = r"^Статья\s+\d+[\.|\-]?",
-    disable_article_grouping: bool = False,
-    qdrant_url: Optional[str] = None,
-    qdrant_host: Optional[str] = None,
-    qdrant_port: Optional[int] = None,
-) -> None:
+    crawl: Optional[CrawlOptions] = None,
+    chunking: Optional[ChunkOptions] = None,
+    embedding: Optional[EmbeddingOptions] = None,
+    storage: Optional[StorageOptions] = None,
+    # Pipelined mode: crawl, chunk, embed and upsert run concurrently
+    pipelined: bool = False,
+    queue_size: int = 8,
+    # Crash-safe progress: checkpoint every N pages, continue with resume=True
+    checkpoint_dir: Optional[str] = None,
+    checkpoint_every: int = 10,
+    resume: bool = False,
+    # Append the per-stage metrics summary of the run to this JSONL file
+    metrics_file: Optional[str] = None,
+    # Flat options of the old signature (see app.options.LEGACY_OPTIONS)
+    **legacy_options: Any,
+) -> int:
     """Parse a document by pages, split to paragraphs and store chunks in a dedicated Qdrant collection.
 
+    Options are grouped by stage (see app.options): `crawl` (CrawlOptions),
+    `chunking` (ChunkOptions), `embedding` (EmbeddingOptions) and `storage`
+    (StorageOptions); defaults are used for groups not given. The flat
+    keyword arguments this function took before (e.g. max_pages=,
+    embedding_backend=) are still accepted with a DeprecationWarning.
+
     Each document goes to its own collection named f"{collection_prefix}{doc_id}".
-    If recreate=True, the previous chunks for this doc are removed (by payload filter) before upsert.
+    If storage.recreate=True, the collection is dropped and rebuilt. Otherwise the
+    collection is synchronized: point IDs are derived from (doc_id, chapter,
+    article number) and every payload carries a content hash, so only new or
+    changed chunks are embedded and upserted, and points whose articles
+    vanished are deleted, but only if the crawler reached the end of the
+    document (its on_end reason is END_OF_DOCUMENT); a crawl cut short by
+    crawl.max_pages, a click that changed nothing or a missing page keeps them.
+
+    With pipelined=True the crawl, chunk, embed and upsert stages run in separate
+    threads joined by bounded queues of `queue_size` pages, so the browser keeps
+    crawling while earlier pages are embedded and uploaded.
+
+    With crawl.page_cache_dir, every crawled page (paragraphs and raw HTML) is
+    kept in a PageCache. With crawl.replay=True pages are read from that cache instead of
+    being crawled, so chunking or embedding changes can be re-ingested offline.
+    With embedding.cache_dir, dense and sparse vectors of unchanged chunks are
+    taken from an EmbeddingCache instead of being recomputed.
+
+    With checkpoint_dir, progress is saved every `checkpoint_every` pages once
+    everything those pages produced is in Qdrant: the crawl position, the
+    held-back page and the open article. resume=True continues from that
+    checkpoint instead of start_url; the checkpoint is removed on success.
+
+    Articles longer than chunking.max_chunk_tokens (counted with the FRIDA
+    tokenizer) are split into parts on "1." / "а)" boundaries with
+    chunking.chunk_overlap_tokens of overlap; each part keeps the article metadata plus part_index/part_count.
+
+    Chunks are embedded across page boundaries: they are buffered until about
+    BUFFER_BATCHES model batches are collected, a checkpoint, the end of the
+    document or `embedding.max_delay` seconds after the first one, then embedded
+    in length-sorted batches of at most `embedding.batch_tokens` padded tokens.
+    `embedding.backend` selects how FRIDA runs on CPU: PyTorch, or an ONNX
+    export (optionally int8-quantized) cached in embedding.onnx_cache_dir. With
+    embedding.workers > 1 it runs in an EmbeddingPool of that many processes.
+    Models not passed in embedding.dense/sparse are loaded in the background while the collection is
+    prepared and the first page is fetched; a "Время запуска" line breaks the
+    startup down by phase (also recorded as startup_* stages).
+
+    Points are uploaded by a BulkWriter directly on QdrantClient: requests of
+    storage.upsert_batch_size points, storage.upsert_parallel of them in flight,
+    retried on failure, and acknowledged without waiting for indexing unless
+    storage.upsert_wait.
+    The payload layout (page_content, metadata) is the one QdrantVectorStore reads.
+
+    New collections are created with `storage.collection_profile` (see app.collection):
+    e.g. "bulk" builds the HNSW index only after the load. The vector size is
+    read from the model config. Keyword payload indexes on article and chapter
+    numbers are added to new and existing collections.
+
+    Every stage (page loads, clicks, dwell, extraction, fingerprinting, seam
+    merge, article aggregation, splitting, payloads, embedding, upserts) is timed into a StageMetrics
+    registered in app.metrics.REGISTRY, which start_metrics_server exposes
+    for scraping. A JSON summary of the counters and latency histograms is
+    logged at the end and appended to `metrics_file` if given.
+
+    Returns the number of uploaded chunks.
     """
-
-    # 1) Initialize embeddings and Qdrant (LangChain vector store)
-    dense_embeddings = HuggingFaceEmbeddings(model_name="ai-forever/FRIDA")
-    sparse_embeddings = FastEmbedSparse(model_name="Qdrant/bm25")
+    crawl, chunking, embedding, storage = fold_legacy_options(crawl, chunking, embedding, storage, legacy_options)
+    recreate = storage.recreate
+    dense_embeddings, sparse_embeddings = embedding.dense, embedding.sparse
+
+    metrics = REGISTRY.register(doc_id)
+    page_cache = PageCache(crawl.page_cache_dir) if crawl.page_cache_dir else None
+    checkpoint: Optional[Checkpoint] = None
+    if crawl.replay:
+        # Replay is fast enough to simply start over
+        checkpoint_dir = None
+    elif resume and checkpoint_dir:
+        checkpoint = load_checkpoint(checkpoint_dir, doc_id)
+        if checkpoint is None:
+            logger.warning("Контрольная точка не найдена — начинаю с начала документа.")
+        else:
+            logger.info(
+                f"Продолжаю с контрольной точки: обработано страниц {checkpoint.pages_done}, "
+                f"продолжение с {checkpoint.resume_url} (пропуск страниц: {checkpoint.resume_skip})"
+            )
+            # Points uploaded before the interruption must survive
+            recreate = False
+    if crawl.replay:
+        # Fail before the collection is touched
+        if page_cache is None:
+            raise ValueError("replay requires page_cache_dir")
+        if not page_cache.has_document(doc_id):
+            raise FileNotFoundError(f"Document {doc_id!r} is not in the page cache {page_cache.root}")
+
+    # 1) Load the models and the tokenizer in the background while the collection is prepared and the browser starts
+    startup = StartupProfile()
+    deferred: List[Union[DeferredEmbeddings, DeferredSparseEmbeddings]] = []
+    if dense_embeddings is None:
+        if embedding.workers > 1:
+            def _load_dense() -> Embeddings:
+                return EmbeddingPool(
+                    embedding.workers, backend=embedding.backend, onnx_cache_dir=embedding.onnx_cache_dir
+                )
+        else:
+            def _load_dense() -> Embeddings:
+                return make_dense_embeddings(
+                    embedding.backend, onnx_cache_dir=embedding.onnx_cache_dir, threads=embedding.threads
+                )
+        dense_embeddings = DeferredEmbeddings(
+            load_in_background(_load_dense, "FRIDA", lambda s: startup.record("dense_model", s)),
+            model_name=dense_model_name(embedding.backend),
+            parallelism=embedding.workers,
+        )
+        deferred.append(dense_embeddings)
+    if sparse_embeddings is None:
+        sparse_embeddings = DeferredSparseEmbeddings(
+            load_in_background(
+                lambda: FastEmbedSparse(model_name="Qdrant/bm25"), "BM25", lambda s: startup.record("sparse_model", s)
+            ),
+            model_name="Qdrant/bm25",
+        )
+        deferred.append(sparse_embeddings)
+    count_tokens = load_token_counter_in_background("ai-forever/FRIDA", lambda s: startup.record("tokenizer", s))
+    collection_started = time.perf_counter()
+    embedding_cache = None
+    if embedding.cache_dir:
+        embedding_cache = EmbeddingCache(embedding.cache_dir, max_bytes=embedding.cache_max_mb * 1024 * 1024)
+        dense_embeddings = CachedEmbeddings(dense_embeddings, embedding_cache)
+        sparse_embeddings = CachedSparseEmbeddings(sparse_embeddings, embedding_cache)
     collection_name = f"{doc_id}"
 
     # Create Qdrant client
-    if qdrant_url:
-        client = QdrantClient(url=qdrant_url, prefer_grpc=True)
-    elif qdrant_host:
-        client = QdrantClient(host=qdrant_host, port=qdrant_port or 6333, prefer_grpc=True)
-    else:
-        client = QdrantClient(path=":memory:")
+    client = connect(storage.qdrant_url, storage.qdrant_host, storage.qdrant_port)
+
+    collection_profile = storage.collection_profile
+    if isinstance(collection_profile, str):
+        collection_profile = COLLECTION_PROFILES[collection_profile]
 
     def _create_collection_if_needed() -> None:
         try:
-            dim = len(dense_embeddings.embed_query("test"))
+            dim = embedding_dimension(dense_embeddings)
         except Exception:
             dim = 768
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config={
-                "dense": VectorParams(size=dim, distance=Distance.COSINE),
-            },
-            sparse_vectors_config={
-                "sparse": SparseVectorParams(),
-            },
-        )
+        create_collection(client, collection_name, dim, collection_profile)
 
     # Recreate collection if requested, otherwise ensure it exists
+    existing_hashes: Dict[str, Optional[str]] = {}
     if recreate:
         try:
             client.delete_collection(collection_name=collection_name)
         except Exception:
             pass
         _create_collection_if_needed()
-        start_index = 0
     else:
         try:
             _ = client.get_collection(collection_name=collection_name)
         except Exception:
             _create_collection_if_needed()
-        # Continue IDs from current collection size to avoid overwriting points
+        else:
+            ensure_payload_indexes(client, collection_name)
+            existing_hashes = _load_content_hashes(client, collection_name)
+    startup.record("collection", time.perf_counter() - collection_started)
+
+    with bulk_load(client, collection_name, collection_profile):
+        # 2) Stream per page with cross-page seam merge
+        compiled = None
+        if chunking.article_regex and not chunking.disable_article_grouping:
+            compiled = re.compile(chunking.article_regex)
+        splitter = None
+        if chunking.max_chunk_tokens:
+            splitter = ArticleSplitter(
+                max_tokens=chunking.max_chunk_tokens,
+                overlap_tokens=chunking.chunk_overlap_tokens,
+                count_tokens=count_tokens,
+            )
+        embedder = BucketedEmbedder(
+            dense_embeddings,
+            sparse_embeddings,
+            max_batch_tokens=embedding.batch_tokens,
+            count_tokens=count_tokens,
+        )
+        recorder = None
+        # Pages before the first one of this crawl (non-zero when resuming)
+        page_offset = checkpoint.page_offset if checkpoint else 0
+        # URL of every page of this crawl, for the checkpoint's resume position
+        page_urls: List[Optional[str]] = []
+        # Reason the crawl stopped, reported by the crawler once it is done
+        crawl_end: List[str] = []
+        if crawl.replay:
+            pages = page_cache.iterate_pages(doc_id, max_pages=crawl.max_pages, on_end=crawl_end.append)
+        else:
+            if page_cache is not None:
+                recorder = page_cache.recorder(doc_id, start_url, resume_pages=page_offset if checkpoint else None)
+
+            def _on_page(paragraphs: List[str], html: Optional[str], url: Optional[str]) -> None:
+                page_urls.append(url)
+                if recorder is not None:
+                    recorder(paragraphs, html, url)
+
+            pages = iterate_document_pages(
+                start_url=checkpoint.resume_url if checkpoint else start_url,
+                fetcher=crawl.fetcher,
+                max_pages=(crawl.max_pages - page_offset) if crawl.max_pages else None,
+                next_selector=crawl.next_selector,
+                next_text=crawl.next_text,
+                content_selector=crawl.content_selector,
+                next_url_template=crawl.next_url_template,
+                parallel_pages=crawl.parallel_pages,
+                on_page=_on_page if (recorder is not None or checkpoint_dir) else None,
+                start_page=page_offset + 1,
+                headless=crawl.headless,
+                incremental=crawl.incremental,
+                resource_policy=crawl.resource_policy,
+                cdp_url=crawl.cdp_url,
+                metrics=metrics,
+                on_end=crawl_end.append,
+            )
+            if checkpoint:
+                pages = _skip_pages(pages, checkpoint.resume_skip)
+        pages = _time_first_page(pages, lambda seconds: startup.record("first_page", seconds))
+        uploaded = checkpoint.uploaded if checkpoint else 0
+        unchanged = 0
+        seen_ids: Set[str] = set(checkpoint.seen_ids) if checkpoint else set()
+
+        def _chunk_batches(page_stream: Iterable[List[str]]) -> Iterator[_ChunkBatch]:
+            return _iterate_chunk_batches(
+                page_stream,
+                compiled,
+                doc_id,
+                splitter=splitter,
+                state=checkpoint.chunker if checkpoint else None,
+                snapshot_every=checkpoint_every if checkpoint_dir else 0,
+                metrics=metrics,
+            )
+
+        def _changed_only(batches: Iterable[_ChunkBatch]) -> Iterator[_ChunkBatch]:
+            """Move chunks whose stored content hash is unchanged to unchanged_ids."""
+            for batch in batches:
+                changed = [
+                    existing_hashes.get(chunk_id) != batch.metadatas[idx]["content_hash"]
+                    for idx, chunk_id in enumerate(batch.ids)
+                ]
+                yield _ChunkBatch(
+                    texts=[text for text, keep in zip(batch.texts, changed) if keep],
+                    metadatas=[meta for meta, keep in zip(batch.metadatas, changed) if keep],
+                    ids=[chunk_id for chunk_id, keep in zip(batch.ids, changed) if keep],
+                    unchanged_ids=[chunk_id for chunk_id, keep in zip(batch.ids, changed) if not keep],
+                    state=batch.state,
+                )
+
+        def _coalesce(batches: Iterable[_ChunkBatch], poll: bool) -> Iterator[_ChunkBatch]:
+            """Merge consecutive page batches so the embedder sees enough chunks to bucket."""
+            for group in accumulate(
+                batches,
+                size=lambda batch: sum(count_tokens(text) for text in batch.texts),
+                max_size=BUFFER_BATCHES * embedding.batch_tokens,
+                max_delay_s=embedding.max_delay,
+                poll=poll,
+                # Checkpoints must not wait for a full buffer
+                flush_after=lambda batch: batch.state is not None,
+            ):
+                yield _merge_batches(group)
+
+        def _embed(batch: _ChunkBatch) -> None:
+            if batch.texts:
+                with metrics.time("embed"):
+                    batch.dense, batch.sparse = embedder.embed(batch.texts)
+                metrics.inc("chunks_embedded", len(batch.texts))
+
+        def _commit(batch: _ChunkBatch) -> None:
+            """Account for a batch that is in Qdrant and checkpoint if it carries state."""
+            nonlocal uploaded, unchanged
+            uploaded += len(batch.texts)
+            unchanged += len(batch.unchanged_ids)
+            metrics.inc("chunks_uploaded", len(batch.texts))
+            metrics.inc("chunks_unchanged", len(batch.unchanged_ids))
+            seen_ids.update(batch.ids)
+            seen_ids.update(batch.unchanged_ids)
+            if batch.state is None or not checkpoint_dir:
+                return
+            position = _resume_position(page_urls, batch.state["pages_done"] - page_offset)
+            if position is None:
+                return
+            resume_url, resume_skip = position
+            save_checkpoint(
+                checkpoint_dir,
+                Checkpoint(
+                    doc_id=doc_id,
+                    start_url=start_url,
+                    pages_done=batch.state["pages_done"],
+                    resume_url=resume_url,
+                    resume_skip=resume_skip,
+                    chunker=batch.state,
+                    seen_ids=sorted(seen_ids),
+                    uploaded=uploaded,
+                ),
+            )
+
+        writer = BulkWriter(
+            client,
+            collection_name,
+            batch_size=storage.upsert_batch_size,
+            # The embedded local mode is not thread-safe
+            parallel=storage.upsert_parallel if (storage.qdrant_url or storage.qdrant_host) else 1,
+            wait=storage.upsert_wait,
+            max_retries=storage.upsert_retries,
+            metrics=metrics,
+        )
+
+        def _write(batch: _ChunkBatch) -> None:
+            # Even empty batches go through the writer: their checkpoint must wait for earlier uploads
+            writer.write(_chunk_points(batch), on_written=lambda: _commit(batch))
+
         try:
-            start_index = client.count(collection_name=collection_name, exact=True).count
-        except Exception:
-            start_index = 0
-
-    # Vector store instance (HYBRID mode with named vectors)
-    vector_store = QdrantVectorStore(
-        client=client,
-        collection_name=collection_name,
-        embedding=dense_embeddings,
-        sparse_embedding=sparse_embeddings,
-        retrieval_mode=RetrievalMode.HYBRID,
-        vector_name="dense",
-        sparse_vector_name="sparse",
-        content_payload_key="page_content",
-        metadata_payload_key="metadata",
-    )
-
-    # 2) Stream per page with cross-page seam merge
-    compiled = re.compile(article_regex) if (not disable_article_grouping and article_regex) else None
-    any_uploaded = False
+            if pipelined:
+                def _embed_stage(batches: Iterable[_ChunkBatch]) -> Iterator[_ChunkBatch]:
+                    # Read upstream from a helper thread so the deadline fires while the crawl is slow
+                    for batch in _coalesce(batches, poll=True):
+                        _embed(batch)
+                        yield batch
+
+                def _upsert_stage(batches: Iterable[_ChunkBatch]) -> Iterator[_ChunkBatch]:
+                    try:
+                        for batch in batches:
+                            _write(batch)
+                            yield batch
+                    finally:
+                        # Checkpoint what reached Qdrant, also when another stage failed
+                        writer.flush()
+
+                run_pipeline(
+                    source=pages,
+                    stages=[
+                        ("chunk", lambda page_stream: _changed_only(_chunk_batches(page_stream))),
+                        ("embed", _embed_stage),
+                        ("upsert", _upsert_stage),
+                    ],
+                    queue_size=queue_size,
+                )
+            else:
+                # Uploads of one batch overlap with embedding the next
+                try:
+                    for batch in _coalesce(_changed_only(_chunk_batches(pages)), poll=False):
+                        _embed(batch)
+                        _write(batch)
+                finally:
+                    writer.flush()
+
+            if recorder is not None:
+                recorder.commit(crawl_end[-1] if crawl_end else None)
+            if checkpoint_dir:
+                clear_checkpoint(checkpoint_dir, doc_id)
+        finally:
+            writer.close()
+            if recorder is not None:
+                recorder.close()
+            logger.info(f"Пакеты FRIDA: {embedder.stats.summary()}")
+            if embedding_cache is not None:
+                logger.info(
+                    f"Кэш эмбеддингов: dense {dense_embeddings.stats.summary()}, "
+                    f"sparse {sparse_embeddings.stats.summary()}"
+                )
+                embedding_cache.close()
+            for model in deferred:
+                model.close()
+
+        deleted = 0
+        vanished = [chunk_id for chunk_id in existing_hashes if chunk_id not in seen_ids]
+        if vanished and seen_ids:
+            if crawl_end[-1:] != [END_OF_DOCUMENT]:
+                reason = crawl_end[-1] if crawl_end else "unknown"
+                logger.info(
+                    f"Обход не дошёл до конца документа ({reason}) — не удаляю отсутствующие чанки: {len(vanished)}"
+                )
+            else:
+                for start in range(0, len(vanished), 1000):
+                    client.delete(
+                        collection_name=collection_name,
+                        points_selector=PointIdsList(points=vanished[start : start + 1000]),
+                    )
+                deleted = len(vanished)
+                metrics.inc("chunks_deleted", deleted)
+
+    if not seen_ids:
+        logger.warning("Не удалось извлечь текст: пустой результат.")
+    else:
+        logger.info(
+            f"Загружено чанков: {uploaded} в коллекцию {collection_name} "
+            f"(без изменений: {unchanged}, удалено: {deleted})"
+        )
+    for model in deferred:
+        startup.record("model_wait", model.wait_s)
+    logger.info(f"Время запуска: {', '.join(filter(None, [STARTUP.summary(), startup.summary()]))}")
+    for phase, seconds in startup.phases.items():
+        metrics.observe(f"startup_{phase}", seconds)
+    _emit_metrics(metrics, metrics_file)
+    return uploaded
+
+
+def _time_first_page(pages: Iterable[List[str]], on_first: Callable[[float], None]) -> Iterator[List[str]]:
+    """Pass pages through, reporting how long the first one took from the start of the crawl."""
+    started = time.perf_counter()
+    for idx, page in enumerate(pages):
+        if idx == 0:
+            on_first(time.perf_counter() - started)
+        yield page
+
+
+def _emit_metrics(metrics: StageMetrics, metrics_file: Optional[str]) -> None:
+    summary = metrics.to_json()
+    logger.info(f"Метрики загрузки: {summary}")
+    if metrics_file:
+        with open(metrics_file, "a", encoding="utf-8") as fh:
+            fh.write(summary + "\n")
+
+
+def point_id(
+    doc_id: str,
+    chapter_number: Optional[str],
+    article_number: Optional[str],
+    occurrence: int = 1,
+    part_index: Optional[int] = None,
+) -> str:
+    """Deterministic Qdrant point ID (a UUID) of a chunk.
+
+    The same article of the same document always maps to the same point, so
+    re-ingesting overwrites it in place. `occurrence` tells apart chunks with
+    the same key (e.g. pages when article grouping is disabled); part_index
+    the parts of a split article.
+    """
+    key = f"{doc_id}\x1f{chapter_number or ''}\x1f{article_number or ''}\x1f{occurrence}"
+    if part_index:
+        key += f"\x1f{part_index}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"gov-ru-parser:{key}"))
+
+
+def _content_hash(text: str, payload: dict) -> str:
+    """Hash of what is stored for a chunk: its text and payload (without upload_time)."""
+    digest = hashlib.sha256(text.encode("utf-8"))
+    digest.update(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _load_content_hashes(client: QdrantClient, collection_name: str) -> Dict[str, Optional[str]]:
+    """Map every point ID in the collection to its stored content hash (None if absent)."""
+    hashes: Dict[str, Optional[str]] = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=1024,
+            offset=offset,
+            with_payload=["metadata.content_hash"],
+            with_vectors=False,
+        )
+        for point in points:
+            metadata = (point.payload or {}).get("metadata") or {}
+            hashes[str(point.id)] = metadata.get("content_hash")
+        if offset is None:
+            return hashes
+
+
+def _as_list(values) -> list:
+    # Vectors usually already are lists; copy only other sequences (arrays, tuples)
+    return values if isinstance(values, list) else list(values)
+
+
+def _chunk_points(batch: _ChunkBatch) -> List[PointStruct]:
+    """Points of pre-embedded chunks, in the payload layout of QdrantVectorStore."""
+    return [
+        PointStruct(
+            id=batch.ids[idx],
+            vector={
+                "dense": _as_list(batch.dense[idx]),
+                "sparse": SparseVector(
+                    indices=_as_list(batch.sparse[idx].indices),
+                    values=_as_list(batch.sparse[idx].values),
+                ),
+            },
+            payload={"page_content": batch.texts[idx], "metadata": batch.metadatas[idx]},
+        )
+        for idx in range(len(batch.texts))
+    ]
+
+
+def _merge_batches(batches: List[_ChunkBatch]) -> _ChunkBatch:
+    """Concatenate consecutive batches; the merged one carries the last state snapshot."""
+    if len(batches) == 1:
+        return batches[0]
+    merged = _ChunkBatch(texts=[], metadatas=[], ids=[])
+    for batch in batches:
+        merged.texts.extend(batch.texts)
+        merged.metadatas.extend(batch.metadatas)
+        merged.ids.extend(batch.ids)
+        merged.unchanged_ids.extend(batch.unchanged_ids)
+        if batch.state is not None:
+            merged.state = batch.state
+    return merged
+
+
+def _resume_position(page_urls: List[Optional[str]], consumed: int) -> Optional[Tuple[str, int]]:
+    """Where to resume after the first `consumed` pages of this crawl.
+
+    Returns the URL of the last consumed page and how many pages crawled from
+    it to skip ("show more" pages share one URL), or None without a URL.
+    """
+    last = consumed - 1
+    if page_urls[last] is None:
+        return None
+    first = last
+    while first > 0 and page_urls[first - 1] == page_urls[last]:
+        first -= 1
+    return page_urls[last], last - first + 1
+
+
+def _skip_pages(pages: Iterable[List[str]], count: int) -> Iterator[List[str]]:
+    """Drop the first `count` pages (already consumed before a resume)."""
+    pages = iter(pages)
+    for _ in range(count):
+        if next(pages, None) is None:
+            return
+    yield from pages
+
+
+def _iterate_chunk_batches(
+    pages: Iterable[List[str]],
+    compiled: Optional[re.Pattern[str]],
+    doc_id: str,
+    splitter: Optional[ArticleSplitter] = None,
+    state: Optional[dict] = None,
+    snapshot_every: int = 0,
+    metrics: Optional[StageMetrics] = None,
+) -> Iterator[_ChunkBatch]:
+    """Turn a stream of page paragraphs into batches of finalized chunks.
+
+    A page is held back until the next one arrives so the seam between them
+    can be merged. With `compiled` set, paragraphs are grouped into articles
+    across pages; otherwise every page becomes a single chunk.
+    With a splitter, chunks over its token budget are split into parts.
+    IDs are derived from doc_id, chapter and article number (see point_id)
+    and every payload gets a content_hash.
+
+    One batch is yielded per consumed page (possibly without chunks) and one
+    for the final flush. With snapshot_every=N, the batch of every Nth page
+    carries the chunker state after that page; passing it back as `state`
+    continues chunking from there.
+
+    With metrics, seam merging, article aggregation, splitting and payload
+    construction are timed as stages.
+    """
+    aggregator = _ArticleAggregator(compiled) if compiled is not None else None
     prev_paras: List[str] | None = None
-    # Cross-page article aggregator state (when grouping enabled)
-    chapter_pat = re.compile(r"^Глава\s+(\d+)[\.:\-]?\s*(.*)$", re.IGNORECASE)
-    article_num_pat = re.compile(r"^Статья\s+(\d+)[\.|\-]?\s*(.*)$", re.IGNORECASE)
-    last_chapter_meta: dict = {}
-    current_article_paras: List[str] = []
-    current_article_meta: dict | None = None
-
-    for page_paras in iterate_page_paragraphs(
-        start_url=start_url,
-        max_pages=max_pages,
-        next_selector=next_selector,
-        next_text=next_text,
-        headless=headless,
-        content_selector=content_selector,
-    ):
-        if not page_paras:
-            continue
+    occurrences: Dict[tuple, int] = {}
+    pages_done = 0
+    if state:
+        pages_done = state["pages_done"]
+        prev_paras = state["prev_paras"]
+        if aggregator is not None and state.get("aggregator"):
+            aggregator.restore(state["aggregator"])
+        occurrences = {tuple(item[:-1]): item[-1] for item in state["occurrences"]}
+
+    def _snapshot() -> dict:
+        return {
+            "pages_done": pages_done,
+            "prev_paras": list(prev_paras) if prev_paras is not None else None,
+            "aggregator": aggregator.state() if aggregator is not None else None,
+            "occurrences": [[*key, count] for key, count in occurrences.items()],
+        }
+
+    def _make_batch(texts: List[str], payloads: List[dict]) -> _ChunkBatch:
+        if splitter is not None:
+            with timed(metrics, "split"):
+                texts, payloads = _split_long_chunks(texts, payloads, splitter)
+        started = time.perf_counter()
+        now_str = datetime.now().astimezone().isoformat(timespec='seconds')
+        metadatas: List[dict] = []
+        ids: List[str] = []
+        for idx in range(len(texts)):
+            key = (
+                payloads[idx].get("chapter_number"),
+                payloads[idx].get("article_number"),
+                payloads[idx].get("part_index"),
+            )
+            occurrences[key] = occurrences.get(key, 0) + 1
+            ids.append(point_id(doc_id, key[0], key[1], occurrences[key], key[2]))
+            metadatas.append({
+                **payloads[idx],
+                "content_hash": _content_hash(texts[idx], payloads[idx]),
+                "upload_time": now_str,
+            })
+        if metrics is not None:
+            metrics.observe("payload", time.perf_counter() - started)
+        return _ChunkBatch(texts=texts, metadatas=metadatas, ids=ids)
+
+    for page_paras in pages:
+        pages_done += 1
+        texts: List[str] = []
+        payloads: List[dict] = []
+        if page_paras and prev_paras is None:
+            prev_paras = list(page_paras)
+        elif page_paras:
+            with timed(metrics, "seam_merge"):
+                page_paras = _merge_page_seam(prev_paras, list(page_paras))
+
+            # Emit finalized articles/chunks from previous page
+            if prev_paras:
+                if aggregator is not None:
+                    with timed(metrics, "aggregate"):
+                        texts, payloads = _dedup_articles(*aggregator.feed(prev_paras))
+                else:
+                    # Grouping disabled: whole page as a single chunk
+                    texts, payloads = ["\n\n".join(prev_paras)], [{}]
 
-        if prev_paras is None:
+            # Move buffer to current page (post-merge)
             prev_paras = list(page_paras)
-            continue
 
-        # Merge seam between prev_paras tail and current head
-        if prev_paras and page_paras:
-            trimmed_head = _trim_cross_page_overlap(prev_paras[-1], page_paras[0])
-            if _should_merge_cross_page(prev_paras[-1], trimmed_head):
-                if prev_paras[-1].endswith("-"):
-                    prev_paras[-1] = prev_paras[-1][:-1] + trimmed_head.lstrip()
-                else:
-                    tail = prev_paras[-1].rstrip()
-                    head = trimmed_head.lstrip()
-                    if tail and head and tail[-1].isalpha() and head[0].isalpha():
-                        prev_paras[-1] = tail + head
-                    else:
-                        prev_paras[-1] = tail + " " + head
-                page_paras = page_paras[1:]
-            else:
-                page_paras[0] = trimmed_head
-                if not page_paras[0].strip():
-                    page_paras = page_paras[1:]
-
-        # Upsert finalized articles/chunks from previous page
-        if prev_paras:
-            if compiled is not None:
-                # Stream paragraphs through the cross-page aggregator
-                finished_chunks: List[str] = []
-                finished_payloads: List[dict] = []
-                for para in prev_paras:
-                    ch_m = chapter_pat.match(para)
-                    if ch_m:
-                        # Update chapter context for subsequent articles
-                        last_chapter_meta = {
-                            "chapter_number": ch_m.group(1),
-                            "chapter_title": (ch_m.group(2).strip() if ch_m.group(2) else ""),
-                        }
-                        continue
-                    if compiled.match(para):
-                        # Flush previous article if exists
-                        if current_article_paras:
-                            finished_chunks.append("\n\n".join(current_article_paras))
-                            finished_payloads.append(current_article_meta or {})
-                            current_article_paras = []
-                            current_article_meta = None
-                        # Start new article
-                        current_article_paras = [para]
-                        a_m = article_num_pat.match(para)
-                        article_number = a_m.group(1) if a_m else ""
-                        article_title = (a_m.group(2).strip() if a_m and a_m.group(2) else "")
-                        current_article_meta = {
-                            "article_number": article_number,
-                            "article_title": article_title,
-                            **last_chapter_meta,
-                        }
-                    else:
-                        if current_article_paras:
-                            current_article_paras.append(para)
-                        else:
-                            # Skip preface before the first article
-                            continue
-
-                # Upsert any finished chunks from this page
-                if finished_chunks:
-                    now_str = datetime.now().astimezone().isoformat(timespec='seconds')
-                    # Deduplicate by article identity; keep the longest text per key
-                    dedup_map: dict[tuple, tuple[str, dict]] = {}
-                    order: List[tuple] = []
-                    for idx in range(len(finished_chunks)):
-                        text = finished_chunks[idx]
-                        meta = finished_payloads[idx] if idx < len(finished_payloads) else {}
-                        key = (
-                            meta.get("chapter_number"),
-                            meta.get("chapter_title"),
-                            meta.get("article_number"),
-                            meta.get("article_title"),
-                        )
-                        if key not in dedup_map:
-                            dedup_map[key] = (text, meta)
-                            order.append(key)
-                        else:
-                            if len(text) > len(dedup_map[key][0]):
-                                dedup_map[key] = (text, meta)
-                    texts_out: List[str] = []
-                    metas_out: List[dict] = []
-                    for key in order:
-                        t, m = dedup_map[key]
-                        texts_out.append(t)
-                        metas_out.append(m)
-                    metadatas: List[dict] = []
-                    ids: List[int] = []
-                    for idx in range(len(texts_out)):
-                        metadatas.append({**metas_out[idx], "upload_time": now_str})
-                        ids.append(start_index + idx)
-                    vector_store.add_texts(texts=texts_out, metadatas=metadatas, ids=ids)
-                    start_index += len(texts_out)
-                    any_uploaded = True
-            else:
-                # Grouping disabled: upsert whole page as a single chunk
-                page_chunks = ["\n\n".join(prev_paras)]
-                page_payloads = [{}]
-                now_str = datetime.now().astimezone().isoformat(timespec='seconds')
-                metadatas: List[dict] = []
-                ids: List[int] = []
-                for idx in range(len(page_chunks)):
-                    extra = page_payloads[idx] if page_payloads and idx < len(page_payloads) else {}
-                    metadatas.append({**extra, "upload_time": now_str})
-                    ids.append(start_index + idx)
-                vector_store.add_texts(texts=page_chunks, metadatas=metadatas, ids=ids)
-                start_index += len(page_chunks)
-                any_uploaded = True
-
-        # Move buffer to current page (post-merge)
-        prev_paras = list(page_paras)
+        batch = _make_batch(texts, payloads)
+        if snapshot_every and pages_done % snapshot_every == 0:
+            batch.state = _snapshot()
+        yield batch
 
     # Flush last buffered page
     if prev_paras:
-        if compiled is not None:
-            # Process remaining paragraphs and flush the last open article
-            finished_chunks: List[str] = []
-            finished_payloads: List[dict] = []
-            for para in prev_paras:
-                ch_m = chapter_pat.match(para)
-                if ch_m:
-                    last_chapter_meta = {
-                        "chapter_number": ch_m.group(1),
-                        "chapter_title": (ch_m.group(2).strip() if ch_m.group(2) else ""),
-                    }
-                    continue
-                if compiled.match(para):
-                    if current_article_paras:
-                        finished_chunks.append("\n\n".join(current_article_paras))
-                        finished_payloads.append(current_article_meta or {})
-                        current_article_paras = []
-                        current_article_meta = None
-                    current_article_paras = [para]
-                    a_m = article_num_pat.match(para)
-                    article_number = a_m.group(1) if a_m else ""
-                    article_title = (a_m.group(2).strip() if a_m and a_m.group(2) else "")
-                    current_article_meta = {
-                        "article_number": article_number,
-                        "article_title": article_title,
-                        **last_chapter_meta,
-                    }
-                else:
-                    if current_article_paras:
-                        current_article_paras.append(para)
-                    else:
-                        continue
-            # Flush the last open article
-            if current_article_paras:
-                finished_chunks.append("\n\n".join(current_article_paras))
-                finished_payloads.append(current_article_meta or {})
-                current_article_paras = []
-                current_article_meta = None
-
-            if finished_chunks:
-                now_str = datetime.now().astimezone().isoformat(timespec='seconds')
-                # Deduplicate by article identity; keep the longest text per key
-                dedup_map: dict[tuple, tuple[str, dict]] = {}
-                order: List[tuple] = []
-                for idx in range(len(finished_chunks)):
-                    text = finished_chunks[idx]
-                    meta = finished_payloads[idx] if idx < len(finished_payloads) else {}
-                    key = (
-                        meta.get("chapter_number"),
-                        meta.get("chapter_title"),
-                        meta.get("article_number"),
-                        meta.get("article_title"),
-                    )
-                    if key not in dedup_map:
-                        dedup_map[key] = (text, meta)
-                        order.append(key)
-                    else:
-                        if len(text) > len(dedup_map[key][0]):
-                            dedup_map[key] = (text, meta)
-                texts_out: List[str] = []
-                metas_out: List[dict] = []
-                for key in order:
-                    t, m = dedup_map[key]
-                    texts_out.append(t)
-                    metas_out.append(m)
-                metadatas: List[dict] = []
-                ids: List[int] = []
-                for idx in range(len(texts_out)):
-                    metadatas.append({**metas_out[idx], "upload_time": now_str})
-                    ids.append(start_index + idx)
-                vector_store.add_texts(texts=texts_out, metadatas=metadatas, ids=ids)
-                start_index += len(texts_out)
-                any_uploaded = True
+        if aggregator is not None:
+            chunks, payloads = aggregator.feed(prev_paras)
+            tail_chunks, tail_payloads = aggregator.flush()
+            texts, payloads = _dedup_articles(chunks + tail_chunks, payloads + tail_payloads)
         else:
-            page_chunks = ["\n\n".join(prev_paras)]
-            page_payloads = [{}]
-            now_str = datetime.now().astimezone().isoformat(timespec='seconds')
-            metadatas: List[dict] = []
-            ids: List[int] = []
-            for idx in range(len(page_chunks)):
-                extra = page_payloads[idx] if page_payloads and idx < len(page_payloads) else {}
-                metadatas.append({**extra, "upload_time": now_str})
-                ids.append(start_index + idx)
-            vector_store.add_texts(texts=page_chunks, metadatas=metadatas, ids=ids)
-            start_index += len(page_chunks)
-            any_uploaded = True
-
-    if not any_uploaded:
-        logger.warning("Не удалось извлечь текст: пустой результат.")
-    else:
-        logger.info(f"Загружено чанков: {start_index} в коллекцию {collection_name}")
+            texts, payloads = ["\n\n".join(prev_paras)], [{}]
+        if texts:
+            yield _make_batch(texts, payloads)
 
 
-def _group_paragraphs_into_articles_with_payload(
-    paragraphs: List[str], pattern: re.Pattern[str]
+def _split_long_chunks(
+    texts: List[str], payloads: List[dict], splitter: ArticleSplitter
 ) -> tuple[List[str], List[dict]]:
-    """Group paragraphs into article-sized chunks and derive payload metadata.
-
-    Metadata per chunk:
-    - article_number, article_title (split heading into number/title when possible)
-    - chapter_number, chapter_title (if preceding heading paragraph matches chapter pattern)
-    """
-    chunks: List[str] = []
-    payloads: List[dict] = []
-
-    chapter_pat = re.compile(r"^Глава\s+(\d+)[\.:\-]?\s*(.*)$", re.IGNORECASE)
-    article_num_pat = re.compile(r"^Статья\s+(\d+)[\.|\-]?\s*(.*)$", re.IGNORECASE)
-
-    current: List[str] = []
-    current_meta: dict = {}
-    last_chapter_meta: dict = {}
-
-    for para in paragraphs:
-        ch_m = chapter_pat.match(para)
-        if ch_m:
-            # Update current chapter context
-            last_chapter_meta = {
-                "chapter_number": ch_m.group(1),
-                "chapter_title": ch_m.group(2).strip() if ch_m.group(2) else "",
-            }
-            # Don't include chapter header into article text
+    """Replace over-long chunks with their parts; parts inherit the payload."""
+    texts_out: List[str] = []
+    payloads_out: List[dict] = []
+    for text, payload in zip(texts, payloads):
+        # Article chunks start with their heading paragraph
+        heading = text.split("\n\n", 1)[0] if "article_number" in payload else None
+        parts = splitter.split(text, heading=heading)
+        if len(parts) == 1:
+            texts_out.append(text)
+            payloads_out.append(payload)
             continue
+        for part_index, part in enumerate(parts, start=1):
+            texts_out.append(part)
+            payloads_out.append({**payload, "part_index": part_index, "part_count": len(parts)})
+    return texts_out, payloads_out
+
 
-        if pattern.match(para):
-            # Flush previous article
-            if current:
-                chunks.append("\n\n".join(current))
-                payloads.append(current_meta)
-                current = []
-                current_meta = {}
-
-            # Start new article
-            current.append(para)
-            a_m = article_num_pat.match(para)
-            article_number = a_m.group(1) if a_m else ""
-            article_title = (a_m.group(2).strip() if a_m and a_m.group(2) else "")
-            current_meta = {
-                "article_number": article_number,
-                "article_title": article_title,
-                **last_chapter_meta
-            }
+def _merge_page_seam(prev_paras: List[str], page_paras: List[str]) -> List[str]:
+    """Merge the seam between the tail of `prev_paras` and the head of `page_paras`.
+
+    Updates the last paragraph of `prev_paras` in place when the new page
+    continues it and returns the remaining paragraphs of the new page.
+    """
+    if not prev_paras or not page_paras:
+        return page_paras
+    trimmed_head = _trim_cross_page_overlap(prev_paras[-1], page_paras[0])
+    if _should_merge_cross_page(prev_paras[-1], trimmed_head):
+        if prev_paras[-1].endswith("-"):
+            prev_paras[-1] = prev_paras[-1][:-1] + trimmed_head.lstrip()
         else:
-            if current:
-                current.append(para)
+            tail = prev_paras[-1].rstrip()
+            head = trimmed_head.lstrip()
+            if tail and head and tail[-1].isalpha() and head[0].isalpha():
+                prev_paras[-1] = tail + head
             else:
-                # Skip preface before the first article
-                continue
+                prev_paras[-1] = tail + " " + head
+        return page_paras[1:]
+    page_paras[0] = trimmed_head
+    if not page_paras[0].strip():
+        return page_paras[1:]
+    return page_paras
 
-    if current:
-        chunks.append("\n\n".join(current))
-        payloads.append(current_meta)
 
-    return chunks, payloads
+class _ArticleAggregator:
+    """Cross-page article grouping state.
 
+    Paragraphs are fed page by page; an article is only finished when the next
+    article heading is seen (or on flush), so articles spanning several pages
+    stay in one chunk. Chapter headings update the context attached to the
+    following articles and are not included in the article text.
+    """
 
+    def __init__(self, pattern: re.Pattern[str]) -> None:
+        self.pattern = pattern
+        self.last_chapter_meta: dict = {}
+        self.current_article_paras: List[str] = []
+        self.current_article_meta: dict | None = None
+
+    def feed(self, paragraphs: Iterable[str]) -> tuple[List[str], List[dict]]:
+        """Consume paragraphs and return the articles finished by them."""
+        finished_chunks: List[str] = []
+        finished_payloads: List[dict] = []
+        for para in paragraphs:
+            ch_m = _CHAPTER_PAT.match(para)
+            if ch_m:
+                # Update chapter context for subsequent articles
+                self.last_chapter_meta = {
+                    "chapter_number": ch_m.group(1),
+                    "chapter_title": (ch_m.group(2).strip() if ch_m.group(2) else ""),
+                }
+                continue
+            if self.pattern.match(para):
+                # Flush previous article if exists
+                if self.current_article_paras:
+                    finished_chunks.append("\n\n".join(self.current_article_paras))
+                    finished_payloads.append(self.current_article_meta or {})
+                # Start new article
+                self.current_article_paras = [para]
+                a_m = _ARTICLE_NUM_PAT.match(para)
+                article_number = a_m.group(1) if a_m else ""
+                article_title = (a_m.group(2).strip() if a_m and a_m.group(2) else "")
+                self.current_article_meta = {
+                    "article_number": article_number,
+                    "article_title": article_title,
+                    **self.last_chapter_meta,
+                }
+            elif self.current_article_paras:
+                self.current_article_paras.append(para)
+            # Otherwise skip preface before the first article
+        return finished_chunks, finished_payloads
+
+    def state(self) -> dict:
+        """JSON-serializable copy of the grouping state (for checkpoints)."""
+        return {
+            "last_chapter_meta": dict(self.last_chapter_meta),
+            "current_article_paras": list(self.current_article_paras),
+            "current_article_meta": dict(self.current_article_meta) if self.current_article_meta else None,
+        }
+
+    def restore(self, state: dict) -> None:
+        self.last_chapter_meta = dict(state["last_chapter_meta"])
+        self.current_article_paras = list(state["current_article_paras"])
+        self.current_article_meta = state["current_article_meta"]
+
+    def flush(self) -> tuple[List[str], List[dict]]:
+        """Finish the open article, if any."""
+        if not self.current_article_paras:
+            return [], []
+        chunks = ["\n\n".join(self.current_article_paras)]
+        payloads = [self.current_article_meta or {}]
+        self.current_article_paras = []
+        self.current_article_meta = None
+        return chunks, payloads
+
+
+def _dedup_articles(chunks: List[str], payloads: List[dict]) -> tuple[List[str], List[dict]]:
+    """Deduplicate by article identity; keep the longest text per key."""
+    dedup_map: dict[tuple, tuple[str, dict]] = {}
+    order: List[tuple] = []
+    for idx in range(len(chunks)):
+        text = chunks[idx]
+        meta = payloads[idx] if idx < len(payloads) else {}
+        key = (
+            meta.get("chapter_number"),
+            meta.get("chapter_title"),
+            meta.get("article_number"),
+            meta.get("article_title"),
+        )
+        if key not in dedup_map:
+            dedup_map[key] = (text, meta)
+            order.append(key)
+        elif len(text) > len(dedup_map[key][0]):
+            dedup_map[key] = (text, meta)
+    texts_out: List[str] = []
+    metas_out: List[dict] = []
+    for key in order:
+        t, m = dedup_map[key]
+        texts_out.append(t)
+        metas_out.append(m)
+    return texts_out, metas_out
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (
+    1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000,
+)
+# Documents kept by the registry for the scrape endpoint
+MAX_REGISTERED_DOCUMENTS = 1000
+METRICS_PREFIX = "gov_ru_parser"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets; percentiles are bucket upper bounds."""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = DEFAULT_BUCKETS_MS) -> None:
+        self.buckets_ms = buckets_ms
+        # One count per bucket plus the +Inf bucket
+        self.counts: List[int] = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(self.buckets_ms[idx], self.max_ms) if idx < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class StageMetrics:
+    """Counters and per-stage latency histograms of one document's ingest.
+
+    Stages are timed with `time(stage)` (usable around awaits as well) or
+    reported with `observe`; counters are bumped with `inc`. Thread-safe:
+    the crawler, pipeline stages and upload threads share one instance.
+    """
+
+    def __init__(self, doc_id: str) -> None:
+        self.doc_id = doc_id
+        self.started = time.time()
+        self.counters: Dict[str, float] = {}
+        self.stages: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds * 1000)
+
+    @contextlib.contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "doc_id": self.doc_id,
+                "elapsed_s": round(time.time() - self.started, 2),
+                "counters": dict(self.counters),
+                "stages": {stage: histogram.summary() for stage, histogram in self.stages.items()},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), ensure_ascii=False)
+
+
+def timed(metrics: Optional[StageMetrics], stage: str) -> ContextManager[None]:
+    """`metrics.time(stage)`, or a no-op when metrics are not collected."""
+    return metrics.time(stage) if metrics is not None else contextlib.nullcontext()
+
+
+class MetricsRegistry:
+    """The StageMetrics of the documents ingested by this process, for scraping."""
+
+    def __init__(self, max_documents: int = MAX_REGISTERED_DOCUMENTS) -> None:
+        self.max_documents = max_documents
+        self._documents: "OrderedDict[str, StageMetrics]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, doc_id: str) -> StageMetrics:
+        """Fresh metrics for `doc_id`, replacing those of an earlier run of the same document."""
+        metrics = StageMetrics(doc_id)
+        with self._lock:
+            self._documents.pop(doc_id, None)
+            self._documents[doc_id] = metrics
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        return metrics
+
+    def documents(self) -> List[StageMetrics]:
+        with self._lock:
+            return list(self._documents.values())
+
+    def render_prometheus(self) -> str:
+        """All documents in the Prometheus text exposition format, labelled by doc_id."""
+        counter_lines: List[str] = []
+        histogram_lines: List[str] = []
+        for metrics in self.documents():
+            doc = _label_value(metrics.doc_id)
+            with metrics._lock:
+                counters = dict(metrics.counters)
+                stages = {stage: (list(h.counts), h.buckets_ms, h.count, h.total_ms) for stage, h in metrics.stages.items()}
+            for name, value in sorted(counters.items()):
+                counter_lines.append(f'{METRICS_PREFIX}_events_total{{doc_id="{doc}",event="{_label_value(name)}"}} {value}')
+            for stage, (counts, buckets_ms, count, total_ms) in sorted(stages.items()):
+                labels = f'doc_id="{doc}",stage="{_label_value(stage)}"'
+                cumulative = 0
+                for bound, bucket_count in zip(buckets_ms, counts):
+                    cumulative += bucket_count
+                    histogram_lines.append(
+                        f'{METRICS_PREFIX}_stage_seconds_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}'
+                    )
+                histogram_lines.append(f'{METRICS_PREFIX}_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                histogram_lines.append(f"{METRICS_PREFIX}_stage_seconds_sum{{{labels}}} {total_ms / 1000:.6f}")
+                histogram_lines.append(f"{METRICS_PREFIX}_stage_seconds_count{{{labels}}} {count}")
+        lines = [
+            f"# HELP {METRICS_PREFIX}_events_total Ingest events (pages, chunks, retries, ...) per document.",
+            f"# TYPE {METRICS_PREFIX}_events_total counter",
+            *counter_lines,
+            f"# HELP {METRICS_PREFIX}_stage_seconds Latency of ingest stages per document.",
+            f"# TYPE {METRICS_PREFIX}_stage_seconds histogram",
+            *histogram_lines,
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve GET /metrics (Prometheus text format) from a daemon thread; returns the server."""
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - http.server signature
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Метрики доступны на http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from loguru import logger
+from langchain_core.embeddings import Embeddings
+
+from .embedders import DEFAULT_ONNX_CACHE_DIR, DENSE_MODEL_NAME
+from .files import safe_filename
+
+
+# Minimum cosine similarity between ONNX and PyTorch vectors of the parity texts
+DEFAULT_PARITY_MIN_COSINE = 0.98
+
+_PARITY_TEXTS = [
+    "Статья 1. Настоящий Кодекс устанавливает правовые основы и принципы законодательства.",
+    "1. Гражданин вправе обжаловать решение в суд в течение трёх месяцев со дня его принятия.",
+    "а) в случае нарушения сроков, установленных пунктом 2 настоящей статьи;",
+    "Глава 5. Ответственность за налоговые правонарушения",
+    "Короткий текст.",
+]
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence-transformers model exported to ONNX and run with ONNX Runtime.
+
+    On first use the model is exported under `cache_dir/<model>/` together
+    with its tokenizer and pooling settings, optionally quantized to int8
+    (dynamic quantization of the weights), and checked against the PyTorch
+    vectors. Later runs load the cached artifact and need neither torch nor
+    sentence-transformers.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DENSE_MODEL_NAME,
+        cache_dir: str = DEFAULT_ONNX_CACHE_DIR,
+        quantize: bool = False,
+        threads: Optional[int] = None,
+        batch_size: int = 32,
+        min_cosine: float = DEFAULT_PARITY_MIN_COSINE,
+    ) -> None:
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as exc:
+            raise ImportError("The ONNX backend needs onnxruntime and transformers installed") from exc
+
+        self.model_name = f"{model_name}@{'onnx-int8' if quantize else 'onnx'}"
+        self.batch_size = batch_size
+        self.path = Path(cache_dir) / safe_filename(model_name)
+        model_file = self.path / ("model.int8.onnx" if quantize else "model.onnx")
+        if not model_file.exists():
+            _export(model_name, self.path, quantize=quantize, min_cosine=min_cosine)
+
+        with (self.path / "pooling.json").open(encoding="utf-8") as fh:
+            pooling = json.load(fh)
+        self._pooling_mode = pooling["mode"]
+        self._normalize = pooling["normalize"]
+        self._max_length = pooling["max_length"]
+        self.dimension: Optional[int] = pooling.get("dimension")
+        self._tokenizer = AutoTokenizer.from_pretrained(self.path)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        self._input_names = {node.name for node in self._session.get_inputs()}
+        logger.info(f"Модель эмбеддингов ONNX: {model_file} (потоков: {threads or 'по умолчанию'})")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode(texts[start : start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    def _encode(self, texts: Sequence[str]) -> List[List[float]]:
+        import numpy as np
+
+        encoded = self._tokenizer(
+            list(texts),
+            padding=True,
+            truncation=True,
+            max_length=self._max_length,
+            return_tensors="np",
+        )
+        inputs = {name: encoded[name].astype(np.int64) for name in ("input_ids", "attention_mask")}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(inputs["input_ids"])
+        hidden = self._session.run(None, {k: v for k, v in inputs.items() if k in self._input_names})[0]
+        mask = inputs["attention_mask"][..., None].astype(hidden.dtype)
+        if self._pooling_mode == "cls":
+            pooled = hidden[:, 0]
+        else:
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self._normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+
+def _export(model_name: str, target: Path, quantize: bool, min_cosine: float) -> None:
+    """Export `model_name` to ONNX in `target` (and its int8 variant if asked), then check parity."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    logger.info(f"Экспорт {model_name} в ONNX: {target}")
+    reference = SentenceTransformer(model_name, device="cpu")
+    target.mkdir(parents=True, exist_ok=True)
+    # Build everything in a scratch directory so a crash never leaves a half-written model behind
+    scratch = Path(tempfile.mkdtemp(dir=target, prefix=".export-"))
+    try:
+        fp32_file = target / "model.onnx"
+        if not fp32_file.exists():
+            _export_fp32(reference, scratch / "model.onnx", torch)
+            reference.tokenizer.save_pretrained(scratch)
+            (scratch / "pooling.json").write_text(json.dumps(_pooling_config(reference)), encoding="utf-8")
+            for item in scratch.iterdir():
+                os.replace(item, target / item.name)
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(str(fp32_file), str(scratch / "model.int8.onnx"), weight_type=QuantType.QInt8)
+            os.replace(scratch / "model.int8.onnx", target / "model.int8.onnx")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    model_file = target / ("model.int8.onnx" if quantize else "model.onnx")
+    try:
+        candidate = OnnxEmbeddings(model_name, cache_dir=str(target.parent), quantize=quantize)
+        similarity = parity_check(candidate, reference.encode(_PARITY_TEXTS).tolist(), _PARITY_TEXTS)
+    except BaseException:
+        model_file.unlink(missing_ok=True)
+        raise
+    if similarity < min_cosine:
+        model_file.unlink(missing_ok=True)
+        raise ValueError(
+            f"ONNX export of {model_name} diverges from PyTorch: min cosine {similarity:.4f} < {min_cosine}"
+        )
+    logger.info(f"Проверка ONNX ({model_file.name}): минимальное косинусное сходство с PyTorch {similarity:.4f}")
+
+
+def _export_fp32(reference, path: Path, torch) -> None:
+    transformer = reference[0].auto_model.eval()
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model) -> None:
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    sample = reference.tokenizer(["пример"], return_tensors="pt")
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(transformer),
+            (sample["input_ids"], sample["attention_mask"]),
+            str(path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "last_hidden_state": dynamic},
+            opset_version=17,
+        )
+
+
+def _pooling_config(reference) -> dict:
+    """Pooling and normalization of a SentenceTransformer, as applied by OnnxEmbeddings."""
+    mode = "mean"
+    normalize = False
+    for module in reference:
+        name = type(module).__name__
+        if name == "Pooling" and getattr(module, "pooling_mode_cls_token", False):
+            mode = "cls"
+        elif name == "Normalize":
+            normalize = True
+    return {
+        "mode": mode,
+        "normalize": normalize,
+        "max_length": reference.get_max_seq_length() or 512,
+        "dimension": reference.get_sentence_embedding_dimension(),
+    }
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def parity_check(candidate: Embeddings, reference_vectors: List[List[float]], texts: List[str]) -> float:
+    """Minimum cosine similarity between `candidate` vectors of `texts` and the reference ones."""
+    vectors = candidate.embed_documents(texts)
+    return min(_cosine(a, b) for a, b in zip(vectors, reference_vectors))
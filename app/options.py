@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass, fields, replace
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple, Union
+
+from .chunking import DEFAULT_CHUNK_OVERLAP_TOKENS, DEFAULT_MAX_CHUNK_TOKENS
+from .collection import DEFAULT_COLLECTION_PROFILE, CollectionProfile
+from .embed_batching import DEFAULT_EMBED_BATCH_TOKENS, DEFAULT_EMBED_MAX_DELAY_S
+from .embedders import DEFAULT_ONNX_CACHE_DIR
+from .embedding_cache import DEFAULT_EMBEDDING_CACHE_MAX_MB
+from .qdrant_writer import DEFAULT_UPSERT_BATCH_SIZE, DEFAULT_UPSERT_PARALLEL, DEFAULT_UPSERT_RETRIES
+from .resources import ResourcePolicy
+
+# Option groups of ingest_document_to_qdrant. Only light modules are imported
+# here, so the CLI builds them before LangChain and Playwright are loaded.
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_qdrant import SparseEmbeddings
+
+
+@dataclass
+class CrawlOptions:
+    """Where the pages of a document come from and how they are fetched."""
+
+    next_selector: Optional[str] = ".show-more"
+    next_text: Optional[str] = "Следующая"
+    content_selector: str = ".reader_article_body"
+    headless: bool = False
+    max_pages: Optional[int] = None
+    incremental: bool = True
+    resource_policy: Optional[ResourcePolicy] = None
+    # "browser", "http" (no browser, server-rendered pages) or "auto"
+    fetcher: str = "browser"
+    next_url_template: Optional[str] = None
+    parallel_pages: int = 1
+    # An already running browser shared by batch runs
+    cdp_url: Optional[str] = None
+    # Raw page store: crawled pages are recorded there; replay reads them back
+    page_cache_dir: Optional[str] = None
+    replay: bool = False
+
+
+@dataclass
+class ChunkOptions:
+    """How page paragraphs are grouped into articles and split into chunks."""
+
+    article_regex: Optional[str] = r"^Статья\s+\d+[\.|\-]?"
+    disable_article_grouping: bool = False
+    # Split chunks longer than this many tokens on part/point boundaries; None disables
+    max_chunk_tokens: Optional[int] = DEFAULT_MAX_CHUNK_TOKENS
+    chunk_overlap_tokens: int = DEFAULT_CHUNK_OVERLAP_TOKENS
+
+
+@dataclass
+class EmbeddingOptions:
+    """How chunks are embedded."""
+
+    # Dense model runtime: "torch", "onnx" or "onnx-int8" (see app.embedders)
+    backend: str = "torch"
+    onnx_cache_dir: str = DEFAULT_ONNX_CACHE_DIR
+    threads: Optional[int] = None
+    # >1: embed in that many worker processes, each pinned to its own cores
+    workers: int = 1
+    # Dense batches: padded-token budget per model call, max wait for more chunks
+    batch_tokens: int = DEFAULT_EMBED_BATCH_TOKENS
+    max_delay: float = DEFAULT_EMBED_MAX_DELAY_S
+    # Persistent embedding cache keyed by (model, text hash)
+    cache_dir: Optional[str] = None
+    cache_max_mb: int = DEFAULT_EMBEDDING_CACHE_MAX_MB
+    # Already loaded models shared by batch runs; loaded per document if None
+    dense: Optional[Embeddings] = None
+    sparse: Optional[SparseEmbeddings] = None
+
+
+@dataclass
+class StorageOptions:
+    """Which Qdrant collection the chunks go to and how they are uploaded."""
+
+    qdrant_url: Optional[str] = None
+    qdrant_host: Optional[str] = None
+    qdrant_port: Optional[int] = None
+    # Drop and rebuild the collection instead of synchronizing it
+    recreate: bool = True
+    # Storage and indexing of new collections: a COLLECTION_PROFILES name or a CollectionProfile
+    collection_profile: Union[str, CollectionProfile] = DEFAULT_COLLECTION_PROFILE
+    # Bulk upload: points per request, requests in flight, wait for indexing, retries
+    upsert_batch_size: int = DEFAULT_UPSERT_BATCH_SIZE
+    upsert_parallel: int = DEFAULT_UPSERT_PARALLEL
+    upsert_wait: bool = False
+    upsert_retries: int = DEFAULT_UPSERT_RETRIES
+
+
+# Flat keyword arguments ingest_document_to_qdrant took before the option
+# groups, mapped to (group, field). They are still accepted, see fold_legacy_options.
+LEGACY_OPTIONS: Dict[str, Tuple[str, str]] = {
+    **{f.name: ("crawl", f.name) for f in fields(CrawlOptions)},
+    **{f.name: ("chunking", f.name) for f in fields(ChunkOptions)},
+    **{f.name: ("storage", f.name) for f in fields(StorageOptions)},
+    "embedding_backend": ("embedding", "backend"),
+    "onnx_cache_dir": ("embedding", "onnx_cache_dir"),
+    "embedding_threads": ("embedding", "threads"),
+    "embedding_workers": ("embedding", "workers"),
+    "embed_batch_tokens": ("embedding", "batch_tokens"),
+    "embed_max_delay": ("embedding", "max_delay"),
+    "embedding_cache_dir": ("embedding", "cache_dir"),
+    "embedding_cache_max_mb": ("embedding", "cache_max_mb"),
+    "dense_embeddings": ("embedding", "dense"),
+    "sparse_embeddings": ("embedding", "sparse"),
+}
+
+
+def fold_legacy_options(
+    crawl: Optional[CrawlOptions],
+    chunking: Optional[ChunkOptions],
+    embedding: Optional[EmbeddingOptions],
+    storage: Optional[StorageOptions],
+    legacy: Dict[str, Any],
+    caller: str = "ingest_document_to_qdrant",
+) -> Tuple[CrawlOptions, ChunkOptions, EmbeddingOptions, StorageOptions]:
+    """Fill in missing option groups and apply flat keyword arguments of the old signature.
+
+    Flat arguments (see LEGACY_OPTIONS) override the matching field of their
+    group and emit a DeprecationWarning; unknown names raise TypeError.
+    """
+    groups: Dict[str, Any] = {
+        "crawl": crawl or CrawlOptions(),
+        "chunking": chunking or ChunkOptions(),
+        "embedding": embedding or EmbeddingOptions(),
+        "storage": storage or StorageOptions(),
+    }
+    if legacy:
+        overrides: Dict[str, Dict[str, Any]] = {name: {} for name in groups}
+        for key, value in legacy.items():
+            if key not in LEGACY_OPTIONS:
+                raise TypeError(f"{caller}() got an unexpected keyword argument {key!r}")
+            group, field_name = LEGACY_OPTIONS[key]
+            overrides[group][field_name] = value
+        warnings.warn(
+            f"{caller}(): pass {', '.join(sorted(legacy))} through the option groups "
+            "(crawl, chunking, embedding, storage; see app.options)",
+            DeprecationWarning,
+            stacklevel=3,
+        )
+        groups = {name: replace(options, **overrides[name]) for name, options in groups.items()}
+    return groups["crawl"], groups["chunking"], groups["embedding"], groups["storage"]
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from .files import safe_filename, write_atomic
+
+
+DEFAULT_PAGE_CACHE_DIR = ".page_cache"
+
+
+class PageCache:
+    """Content-addressed on-disk store of crawled pages.
+
+    Layout under `root`:
+    - objects/ab/<sha256>.json.gz: one page, {"paragraphs": [...], "html": "..."},
+      named by the hash of its content, so identical pages are stored once
+    - docs/<doc_id>.jsonl: a header line, then one {"page": N, "sha256": ..., "url": ...}
+      line per page, in crawl order, and an {"end": reason} line with the
+      reason the crawl stopped (see aiterate_page_paragraphs' on_end)
+
+    The index is written to `<doc_id>.jsonl.partial` during a crawl and only
+    replaces the previous one once the crawl finished (PageRecorder.commit),
+    so replay never sees a truncated document.
+    """
+
+    def __init__(self, root: str = DEFAULT_PAGE_CACHE_DIR) -> None:
+        self.root = Path(root)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest}.json.gz"
+
+    def index_path(self, doc_id: str) -> Path:
+        return self.root / "docs" / f"{safe_filename(doc_id)}.jsonl"
+
+    def put_page(self, paragraphs: List[str], html: Optional[str] = None) -> str:
+        """Store a page unless an identical one exists; returns its digest."""
+        data = json.dumps(
+            {"paragraphs": paragraphs, "html": html or ""},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            write_atomic(path, gzip.compress(data, compresslevel=6))
+        return digest
+
+    def get_page(self, digest: str) -> dict:
+        """Return {"paragraphs": [...], "html": "..."} of a stored page."""
+        with gzip.open(self._object_path(digest), "rb") as fh:
+            return json.loads(fh.read())
+
+    def has_document(self, doc_id: str) -> bool:
+        return self.index_path(doc_id).exists()
+
+    def document_pages(self, doc_id: str) -> List[str]:
+        """Digests of the document's pages, in crawl order."""
+        return self._read_index(doc_id)[0]
+
+    def _read_index(self, doc_id: str) -> Tuple[List[str], Optional[str]]:
+        """(page digests, end reason) of a document; the reason is None for old indexes."""
+        index = self.index_path(doc_id)
+        if not index.exists():
+            raise FileNotFoundError(f"Document {doc_id!r} is not in the page cache ({index})")
+        digests: List[str] = []
+        end_reason: Optional[str] = None
+        with index.open(encoding="utf-8") as fh:
+            for line in fh:
+                record = json.loads(line)
+                if "sha256" in record:
+                    digests.append(record["sha256"])
+                elif "end" in record:
+                    end_reason = record["end"]
+        return digests, end_reason
+
+    def iterate_pages(
+        self,
+        doc_id: str,
+        max_pages: Optional[int] = None,
+        on_end: Optional[Callable[[str], None]] = None,
+    ) -> Iterator[List[str]]:
+        """Yield the cached paragraphs of each page, like the live crawlers do.
+
+        on_end gets the reason the recorded crawl stopped ("max_pages" if
+        max_pages cut the replay short, "unknown" for indexes written before
+        the reason was recorded).
+        """
+        digests, end_reason = self._read_index(doc_id)
+        if max_pages and len(digests) > max_pages:
+            digests = digests[:max_pages]
+            end_reason = "max_pages"
+        logger.info(f"Воспроизведение из кэша страниц: {doc_id}, страниц: {len(digests)}")
+        for page_no, digest in enumerate(digests, start=1):
+            logger.info(f"Текущая страница #{page_no} (кэш): {digest[:12]}")
+            yield self.get_page(digest)["paragraphs"]
+        if on_end is not None:
+            on_end(end_reason or "unknown")
+
+    def recorder(self, doc_id: str, start_url: str, resume_pages: Optional[int] = None) -> "PageRecorder":
+        return PageRecorder(self, doc_id, start_url, resume_pages)
+
+
+class PageRecorder:
+    """Records the pages of one crawl; pass it as the crawlers' `on_page` hook.
+
+    With resume_pages, the unfinished index of an interrupted crawl is kept up
+    to that page and recording continues after it. If it holds fewer pages,
+    the index would be incomplete and is not published on commit.
+    """
+
+    def __init__(
+        self,
+        cache: PageCache,
+        doc_id: str,
+        start_url: str,
+        resume_pages: Optional[int] = None,
+    ) -> None:
+        self.cache = cache
+        self.doc_id = doc_id
+        self.pages = 0
+        self.complete = True
+        self._index = cache.index_path(doc_id)
+        self._partial = self._index.with_name(self._index.name + ".partial")
+        self._partial.parent.mkdir(parents=True, exist_ok=True)
+
+        kept: List[str] = []
+        if resume_pages:
+            if self._partial.exists():
+                with self._partial.open(encoding="utf-8") as fh:
+                    kept = fh.readlines()[: resume_pages + 1]
+            if len(kept) < resume_pages + 1:
+                logger.warning("Кэш страниц прерванного обхода неполон — индекс документа не будет обновлён.")
+                self.complete = False
+                kept = []
+        self._fh = self._partial.open("w", encoding="utf-8")
+        if kept:
+            self._fh.writelines(kept)
+            self.pages = resume_pages
+        else:
+            header = {
+                "doc_id": doc_id,
+                "start_url": start_url,
+                "crawled_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+            }
+            self._fh.write(json.dumps(header, ensure_ascii=False) + "\n")
+
+    def __call__(self, paragraphs: List[str], html: Optional[str] = None, url: Optional[str] = None) -> None:
+        digest = self.cache.put_page(paragraphs, html)
+        self.pages += 1
+        self._fh.write(json.dumps({"page": self.pages, "sha256": digest, "url": url}, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def commit(self, end_reason: Optional[str] = None) -> None:
+        """Publish the recorded index as the document's cached version.
+
+        end_reason is the crawler's on_end reason, kept for replays.
+        """
+        if end_reason is not None:
+            self._fh.write(json.dumps({"end": end_reason}) + "\n")
+        self._fh.close()
+        if not self.complete:
+            return
+        os.replace(self._partial, self._index)
+        logger.info(f"Кэш страниц обновлён: {self.doc_id}, страниц: {self.pages} ({self._index})")
+
+    def close(self) -> None:
+        """Stop recording without publishing; the previous index stays in place."""
+        if not self._fh.closed:
+            self._fh.close()
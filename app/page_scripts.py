@@ -0,0 +1,253 @@
+"""JavaScript evaluated inside crawled pages and the parsing of its results, shared by the sync and async crawlers."""
+from __future__ import annotations
+
+from typing import Iterable, Optional, Tuple, Union
+
+
+# Resolves after two animation frames, i.e. once pending layout has rendered.
+NEXT_FRAMES_JS = "() => new Promise((r) => requestAnimationFrame(() => requestAnimationFrame(r)))"
+
+
+# Collects every paragraph of the content area in a single evaluation.
+# Mirrors the locator-based extraction: `<p>` descendants of the container,
+# or, when there are none, the text of the (single) container itself.
+# Takes the selector, or [selector, withHtml] to also return the raw HTML of
+# every paragraph (or of the container) for the page cache.
+EXTRACT_PARAGRAPHS_JS = """
+(arg) => {
+  const [selector, withHtml] = Array.isArray(arg) ? arg : [arg, false];
+  const nodes = document.querySelectorAll(selector + ' p');
+  if (nodes.length > 0) {
+    return {
+      paragraphs: Array.from(nodes, (p) => ({
+        text: p.innerText || '',
+        tag: p.tagName.toLowerCase(),
+        class: (typeof p.className === 'string') ? p.className : '',
+        html: withHtml ? p.outerHTML : null,
+      })),
+      container_text: null,
+    };
+  }
+  const containers = document.querySelectorAll(selector);
+  return {
+    paragraphs: [],
+    container_text: containers.length === 1 ? (containers[0].innerText || '') : '',
+    container_html: withHtml && containers.length === 1 ? containers[0].innerHTML : null,
+  };
+}
+"""
+
+
+# Incremental counterpart of EXTRACT_PARAGRAPHS_JS for "show more" pages that
+# append to the same DOM. Consumed paragraphs are marked with an attribute and
+# the last one is remembered on `window`, so the next call walks only the nodes
+# after it: total work over a document stays linear in its length. The cursor
+# lives in the page, so a real navigation starts from scratch automatically.
+# Accepts the same argument as EXTRACT_PARAGRAPHS_JS.
+EXTRACT_NEW_PARAGRAPHS_JS = """
+(arg) => {
+  const [selector, withHtml] = Array.isArray(arg) ? arg : [arg, false];
+  const MARK = 'data-gov-parser-seen';
+  const state = window.__govParserCursor || (window.__govParserCursor = {last: null, textLength: 0});
+  const containers = Array.from(document.querySelectorAll(selector));
+  let nodes;
+  if (state.last && state.last.isConnected) {
+    nodes = [];
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_ELEMENT, {
+      acceptNode: (n) => (n.tagName === 'P' ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_SKIP),
+    });
+    walker.currentNode = state.last;
+    while (walker.nextNode()) {
+      const n = walker.currentNode;
+      if (!n.hasAttribute(MARK) && containers.some((c) => c.contains(n))) {
+        nodes.push(n);
+      }
+    }
+  } else {
+    const all = document.querySelectorAll(selector + ' p');
+    if (all.length === 0) {
+      if (containers.length !== 1) {
+        return {paragraphs: [], container_text: ''};
+      }
+      const text = containers[0].innerText || '';
+      const fresh = text.length >= state.textLength ? text.slice(state.textLength) : text;
+      state.textLength = text.length;
+      return {paragraphs: [], container_text: fresh, container_html: withHtml ? containers[0].innerHTML : null};
+    }
+    nodes = Array.from(all).filter((n) => !n.hasAttribute(MARK));
+  }
+  for (const n of nodes) {
+    n.setAttribute(MARK, '1');
+  }
+  if (nodes.length > 0) {
+    state.last = nodes[nodes.length - 1];
+  }
+  return {
+    paragraphs: nodes.map((p) => ({
+      text: p.innerText || '',
+      tag: p.tagName.toLowerCase(),
+      class: (typeof p.className === 'string') ? p.className : '',
+      html: withHtml ? p.outerHTML : null,
+    })),
+    container_text: null,
+  };
+}
+"""
+
+
+# Cheap, container-scoped fingerprint computed in the browser.
+# Hashes only the first and last child of the content container plus its
+# child count, so the cost does not grow with every "show more". When
+# `observe` is set, a MutationObserver counting content mutations inside the
+# container is installed on first use and its counter is part of the
+# fingerprint: any change to the content, wherever it happens, alters it in
+# O(delta). Returns null when the container is absent.
+FINGERPRINT_JS = """
+([selector, observe]) => {
+  const container = document.querySelector(selector);
+  if (!container) {
+    return null;
+  }
+  if (observe && !window.__govParserObserver) {
+    window.__govParserMutations = 0;
+    const touches = (node) => node && node.nodeType === 1 && (node.matches(selector) || node.closest(selector));
+    window.__govParserObserver = new MutationObserver((records) => {
+      for (const r of records) {
+        const target = r.target.nodeType === 1 ? r.target : r.target.parentElement;
+        if (touches(target)
+            || Array.from(r.addedNodes).some(touches)
+            || Array.from(r.removedNodes).some((n) => n.nodeType === 1 && n.matches(selector))) {
+          window.__govParserMutations += 1;
+        }
+      }
+    });
+    window.__govParserObserver.observe(document.body, {childList: true, characterData: true, subtree: true});
+  }
+  const hash = (text) => {
+    let h = 0x811c9dc5;
+    for (let i = 0; i < text.length; i++) {
+      h ^= text.charCodeAt(i);
+      h = Math.imul(h, 0x01000193);
+    }
+    return (h >>> 0).toString(16);
+  };
+  const first = container.firstElementChild;
+  const last = container.lastElementChild;
+  return [
+    container.childElementCount,
+    first ? hash(first.textContent || '') : '-',
+    last ? hash(last.textContent || '') : '-',
+    observe ? window.__govParserMutations : '-',
+  ].join(':');
+}
+"""
+
+
+# Snapshot of what a click on the next control may change: the URL, the
+# content fingerprint (falling back to <body> when the container is absent)
+# and whether the next control is still visible. `nextSelector` may use
+# Playwright-only syntax; then the control state is simply not tracked.
+CHANGE_STATE_JS = """
+([selector, nextSelector]) => {
+  const fingerprint = """ + FINGERPRINT_JS.strip() + """;
+  let fp = selector ? fingerprint([selector, true]) : null;
+  if (fp === null) {
+    fp = fingerprint(['body', true]);
+  }
+  let next = '-';
+  if (nextSelector) {
+    try {
+      const el = document.querySelector(nextSelector);
+      next = el && el.getClientRects().length > 0 ? 'visible' : 'gone';
+    } catch (e) {
+      next = '-';
+    }
+  }
+  return {href: location.href, fp: fp, next: next};
+}
+"""
+
+# True once the page has reacted to the click: it navigated, the content
+# changed, or the next control disappeared (the end of the document).
+WAIT_FOR_CHANGE_JS = """
+([selector, nextSelector, before]) => {
+  const state = (""" + CHANGE_STATE_JS.strip() + """)([selector, nextSelector]);
+  if (state.href !== before.href || state.fp !== before.fp) {
+    return true;
+  }
+  return before.next === 'visible' && state.next === 'gone';
+}
+"""
+
+
+def split_container_text(container_text: str) -> list[str]:
+    """Split the container text into paragraphs by blank lines."""
+    container_text = (container_text or "").strip()
+    if not container_text:
+        return []
+    # Normalize newlines and split by blank lines
+    normalized = container_text.replace("\r\n", "\n").replace("\r", "\n")
+    chunks = [chunk.strip() for chunk in normalized.split("\n\n")]
+    return [c for c in chunks if c]
+
+
+def paragraph_nodes_from_result(result: Optional[dict]) -> list[dict]:
+    """Turn the result of EXTRACT_PARAGRAPHS_JS / EXTRACT_NEW_PARAGRAPHS_JS into nodes.
+
+    Returns {"text", "tag", "class"} dicts with stripped, non-empty text. When
+    the container has no `<p>` its text is split by blank lines instead.
+    """
+    result = result or {}
+    nodes: list[dict] = []
+    if result.get("container_text") is None:
+        for node in result.get("paragraphs") or []:
+            cleaned = (node.get("text") or "").strip()
+            if cleaned:
+                nodes.append({"text": cleaned, "tag": node.get("tag", "p"), "class": node.get("class", "")})
+        return nodes
+
+    for chunk in split_container_text(result.get("container_text") or ""):
+        nodes.append({"text": chunk, "tag": "", "class": ""})
+    return nodes
+
+
+def html_from_result(result: Optional[dict]) -> str:
+    """Raw HTML of what an extraction with withHtml=true returned.
+
+    The outer HTML of the extracted paragraphs, one per line, or the container
+    HTML when the container has no `<p>`.
+    """
+    result = result or {}
+    if result.get("container_text") is None:
+        return "\n".join(
+            node.get("html") or ""
+            for node in result.get("paragraphs") or []
+            if (node.get("text") or "").strip()
+        )
+    return result.get("container_html") or ""
+
+
+def extraction_call(
+    content_selector: str, incremental: bool = False, with_html: bool = False
+) -> Tuple[str, Union[str, list]]:
+    """Script and argument of one paragraph extraction, for `page.evaluate(*call)`.
+
+    incremental selects EXTRACT_NEW_PARAGRAPHS_JS (only what was appended
+    since the previous call); with_html also asks for the raw HTML.
+    """
+    script = EXTRACT_NEW_PARAGRAPHS_JS if incremental else EXTRACT_PARAGRAPHS_JS
+    return script, ([content_selector, True] if with_html else content_selector)
+
+
+def paragraphs_from_result(result: Optional[dict]) -> list[str]:
+    """Paragraph texts of an extraction result (see paragraph_nodes_from_result)."""
+    return [node["text"] for node in paragraph_nodes_from_result(result)]
+
+
+def paragraphs_from_node_texts(texts: Iterable[Optional[str]]) -> list[str]:
+    """Paragraphs of the per-node fallback: the stripped, non-empty `<p>` texts."""
+    return [cleaned for cleaned in ((text or "").strip() for text in texts) if cleaned]
+
+
+# Debug aid: outline the next control in red before clicking it.
+HIGHLIGHT_JS = "el => { el.style.outline='3px solid red'; el.style.backgroundColor='rgba(255,0,0,0.25)'; }"
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from playwright.sync_api import sync_playwright
+
+from .browser_pool import SharedBrowser
+from .metrics import StageMetrics, timed
+from .parser import (
+    END_OF_DOCUMENT,
+    _extract_paragraphs,
+    _extract_paragraphs_with_html,
+    _has_next_control,
+    _launch_or_connect,
+)
+from .resources import ResourcePolicy, install_resource_policy, log_resource_stats
+
+
+def page_url(start_url: str, page_url_template: str, index: int, start_page: int = 1) -> str:
+    """URL of page `index` (1-based) of a crawl; page 1 is the start URL.
+
+    `start_page` is the number of the start URL in the template's numbering,
+    for crawls resumed in the middle of a document.
+    """
+    return start_url if index == 1 else page_url_template.format(page=start_page + index - 1)
+
+
+class _PageBoard:
+    """Shared state between page workers and the ordered consumer.
+
+    Workers claim page indexes in increasing order and post results; the
+    consumer takes them back strictly in page order. `end` is the first index
+    known to be past the document: the one after max_pages, or after the
+    first page without a next control. Claiming stops `lookahead` pages ahead
+    of the consumer so memory stays bounded.
+    """
+
+    def __init__(self, max_pages: Optional[int], lookahead: int) -> None:
+        self.cond = threading.Condition()
+        self.results: Dict[int, Tuple[List[str], str, str]] = {}
+        self.next_claim = 1
+        self.next_yield = 1
+        self.end: Optional[int] = (max_pages + 1) if max_pages else None
+        # Why the document ends at `end` (see aiterate_page_paragraphs' on_end)
+        self.end_reason = "max_pages"
+        self.lookahead = max(1, lookahead)
+        self.error: Optional[BaseException] = None
+        self.stopped = False
+
+    def claim(self) -> Optional[int]:
+        with self.cond:
+            while True:
+                if self.stopped or self.error is not None:
+                    return None
+                if self.end is not None and self.next_claim >= self.end:
+                    return None
+                if self.next_claim - self.next_yield < self.lookahead:
+                    index = self.next_claim
+                    self.next_claim += 1
+                    return index
+                self.cond.wait()
+
+    def post(self, index: int, paragraphs: List[str], html: str, url: str, has_next: bool) -> None:
+        with self.cond:
+            self.results[index] = (paragraphs, html, url)
+            # Like the sequential crawler, stop after the first page without a next control;
+            # max_pages wins when both end at the same page, as it is checked first there
+            if not has_next and (self.end is None or index + 1 < self.end):
+                self.end = index + 1
+                self.end_reason = END_OF_DOCUMENT
+            self.cond.notify_all()
+
+    def fail(self, exc: BaseException) -> None:
+        with self.cond:
+            if self.error is None:
+                self.error = exc
+            self.cond.notify_all()
+
+    def stop(self) -> None:
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def take(self) -> Optional[Tuple[List[str], str, str]]:
+        """Block until the next page in order is available; None at the end.
+
+        Returns (paragraphs, html, url); html is empty unless it was posted.
+        """
+        with self.cond:
+            while True:
+                if self.error is not None:
+                    raise self.error
+                if self.end is not None and self.next_yield >= self.end:
+                    return None
+                if self.next_yield in self.results:
+                    result = self.results.pop(self.next_yield)
+                    self.next_yield += 1
+                    self.cond.notify_all()
+                    return result
+                self.cond.wait()
+
+
+def iterate_page_paragraphs_parallel(
+    start_url: str,
+    page_url_template: str,
+    workers: int = 4,
+    max_pages: Optional[int] = None,
+    content_selector: str = ".reader_article_body",
+    headless: bool = True,
+    navigation_timeout_ms: int = 15000,
+    user_agent: Optional[str] = None,
+    resource_policy: Optional[ResourcePolicy] = None,
+    cdp_url: Optional[str] = None,
+    next_selector: Optional[str] = None,
+    next_text: Optional[str] = None,
+    scroll_settle_timeout_ms: int = 1000,
+    lookahead: Optional[int] = None,
+    on_page: Optional[Callable[[List[str], str, str], None]] = None,
+    start_page: int = 1,
+    metrics: Optional[StageMetrics] = None,
+    on_end: Optional[Callable[[str], None]] = None,
+) -> Iterator[List[str]]:
+    """Fetch URL-addressable pages in parallel and yield them in page order.
+
+    Page N lives at `page_url_template.format(page=N)` (page `start_page` at
+    start_url).
+    Up to `workers` browser contexts, all in one Chromium, load pages at the
+    same time; results are re-sequenced so consumers, and the seam logic in
+    ingest.py, see exactly what a sequential crawl would yield. The end rule
+    is the sequential crawler's: the document ends at the first page without
+    the next control (`next_selector`/`next_text`, as in
+    iterate_page_paragraphs), after max_pages, or when a page repeats the
+    URL and content of the one before it. Pages without paragraphs are
+    skipped, not taken for the end; pages claimed past the end are dropped.
+    on_page is called with the paragraphs, raw HTML and URL of each page, in
+    order, before it is yielded. With metrics, page loads, extraction and
+    the next-control check are timed as stages. on_end is called with the
+    reason the crawl stopped (END_OF_DOCUMENT, "max_pages" or "repeated").
+    """
+    workers = max(1, workers)
+    board = _PageBoard(max_pages, lookahead or workers * 4)
+
+    def _worker(browser_url: Optional[str]) -> None:
+        try:
+            with sync_playwright() as pw:
+                browser = _launch_or_connect(pw, headless=headless, cdp_url=browser_url)
+                context = browser.new_context(user_agent=user_agent, locale="ru-RU", timezone_id="Europe/Moscow")
+                resource_stats = (
+                    install_resource_policy(context, resource_policy, start_url) if resource_policy else None
+                )
+                page = context.new_page()
+                page.set_default_navigation_timeout(navigation_timeout_ms)
+                page.set_default_timeout(navigation_timeout_ms)
+                while True:
+                    index = board.claim()
+                    if index is None:
+                        break
+                    url = page_url(start_url, page_url_template, index, start_page)
+                    logger.info(f"Текущая страница #{index}: {url}")
+                    with timed(metrics, "goto"):
+                        page.goto(url, wait_until="domcontentloaded")
+                    with timed(metrics, "extract"):
+                        if on_page is None:
+                            paragraphs, html = _extract_paragraphs(page, content_selector), ""
+                        else:
+                            paragraphs, html = _extract_paragraphs_with_html(page, content_selector)
+                    if metrics is not None:
+                        metrics.inc("pages_crawled")
+                        metrics.inc("paragraphs_crawled", len(paragraphs))
+                    with timed(metrics, "scroll_wait"):
+                        has_next = _has_next_control(page, next_selector, next_text, scroll_settle_timeout_ms)
+                    board.post(index, paragraphs, html, page.url, has_next)
+                log_resource_stats(resource_stats)
+                context.close()
+                browser.close()
+        except BaseException as exc:  # noqa: BLE001 - surfaced to the consumer
+            board.fail(exc)
+
+    shared: Optional[SharedBrowser] = None
+    if cdp_url is None and workers > 1:
+        shared = SharedBrowser(headless=headless).start()
+        cdp_url = shared.cdp_url
+    threads = [
+        threading.Thread(target=_worker, args=(cdp_url,), name=f"page-worker-{i}", daemon=True)
+        for i in range(workers)
+    ]
+    try:
+        for th in threads:
+            th.start()
+        previous: Optional[Tuple[str, str]] = None
+        while True:
+            taken = board.take()
+            if taken is None:
+                end_reason = board.end_reason
+                if end_reason == END_OF_DOCUMENT:
+                    logger.info("Кнопка/ссылка 'Следующая' не найдена — завершаю.")
+                else:
+                    logger.info("Достигнут предел max_pages — завершаю.")
+                break
+            paragraphs, html, url = taken
+            with timed(metrics, "fingerprint"):
+                fingerprint = (url, hashlib.sha256("\n".join(paragraphs).encode("utf-8")).hexdigest())
+            if fingerprint == previous:
+                logger.info("Содержимое страницы не изменилось — завершаю пагинацию.")
+                end_reason = "repeated"
+                break
+            previous = fingerprint
+            if not paragraphs:
+                continue
+            if on_page is not None:
+                on_page(paragraphs, html, url)
+            yield paragraphs
+        if on_end is not None:
+            on_end(end_reason)
+    finally:
+        board.stop()
+        for th in threads:
+            th.join()
+        if shared is not None:
+            shared.stop()
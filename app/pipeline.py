@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+from loguru import logger
+
+
+# A stage transforms a stream of items into another stream of items.
+# Stages may be stateful generators (e.g. cross-page aggregation), so they
+# receive the whole input iterator rather than one item at a time.
+Stage = Callable[[Iterable], Iterable]
+
+_END = object()
+
+
+class _PipelineCancelled(Exception):
+    """Raised inside a stage thread when another stage has failed."""
+
+
+@dataclass
+class StageStats:
+    """Throughput counters of one pipeline stage.
+
+    - busy_s: time spent doing the stage's own work
+    - starved_s: time spent waiting for input from the upstream stage
+    - blocked_s: time spent waiting for free space in the downstream queue
+    """
+
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    busy_s: float = 0.0
+    starved_s: float = 0.0
+    blocked_s: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Items produced per second of busy time."""
+        return self.items_out / self.busy_s if self.busy_s > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.name}: in={self.items_in} out={self.items_out} "
+            f"busy={self.busy_s:.2f}s ({self.throughput:.2f}/s) "
+            f"starved={self.starved_s:.2f}s blocked={self.blocked_s:.2f}s"
+        )
+
+
+def _queue_get(q: "queue.Queue", stop: threading.Event):
+    while True:
+        if stop.is_set():
+            raise _PipelineCancelled()
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+
+def _queue_put(q: "queue.Queue", item, stop: threading.Event) -> None:
+    while True:
+        if stop.is_set():
+            raise _PipelineCancelled()
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: Sequence[tuple[str, Stage]],
+    queue_size: int = 8,
+    source_name: str = "crawl",
+) -> List[StageStats]:
+    """Run `source` and `stages` in separate threads joined by bounded queues.
+
+    Each queue holds at most `queue_size` items, so a fast stage blocks once it
+    gets too far ahead of a slow one (backpressure) and memory stays bounded.
+    Wall time approaches the time of the slowest stage instead of the sum of
+    all stages. The output of the last stage is drained and discarded.
+
+    The first exception raised by any stage cancels the others and is re-raised
+    in the calling thread. Returns per-stage statistics, source first.
+    """
+    queue_size = max(1, queue_size)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    names = [source_name] + [name for name, _ in stages]
+    stats = [StageStats(name=name) for name in names]
+    queues: List["queue.Queue"] = [queue.Queue(maxsize=queue_size) for _ in stages]
+
+    def _input(idx: int) -> Iterator:
+        """Iterate the input queue of stage `idx`, accounting for wait time."""
+        st = stats[idx]
+        q = queues[idx - 1]
+        while True:
+            t0 = time.perf_counter()
+            item = _queue_get(q, stop)
+            st.starved_s += time.perf_counter() - t0
+            if item is _END:
+                return
+            st.items_in += 1
+            yield item
+
+    def _worker(idx: int, produce: Callable[[], Iterable]) -> None:
+        st = stats[idx]
+        out_q: Optional["queue.Queue"] = queues[idx] if idx < len(queues) else None
+        started = time.perf_counter()
+        items = None
+        try:
+            items = iter(produce())
+            for item in items:
+                st.items_out += 1
+                if out_q is not None:
+                    t0 = time.perf_counter()
+                    _queue_put(out_q, item, stop)
+                    st.blocked_s += time.perf_counter() - t0
+            if out_q is not None:
+                _queue_put(out_q, _END, stop)
+        except _PipelineCancelled:
+            pass
+        except BaseException as exc:  # noqa: BLE001 - re-raised in the caller
+            errors.append(exc)
+            stop.set()
+        finally:
+            # Close generators early so e.g. the browser shuts down on cancel
+            close = getattr(items, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            total = time.perf_counter() - started
+            st.busy_s = max(0.0, total - st.starved_s - st.blocked_s)
+
+    threads: List[threading.Thread] = [
+        threading.Thread(target=_worker, args=(0, lambda: source), name=f"pipeline-{source_name}", daemon=True)
+    ]
+    for idx, (name, stage) in enumerate(stages, start=1):
+        threads.append(
+            threading.Thread(
+                target=_worker,
+                args=(idx, (lambda i=idx, s=stage: s(_input(i)))),
+                name=f"pipeline-{name}",
+                daemon=True,
+            )
+        )
+
+    for th in threads:
+        th.start()
+    try:
+        for th in threads:
+            th.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for th in threads:
+            th.join()
+        raise
+
+    for st in stats:
+        logger.info(f"Стадия {st.summary()}")
+    if errors:
+        raise errors[0]
+    bottleneck = max(stats, key=lambda s: s.busy_s)
+    logger.info(f"Узкое место конвейера: {bottleneck.name}")
+    return stats
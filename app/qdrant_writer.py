@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Deque, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from .metrics import StageMetrics, timed
+
+
+DEFAULT_UPSERT_BATCH_SIZE = 256
+DEFAULT_UPSERT_PARALLEL = 4
+DEFAULT_UPSERT_RETRIES = 3
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+    from qdrant_client.http.models import PointStruct
+
+
+class BulkWriter:
+    """Upload pre-embedded points with several requests in flight.
+
+    Points are sent in requests of `batch_size` by `parallel` threads sharing
+    one client (gRPC when the client prefers it). With wait=False Qdrant
+    answers once an update is in its write-ahead log instead of after it is
+    indexed. Failed requests are retried up to `max_retries` times with
+    exponential backoff (or the server's retry-after hint when rate limited).
+
+    Completion callbacks run in the writer's caller thread, in submission
+    order, once every request of their write() call is acknowledged; at most
+    2 x `parallel` requests are outstanding, so a slow server applies
+    backpressure to the caller.
+
+    With metrics, every request is timed as "upsert_request" and the time the
+    caller is held back by write() as "upsert_wait".
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection_name: str,
+        batch_size: int = DEFAULT_UPSERT_BATCH_SIZE,
+        parallel: int = DEFAULT_UPSERT_PARALLEL,
+        wait: bool = False,
+        max_retries: int = DEFAULT_UPSERT_RETRIES,
+        retry_delay_s: float = 1.0,
+        metrics: Optional[StageMetrics] = None,
+    ) -> None:
+        self.client = client
+        self.collection_name = collection_name
+        self.batch_size = max(1, batch_size)
+        self.parallel = max(1, parallel)
+        self.wait = wait
+        self.max_retries = max_retries
+        self.retry_delay_s = retry_delay_s
+        self.metrics = metrics
+        self.points_written = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix="qdrant-upsert")
+        self._inflight: Deque[Tuple[List[Future], Optional[Callable[[], None]]]] = deque()
+
+    def write(self, points: Sequence[PointStruct], on_written: Optional[Callable[[], None]] = None) -> None:
+        """Queue `points` for upload; `on_written` runs once all of them are acknowledged."""
+        futures = [
+            self._executor.submit(self._upsert, list(points[start : start + self.batch_size]))
+            for start in range(0, len(points), self.batch_size)
+        ]
+        self._inflight.append((futures, on_written))
+        with timed(self.metrics, "upsert_wait"):
+            self._complete(max_outstanding=2 * self.parallel)
+
+    def flush(self) -> None:
+        """Wait for every queued request and run the remaining callbacks."""
+        self._complete(max_outstanding=0)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _outstanding(self) -> int:
+        return sum(1 for futures, _ in self._inflight for future in futures if not future.done())
+
+    def _complete(self, max_outstanding: int) -> None:
+        while self._inflight:
+            futures, on_written = self._inflight[0]
+            head_done = all(future.done() for future in futures)
+            if not head_done and self._outstanding() <= max_outstanding:
+                return
+            for future in futures:
+                # Raises the request's error after its retries are exhausted
+                self.points_written += future.result()
+            self._inflight.popleft()
+            if on_written is not None:
+                on_written()
+
+    def _upsert(self, points: List[PointStruct]) -> int:
+        from qdrant_client.common.client_exceptions import ResourceExhaustedResponse
+
+        attempt = 0
+        while True:
+            try:
+                with timed(self.metrics, "upsert_request"):
+                    self.client.upsert(collection_name=self.collection_name, points=points, wait=self.wait)
+                return len(points)
+            except (ValueError, TypeError):
+                raise
+            except Exception as exc:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_delay_s * 2**attempt
+                if isinstance(exc, ResourceExhaustedResponse):
+                    delay = max(delay, float(exc.retry_after_s))
+                attempt += 1
+                if self.metrics is not None:
+                    self.metrics.inc("upsert_retries")
+                logger.warning(
+                    f"Ошибка загрузки {len(points)} точек в Qdrant ({type(exc).__name__}: {exc}), "
+                    f"повтор {attempt}/{self.max_retries} через {delay:.1f} с"
+                )
+                time.sleep(delay)
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Deque, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from loguru import logger
+
+# LangChain and qdrant_client are imported where they are used: the CLI reads
+# the defaults below without them
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_qdrant import SparseEmbeddings
+    from qdrant_client import QdrantClient
+    from qdrant_client.http.models import Filter, SparseVector
+
+
+DEFAULT_QUERY_LIMIT = 10
+# Candidates taken from each of the dense and sparse searches before fusion
+DEFAULT_PREFETCH_LIMIT = 50
+DEFAULT_QUERY_CACHE_SIZE = 1024
+DEFAULT_QUERY_CACHE_TTL_S = 300.0
+# How long a collection's upload_time version is trusted before it is re-read
+DEFAULT_VERSION_TTL_S = 2.0
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl_s` seconds (None: never)."""
+
+    def __init__(self, max_items: int, ttl_s: Optional[float] = None) -> None:
+        self.max_items = max_items
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or (self.ttl_s is not None and time.monotonic() - entry[0] > self.ttl_s):
+                if entry is not None:
+                    del self._items[key]
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class LatencyStats:
+    """Latencies of the last `window` requests, in milliseconds."""
+
+    def __init__(self, window: int = 10000) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+    def summary(self) -> Dict[str, float]:
+        return {"count": self.count, "p50_ms": round(self.percentile(50), 2), "p99_ms": round(self.percentile(99), 2)}
+
+
+class HybridSearcher:
+    """Hybrid search over the collections built by ingest_document_to_qdrant.
+
+    One Qdrant request per query: dense and sparse candidates are prefetched
+    (`prefetch_limit` each, same filter) and merged with Reciprocal Rank
+    Fusion on the server. Results can be filtered by article and chapter
+    number (keyword payload indexes, see app.collection).
+
+    Query embeddings are kept in an LRU cache. Results are kept in a TTL/LRU
+    cache keyed by the collection's version, the latest metadata.upload_time
+    plus the point count; a re-ingest changes it, so stale results are never
+    served. The version itself is re-read at most every `version_ttl_s`.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        dense_embeddings: Embeddings,
+        sparse_embeddings: SparseEmbeddings,
+        prefetch_limit: int = DEFAULT_PREFETCH_LIMIT,
+        cache_size: int = DEFAULT_QUERY_CACHE_SIZE,
+        cache_ttl_s: float = DEFAULT_QUERY_CACHE_TTL_S,
+        version_ttl_s: float = DEFAULT_VERSION_TTL_S,
+    ) -> None:
+        self.client = client
+        self.dense_embeddings = dense_embeddings
+        self.sparse_embeddings = sparse_embeddings
+        self.prefetch_limit = prefetch_limit
+        self.latency = LatencyStats()
+        self._embeddings = TTLCache(cache_size)
+        self._results = TTLCache(cache_size, cache_ttl_s)
+        self._versions = TTLCache(1024, version_ttl_s)
+
+    def warm_up(self) -> None:
+        """Run both models once so the first real query does not pay for lazy initialization."""
+        self._embed("прогрев")
+
+    def search(
+        self,
+        collection_name: str,
+        text: str,
+        limit: int = DEFAULT_QUERY_LIMIT,
+        article_number: Optional[str] = None,
+        chapter_number: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return up to `limit` hits as {"id", "score", "page_content", "metadata"}."""
+        from qdrant_client.http.models import Fusion, FusionQuery, Prefetch
+
+        started = time.perf_counter()
+        try:
+            # Results of an older version are never looked up again and age out of the LRU
+            version = self._collection_version(collection_name)
+            key = (collection_name, version, text, limit, article_number, chapter_number)
+            cached = self._results.get(key, _MISSING)
+            if cached is not _MISSING:
+                return cached
+
+            dense, sparse = self._embed(text)
+            query_filter = _metadata_filter(article_number=article_number, chapter_number=chapter_number)
+            response = self.client.query_points(
+                collection_name=collection_name,
+                prefetch=[
+                    Prefetch(query=dense, using="dense", limit=self.prefetch_limit, filter=query_filter),
+                    Prefetch(query=sparse, using="sparse", limit=self.prefetch_limit, filter=query_filter),
+                ],
+                query=FusionQuery(fusion=Fusion.RRF),
+                limit=limit,
+                with_payload=True,
+            )
+            hits = [
+                {
+                    "id": str(point.id),
+                    "score": point.score,
+                    "page_content": (point.payload or {}).get("page_content"),
+                    "metadata": (point.payload or {}).get("metadata") or {},
+                }
+                for point in response.points
+            ]
+            self._results.put(key, hits)
+            return hits
+        finally:
+            self.latency.record((time.perf_counter() - started) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency.summary(),
+            "result_cache": {"hits": self._results.hits, "misses": self._results.misses, "size": len(self._results)},
+            "embedding_cache": {"hits": self._embeddings.hits, "misses": self._embeddings.misses},
+        }
+
+    def _embed(self, text: str) -> Tuple[List[float], SparseVector]:
+        from qdrant_client.http.models import SparseVector
+
+        cached = self._embeddings.get(text)
+        if cached is not None:
+            return cached
+        sparse = self.sparse_embeddings.embed_query(text)
+        vectors = (
+            list(self.dense_embeddings.embed_query(text)),
+            SparseVector(indices=list(sparse.indices), values=list(sparse.values)),
+        )
+        self._embeddings.put(text, vectors)
+        return vectors
+
+    def _collection_version(self, collection_name: str) -> Tuple[Optional[str], Optional[int]]:
+        from qdrant_client.http.models import Direction, OrderBy
+
+        version = self._versions.get(collection_name)
+        if version is not None:
+            return version
+        points_count = self.client.count(collection_name=collection_name, exact=False).count
+        latest = None
+        try:
+            records, _ = self.client.scroll(
+                collection_name=collection_name,
+                limit=1,
+                order_by=OrderBy(key="metadata.upload_time", direction=Direction.DESC),
+                with_payload=["metadata.upload_time"],
+                with_vectors=False,
+            )
+            if records:
+                latest = ((records[0].payload or {}).get("metadata") or {}).get("upload_time")
+        except Exception as exc:
+            # Collections created before the upload_time index: the point count alone has to do
+            logger.debug(f"Не удалось получить upload_time коллекции {collection_name}: {exc}")
+        version = (latest, points_count)
+        self._versions.put(collection_name, version)
+        return version
+
+
+def _metadata_filter(**conditions: Optional[str]) -> Optional[Filter]:
+    from qdrant_client.http.models import FieldCondition, Filter, MatchValue
+
+    must = [
+        FieldCondition(key=f"metadata.{field}", match=MatchValue(value=str(value)))
+        for field, value in conditions.items()
+        if value is not None
+    ]
+    return Filter(must=must) if must else None
+
+
+def serve(searcher: HybridSearcher, host: str = "0.0.0.0", port: int = 8000) -> None:
+    """Serve GET /search and GET /stats until interrupted.
+
+    /search?doc_id=...&q=...&limit=10&article=...&chapter=... returns the hits
+    and the request's own latency; /stats returns p50/p99 latency and cache
+    hit counts.
+    """
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            url = urlsplit(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if url.path == "/stats":
+                self._reply(200, searcher.stats())
+            elif url.path == "/search":
+                if not params.get("doc_id") or not params.get("q"):
+                    self._reply(400, {"error": "doc_id and q are required"})
+                    return
+                started = time.perf_counter()
+                try:
+                    hits = searcher.search(
+                        params["doc_id"],
+                        params["q"],
+                        limit=int(params.get("limit", DEFAULT_QUERY_LIMIT)),
+                        article_number=params.get("article"),
+                        chapter_number=params.get("chapter"),
+                    )
+                except Exception as exc:
+                    logger.exception("Ошибка поиска")
+                    self._reply(500, {"error": f"{type(exc).__name__}: {exc}"})
+                    return
+                took_ms = (time.perf_counter() - started) * 1000
+                self._reply(200, {"hits": hits, "took_ms": round(took_ms, 2), "latency": searcher.latency.summary()})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def _reply(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - http.server signature
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    logger.info(f"Поиск доступен на http://{host}:{port}/search")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Статистика поиска: {searcher.stats()}")
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Optional
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext as AsyncBrowserContext, Route as AsyncRoute
+    from playwright.sync_api import BrowserContext, Route
+
+
+# Resource types the extractor never needs: only the text of the content
+# container is read.
+DEFAULT_BLOCKED_TYPES = ("image", "font", "media")
+
+# Analytics and tracking hosts seen on government sites.
+DEFAULT_BLOCKED_DOMAINS = (
+    "mc.yandex.ru",
+    "mc.yandex.com",
+    "an.yandex.ru",
+    "top-fwz1.mail.ru",
+    "counter.yadro.ru",
+    "stat.sputnik.ru",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+)
+
+# Rough average transfer sizes per resource type. Aborted requests are never
+# downloaded, so saved bytes can only be estimated.
+_ESTIMATED_BYTES = {
+    "image": 40_000,
+    "font": 35_000,
+    "media": 250_000,
+    "stylesheet": 15_000,
+    "script": 25_000,
+    "xhr": 2_000,
+    "fetch": 2_000,
+}
+_ESTIMATED_BYTES_OTHER = 5_000
+
+
+def _host_matches(host: str, domains: Iterable[str]) -> bool:
+    """True if host equals one of the domains or is a subdomain of one."""
+    for domain in domains:
+        if host == domain or host.endswith("." + domain):
+            return True
+    return False
+
+
+@dataclass
+class ResourcePolicy:
+    """Which browser requests to abort during a crawl.
+
+    - blocked_types: Playwright resource types to abort (image, font, media, ...)
+    - blocked_domains: hosts (with subdomains) whose requests are aborted
+    - allowed_domains: hosts that are never blocked; take precedence over the rest
+    - block_third_party: abort every request to a host other than the start URL's
+      (subresources only; navigations are always allowed)
+    """
+
+    blocked_types: frozenset[str] = frozenset(DEFAULT_BLOCKED_TYPES)
+    blocked_domains: tuple[str, ...] = DEFAULT_BLOCKED_DOMAINS
+    allowed_domains: tuple[str, ...] = ()
+    block_third_party: bool = False
+
+    def should_block(self, url: str, resource_type: str, first_party_host: Optional[str] = None) -> bool:
+        if resource_type == "document":
+            return False
+        host = (urlsplit(url).hostname or "").lower()
+        if not host:
+            return False
+        if _host_matches(host, self.allowed_domains):
+            return False
+        if _host_matches(host, self.blocked_domains):
+            return True
+        if resource_type in self.blocked_types:
+            return True
+        if self.block_third_party and first_party_host and not _host_matches(host, (first_party_host,)):
+            return True
+        return False
+
+
+@dataclass
+class ResourceStats:
+    """Per-run counters of allowed and aborted requests."""
+
+    allowed_requests: int = 0
+    blocked_requests: int = 0
+    estimated_bytes_saved: int = 0
+    blocked_by_type: Counter = field(default_factory=Counter)
+    blocked_by_domain: Counter = field(default_factory=Counter)
+
+    def record(self, url: str, resource_type: str, blocked: bool) -> None:
+        if not blocked:
+            self.allowed_requests += 1
+            return
+        self.blocked_requests += 1
+        self.estimated_bytes_saved += _ESTIMATED_BYTES.get(resource_type, _ESTIMATED_BYTES_OTHER)
+        self.blocked_by_type[resource_type] += 1
+        self.blocked_by_domain[(urlsplit(url).hostname or "").lower()] += 1
+
+    def summary(self) -> str:
+        top_domains = ", ".join(f"{d}={n}" for d, n in self.blocked_by_domain.most_common(5))
+        by_type = ", ".join(f"{t}={n}" for t, n in self.blocked_by_type.most_common())
+        return (
+            f"заблокировано запросов: {self.blocked_requests} "
+            f"(≈{self.estimated_bytes_saved / 1024:.0f} КБ), пропущено: {self.allowed_requests}; "
+            f"по типам: {by_type or '-'}; домены: {top_domains or '-'}"
+        )
+
+
+def _first_party_host(first_party_url: Optional[str]) -> Optional[str]:
+    return (urlsplit(first_party_url).hostname or "").lower() if first_party_url else None
+
+
+def install_resource_policy(
+    context: BrowserContext,
+    policy: ResourcePolicy,
+    first_party_url: Optional[str] = None,
+) -> ResourceStats:
+    """Route every request of `context` through `policy` and count the outcome."""
+    stats = ResourceStats()
+    first_party_host = _first_party_host(first_party_url)
+
+    def _handle(route: Route) -> None:
+        request = route.request
+        blocked = policy.should_block(request.url, request.resource_type, first_party_host)
+        stats.record(request.url, request.resource_type, blocked)
+        try:
+            if blocked:
+                route.abort("blockedbyclient")
+            else:
+                route.continue_()
+        except Exception:
+            pass
+
+    context.route("**/*", _handle)
+    return stats
+
+
+async def install_resource_policy_async(
+    context: AsyncBrowserContext,
+    policy: ResourcePolicy,
+    first_party_url: Optional[str] = None,
+) -> ResourceStats:
+    """Async API counterpart of install_resource_policy."""
+    stats = ResourceStats()
+    first_party_host = _first_party_host(first_party_url)
+
+    async def _handle(route: AsyncRoute) -> None:
+        request = route.request
+        blocked = policy.should_block(request.url, request.resource_type, first_party_host)
+        stats.record(request.url, request.resource_type, blocked)
+        try:
+            if blocked:
+                await route.abort("blockedbyclient")
+            else:
+                await route.continue_()
+        except Exception:
+            pass
+
+    await context.route("**/*", _handle)
+    return stats
+
+
+def log_resource_stats(stats: Optional[ResourceStats]) -> None:
+    if stats is not None:
+        logger.info(f"Фильтр ресурсов: {stats.summary()}")
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, TypeVar
+
+from loguru import logger
+
+
+T = TypeVar("T")
+
+# Log labels of the startup phases, in the order they are reported
+_PHASE_LABELS = {
+    "imports": "импорт модулей",
+    "dense_model": "загрузка FRIDA (в фоне)",
+    "sparse_model": "загрузка BM25 (в фоне)",
+    "tokenizer": "загрузка токенизатора (в фоне)",
+    "collection": "подготовка коллекции",
+    "first_page": "браузер и первая страница",
+    "model_wait": "ожидание моделей",
+}
+
+
+class StartupProfile:
+    """Wall-clock seconds spent in each startup phase (see _PHASE_LABELS)."""
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def summary(self) -> str:
+        with self._lock:
+            phases = dict(self.phases)
+        ordered = [name for name in _PHASE_LABELS if name in phases] + [n for n in phases if n not in _PHASE_LABELS]
+        return ", ".join(f"{_PHASE_LABELS.get(name, name)} {phases[name]:.2f} с" for name in ordered)
+
+
+# Phases of the process as a whole (imports); documents keep their own profile
+STARTUP = StartupProfile()
+
+
+def load_in_background(load: Callable[[], T], name: str, on_loaded: Optional[Callable[[float], None]] = None) -> Future:
+    """Run `load` on a daemon thread; the returned future holds its result or error.
+
+    on_loaded, if given, receives the load time in seconds once `load` succeeded.
+    """
+    future: Future = Future()
+
+    def _run() -> None:
+        started = time.perf_counter()
+        try:
+            result = load()
+        except BaseException as exc:  # noqa: BLE001 - handed to whoever waits for the model
+            logger.error(f"Не удалось загрузить {name}: {type(exc).__name__}: {exc}")
+            future.set_exception(exc)
+            return
+        if on_loaded is not None:
+            on_loaded(time.perf_counter() - started)
+        future.set_result(result)
+
+    threading.Thread(target=_run, name=f"load-{name}", daemon=True).start()
+    return future
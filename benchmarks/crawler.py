@@ -0,0 +1,201 @@
+"""End-to-end crawler benchmark against a local synthetic document site.
+
+Serves a paginated `.reader_article_body` document from benchmarks.synthetic_site
+("Следующая" links and/or "show more" appends, optional per-request latency)
+and crawls it headless with humanize off through `iterate_page_paragraphs`,
+`paginate_until_end` and, for per-URL pages, `iterate_page_paragraphs_parallel`.
+Reports pages/s, ms/page and the peak RSS of the whole process tree (Python,
+Playwright driver and Chromium), so runs can be compared against a baseline
+without touching the live site. The sequential and parallel crawls must yield
+the served document exactly and both stop at its end (END_OF_DOCUMENT).
+
+    python -m benchmarks.crawler --pages 50 --paragraphs-per-page 40 --latency-ms 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import resource
+import statistics
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.parallel_crawl import iterate_page_paragraphs_parallel
+from app.parser import END_OF_DOCUMENT, iterate_page_paragraphs, paginate_until_end
+from benchmarks.synthetic_site import SITE_MODES, SyntheticSite
+
+
+_NEXT_TEXT = {"next": "Следующая", "more": "Показать еще"}
+# Page loads in flight for iterate_page_paragraphs_parallel
+_PARALLEL_PAGES = 4
+
+
+def _tree_rss_kb(root: int) -> Optional[int]:
+    """Resident memory of `root` and all its descendants, from /proc (None where unavailable)."""
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return None
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status", encoding="utf-8") as fh:
+                fields = dict(line.split(":", 1) for line in fh if ":" in line)
+        except OSError:
+            continue
+        pid = int(entry)
+        children.setdefault(int(fields.get("PPid", "0").strip() or 0), []).append(pid)
+        rss[pid] = int(fields.get("VmRSS", "0 kB").split()[0])
+    total, stack = 0, [root]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+
+class PeakRss:
+    """Sample the process tree's RSS every `interval_s` while active."""
+
+    def __init__(self, interval_s: float = 0.05) -> None:
+        self.interval_s = interval_s
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            current = _tree_rss_kb(os.getpid())
+            if current is None:
+                return
+            self.peak_kb = max(self.peak_kb, current)
+            self._stop.wait(self.interval_s)
+
+    def __enter__(self) -> "PeakRss":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        if not self.peak_kb:
+            # No /proc: fall back to this process' own high-water mark
+            self.peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _crawl_iterate(
+    site: SyntheticSite, content_selector: str, next_selector: str, on_end: Callable[[str], None]
+) -> List[str]:
+    paragraphs: List[str] = []
+    for page_paragraphs in iterate_page_paragraphs(
+        site.start_url,
+        next_selector=next_selector,
+        next_text=_NEXT_TEXT[site.mode],
+        headless=True,
+        content_selector=content_selector,
+        humanize=False,
+        on_end=on_end,
+    ):
+        paragraphs.extend(page_paragraphs)
+    return paragraphs
+
+
+def _crawl_parallel(
+    site: SyntheticSite, content_selector: str, next_selector: str, on_end: Callable[[str], None]
+) -> List[str]:
+    paragraphs: List[str] = []
+    for page_paragraphs in iterate_page_paragraphs_parallel(
+        site.start_url,
+        site.page_url_template,
+        workers=_PARALLEL_PAGES,
+        content_selector=content_selector,
+        headless=True,
+        next_selector=next_selector,
+        next_text=_NEXT_TEXT[site.mode],
+        on_end=on_end,
+    ):
+        paragraphs.extend(page_paragraphs)
+    return paragraphs
+
+
+def _crawl_paginate(
+    site: SyntheticSite, content_selector: str, next_selector: str, on_end: Callable[[str], None]
+) -> List[str]:
+    return paginate_until_end(
+        site.start_url,
+        next_selector=next_selector,
+        next_text=_NEXT_TEXT[site.mode],
+        headless=True,
+        content_selector=content_selector,
+    )
+
+
+CRAWLERS: Dict[str, Callable[[SyntheticSite, str, str, Callable[[str], None]], List[str]]] = {
+    "iterate_page_paragraphs": _crawl_iterate,
+    "paginate_until_end": _crawl_paginate,
+    "parallel": _crawl_parallel,
+}
+# Crawlers that must yield the served document exactly and report its end
+_EXACT_CRAWLERS = ("iterate_page_paragraphs", "parallel")
+# Pages addressed by URL are needed to load them in parallel
+_CRAWLER_MODES = {"parallel": ("next",)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--paragraphs-per-page", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response")
+    parser.add_argument("--mode", choices=SITE_MODES + ("all",), default="all")
+    parser.add_argument("--crawler", choices=tuple(CRAWLERS) + ("all",), default="all")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--content-selector", type=str, default=".reader_article_body")
+    parser.add_argument("--next-selector", type=str, default=".show-more")
+    args = parser.parse_args()
+
+    modes = SITE_MODES if args.mode == "all" else (args.mode,)
+    crawlers = tuple(CRAWLERS) if args.crawler == "all" else (args.crawler,)
+    print(
+        f"pages: {args.pages}, paragraphs/page: {args.paragraphs_per_page}, "
+        f"latency: {args.latency_ms:g} ms, repeat: {args.repeat}"
+    )
+    for mode in modes:
+        # Paragraphs and end reasons of the exact crawlers, compared once all of them ran
+        crawled: Dict[str, Tuple[List[str], List[str]]] = {}
+        for name in crawlers:
+            if mode not in _CRAWLER_MODES.get(name, SITE_MODES):
+                continue
+            durations: List[float] = []
+            with SyntheticSite(args.pages, args.paragraphs_per_page, mode, args.latency_ms) as site, PeakRss() as rss:
+                for _ in range(args.repeat):
+                    end_reasons: List[str] = []
+                    t0 = time.perf_counter()
+                    paragraphs = CRAWLERS[name](site, args.content_selector, args.next_selector, end_reasons.append)
+                    durations.append(time.perf_counter() - t0)
+                    # paginate_until_end may merge paragraphs across page seams; the others must be exact
+                    if name in _EXACT_CRAWLERS:
+                        if paragraphs != site.paragraphs:
+                            raise SystemExit(f"{name} ({mode}): crawled paragraphs differ from the served document")
+                        if end_reasons != [END_OF_DOCUMENT]:
+                            raise SystemExit(f"{name} ({mode}): crawl ended with {end_reasons}, not at the document end")
+                        crawled[name] = (paragraphs, end_reasons)
+                    if not paragraphs:
+                        raise SystemExit(f"{name} ({mode}): nothing was crawled")
+            requests_per_run = site.requests / args.repeat
+            if requests_per_run != args.pages:
+                raise SystemExit(f"{name} ({mode}): fetched {requests_per_run:g} of {args.pages} pages per run")
+            median_s = statistics.median(durations)
+            print(
+                f"{name:<24} {mode:<4}  {args.pages / median_s:7.1f} pages/s  "
+                f"{median_s * 1000 / args.pages:8.1f} ms/page  peak RSS {rss.peak_kb / 1024:7.1f} MiB"
+            )
+        if len({repr(result) for result in crawled.values()}) > 1:
+            raise SystemExit(f"{' and '.join(crawled)} ({mode}): sequential and parallel crawls differ")
+
+
+if __name__ == "__main__":
+    main()
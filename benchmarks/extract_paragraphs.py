@@ -0,0 +1,63 @@
+"""Micro-benchmark: single-evaluation vs per-node paragraph extraction.
+
+Loads a local synthetic `.reader_article_body` page into headless Chromium and
+times `_extract_paragraphs` (one in-page evaluation) against
+`_extract_paragraphs_per_node` (one Playwright round trip per `<p>`).
+
+    python -m benchmarks.extract_paragraphs --articles 200 --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from playwright.sync_api import sync_playwright
+
+from app.parser import _extract_paragraphs, _extract_paragraphs_per_node
+from benchmarks.fixtures import make_document_paragraphs, render_reader_page
+
+
+def _time_ms(fn, repeat: int) -> list[float]:
+    samples: list[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--content-selector", type=str, default=".reader_article_body")
+    args = parser.parse_args()
+
+    paragraphs = make_document_paragraphs(args.articles)
+    html = render_reader_page(paragraphs)
+
+    with sync_playwright() as pw:
+        browser = pw.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.set_content(html)
+
+        fast = _extract_paragraphs(page, args.content_selector)
+        slow = _extract_paragraphs_per_node(page, args.content_selector)
+        if fast != slow:
+            raise SystemExit("Results differ between extraction methods")
+
+        fast_ms = _time_ms(lambda: _extract_paragraphs(page, args.content_selector), args.repeat)
+        slow_ms = _time_ms(lambda: _extract_paragraphs_per_node(page, args.content_selector), args.repeat)
+        browser.close()
+
+    fast_med = statistics.median(fast_ms)
+    slow_med = statistics.median(slow_ms)
+    print(f"paragraphs: {len(fast)}")
+    print(f"single evaluation: median {fast_med:.1f} ms")
+    print(f"per node:          median {slow_med:.1f} ms")
+    print(f"speedup:           x{slow_med / fast_med:.1f}" if fast_med > 0 else "speedup: n/a")
+
+
+if __name__ == "__main__":
+    main()
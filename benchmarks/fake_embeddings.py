@@ -0,0 +1,53 @@
+"""Deterministic stand-ins for FRIDA and BM25, so ingest benchmarks need no model."""
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import SparseEmbeddings, SparseVector
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashEmbeddings(Embeddings):
+    """Unit vectors derived from a hash of the text; `delay_s` per text imitates model time."""
+
+    def __init__(self, dimension: int = 1536, delay_s: float = 0.0) -> None:
+        self.model_name = f"hash-{dimension}"
+        self.dimension = dimension
+        self.delay_s = delay_s
+
+    def _vector(self, text: str) -> List[float]:
+        import numpy as np
+
+        vector = np.random.default_rng(_seed(text)).standard_normal(self.dimension, dtype=np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.delay_s:
+            time.sleep(self.delay_s * len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+class HashSparseEmbeddings(SparseEmbeddings):
+    """Bag of hashed words with term counts, shaped like the BM25 vectors."""
+
+    model_name = "hash-bm25"
+
+    def embed_documents(self, texts: List[str]) -> List[SparseVector]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> SparseVector:
+        counts: dict = {}
+        for word in text.lower().split():
+            index = _seed(word) % 2**31
+            counts[index] = counts.get(index, 0.0) + 1.0
+        indices = sorted(counts)
+        return SparseVector(indices=indices, values=[counts[index] for index in indices])
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import random
+from typing import List
+
+
+_WORDS = (
+    "суд вправе лицо договор права обязанности в случае если иное не предусмотрено "
+    "настоящим кодексом федеральным законом порядке установленном требования сторон"
+).split()
+
+
+def make_paragraph(rng: random.Random, min_words: int = 8, max_words: int = 60) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return (" ".join(words)).capitalize() + "."
+
+
+def make_document_paragraphs(articles: int, paras_per_article: int = 4, seed: int = 0) -> List[str]:
+    """Paragraphs of a synthetic legal code: chapters, "Статья N." headings and body text."""
+    rng = random.Random(seed)
+    paragraphs: List[str] = []
+    for number in range(1, articles + 1):
+        if number % 10 == 1:
+            paragraphs.append(f"Глава {number // 10 + 1}. {make_paragraph(rng, 2, 5)}")
+        paragraphs.append(f"Статья {number}. {make_paragraph(rng, 2, 8)}")
+        for _ in range(paras_per_article):
+            paragraphs.append(make_paragraph(rng))
+    return paragraphs
+
+
+def render_reader_page(paragraphs: List[str], title: str = "Документ", extra_body: str = "") -> str:
+    """Render paragraphs in the government.ru `.reader_article_body` layout."""
+    body = "\n".join(f'<p class="doc__text">{p}</p>' for p in paragraphs)
+    return (
+        "<!DOCTYPE html><html lang=\"ru\"><head><meta charset=\"utf-8\">"
+        f"<title>{title}</title></head><body>"
+        "<header><nav><a href=\"/\">Главная</a></nav></header>"
+        f"<main><div class=\"reader_article_body\">\n{body}\n</div>{extra_body}</main>"
+        "<footer>© 2024</footer></body></html>"
+    )
+
+
+def make_recorded_pages(articles: int, paragraphs_per_page: int = 40, seed: int = 0) -> List[List[str]]:
+    """Page paragraphs of a synthetic code as a crawler records them, seams included.
+
+    Odd page boundaries cut a paragraph mid-sentence (the next page
+    continues it); even ones repeat the tail of the previous page at the
+    start of the next, so seam merging and overlap trimming do real work.
+    """
+    paragraphs = make_document_paragraphs(articles, seed=seed)
+    pages = [paragraphs[start : start + paragraphs_per_page] for start in range(0, len(paragraphs), paragraphs_per_page)]
+    for idx in range(1, len(pages)):
+        previous, page = pages[idx - 1], pages[idx]
+        if idx % 2 == 1:
+            words = previous[-1].split()
+            if len(words) > 3:
+                middle = len(words) // 2
+                previous[-1] = " ".join(words[:middle])
+                page.insert(0, " ".join(words[middle:]))
+        elif len(previous[-1]) >= 30:
+            # The shortest overlap the exact-match trimming looks for (30..200 chars in steps of 10)
+            longest = min(len(previous[-1]), 200)
+            page[0] = previous[-1][-(30 + (longest - 30) % 10):] + page[0]
+    return pages
@@ -0,0 +1,151 @@
+"""Ingest-path benchmark: chunking and upload of a full code, without a model or a server.
+
+Feeds recorded page paragraphs through the CPU side of app.ingest: seam
+merging, the article/chapter aggregator, per-page dedup, splitting, point
+IDs and payload construction. Three measurements:
+
+- chunking: `_iterate_chunk_batches` + `_chunk_points` alone (the hot loop);
+- ingest: `ingest_document_to_qdrant` replaying the pages from a temporary
+  PageCache into QdrantClient(":memory:"), sequential and pipelined, with a
+  deterministic hash embedder (or a real backend via --embedder);
+- allocations: the chunking pass under tracemalloc, per article.
+
+Pages come from benchmarks.fixtures (a synthetic code with split and
+overlapping seams) unless --page-cache-dir/--doc-id point at recorded ones.
+
+    python -m benchmarks.ingest --articles 500 --repeat 3
+    python -m benchmarks.ingest --page-cache-dir .page_cache --doc-id nk_part1
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import re
+import statistics
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+from typing import List
+
+from loguru import logger
+
+from app.chunking import DEFAULT_CHUNK_OVERLAP_TOKENS, DEFAULT_MAX_CHUNK_TOKENS, ArticleSplitter, make_token_counter
+from app.embedders import DENSE_BACKENDS, DENSE_MODEL_NAME, make_dense_embeddings
+from app.ingest import _chunk_points, _iterate_chunk_batches, ingest_document_to_qdrant
+from app.options import ChunkOptions, CrawlOptions, EmbeddingOptions
+from app.page_cache import PageCache
+from benchmarks.fake_embeddings import HashEmbeddings, HashSparseEmbeddings
+from benchmarks.fixtures import make_recorded_pages
+
+
+_ARTICLE_PATTERN = re.compile(r"^Статья\s+\d+[\.|\-]?")
+
+
+def _chunk(pages: List[List[str]], splitter: ArticleSplitter) -> tuple[int, int, list]:
+    """One chunking pass; returns (chunks, articles, points) with constant vectors."""
+    dense = [0.0] * 8
+    sparse = HashSparseEmbeddings().embed_query("статья")
+    articles = set()
+    points = []
+    chunks = 0
+    for batch in _iterate_chunk_batches(pages, _ARTICLE_PATTERN, "bench", splitter=splitter):
+        batch.dense = [dense] * len(batch.texts)
+        batch.sparse = [sparse] * len(batch.texts)
+        points.extend(_chunk_points(batch))
+        chunks += len(batch.texts)
+        articles.update((meta.get("chapter_number"), meta.get("article_number")) for meta in batch.metadatas)
+    return chunks, len(articles), points
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=500, help="Size of the synthetic code")
+    parser.add_argument("--paragraphs-per-page", type=int, default=40)
+    parser.add_argument("--page-cache-dir", type=str, default=None, help="Use pages recorded by --page-cache-dir")
+    parser.add_argument("--doc-id", type=str, default=None)
+    parser.add_argument("--embedder", choices=("hash",) + DENSE_BACKENDS, default="hash")
+    parser.add_argument("--embed-delay-ms", type=float, default=0.0, help="Per-text delay of the hash embedder")
+    parser.add_argument("--max-chunk-tokens", type=int, default=DEFAULT_MAX_CHUNK_TOKENS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.page_cache_dir:
+        if not args.doc_id:
+            parser.error("--page-cache-dir requires --doc-id")
+        pages = list(PageCache(args.page_cache_dir).iterate_pages(args.doc_id))
+    else:
+        pages = make_recorded_pages(args.articles, args.paragraphs_per_page)
+    # The per-page log lines would dominate the timings
+    logger.remove()
+    warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+
+    count_tokens = make_token_counter(DENSE_MODEL_NAME)
+    splitter = ArticleSplitter(args.max_chunk_tokens, DEFAULT_CHUNK_OVERLAP_TOKENS, count_tokens)
+    print(f"pages: {len(pages)}, paragraphs: {sum(len(page) for page in pages)}, repeat: {args.repeat}")
+
+    # 1) Chunking hot loop
+    durations: List[float] = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        chunks, articles, _points = _chunk(pages, splitter)
+        durations.append(time.perf_counter() - t0)
+    median_s = statistics.median(durations)
+    print(
+        f"chunking      {chunks / median_s:10.0f} chunks/s  {median_s * 1e6 / max(articles, 1):8.1f} us/article  "
+        f"({chunks} chunks, {articles} articles)"
+    )
+
+    # 2) Allocations of the chunking pass
+    gc.collect()
+    tracemalloc.start()
+    _, _, points = _chunk(pages, splitter)
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = snapshot.statistics("lineno")
+    blocks = sum(stat.count for stat in stats)
+    print(
+        f"allocations   {blocks / max(articles, 1):10.1f} live blocks/article  "
+        f"{peak / 1024 / max(articles, 1):8.1f} KiB/article peak"
+    )
+    for stat in [stat for stat in stats if "/app/" in stat.traceback[0].filename][:5]:
+        frame = stat.traceback[0]
+        print(f"    {Path(frame.filename).name}:{frame.lineno}  {stat.count} blocks, {stat.size / 1024:.0f} KiB")
+    del points, snapshot, stats
+
+    # 3) Full ingest from a page cache into in-memory Qdrant
+    if args.embedder == "hash":
+        dense = HashEmbeddings(delay_s=args.embed_delay_ms / 1000.0)
+    else:
+        dense = make_dense_embeddings(args.embedder)
+    sparse = HashSparseEmbeddings()
+    with tempfile.TemporaryDirectory(prefix="bench-ingest-") as cache_dir:
+        recorder = PageCache(cache_dir).recorder("bench", "about:blank")
+        for page in pages:
+            recorder(page)
+        recorder.commit()
+        for pipelined in (False, True):
+            durations = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                uploaded = ingest_document_to_qdrant(
+                    "bench",
+                    "about:blank",
+                    crawl=CrawlOptions(page_cache_dir=cache_dir, replay=True),
+                    chunking=ChunkOptions(max_chunk_tokens=args.max_chunk_tokens),
+                    embedding=EmbeddingOptions(dense=dense, sparse=sparse),
+                    pipelined=pipelined,
+                )
+                durations.append(time.perf_counter() - t0)
+            median_s = statistics.median(durations)
+            mode = "pipelined" if pipelined else "sequential"
+            print(
+                f"ingest {mode:<10} {uploaded / median_s:7.0f} chunks/s  "
+                f"{median_s * 1000 / max(articles, 1):8.2f} ms/article  ({uploaded} chunks)"
+            )
+
+
+if __name__ == "__main__":
+    main()
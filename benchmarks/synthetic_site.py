@@ -0,0 +1,144 @@
+"""Local stand-in for government.ru document pages, served over HTTP.
+
+A document of `pages` x `paragraphs_per_page` synthetic paragraphs (see
+fixtures.make_document_paragraphs) is served in the `.reader_article_body`
+layout in one of two modes:
+
+- "next": every page is its own URL, `/doc/<n>`, linked by an
+  `a.show-more` "Следующая" link (full navigation per page);
+- "more": `/doc/1` holds the first part and an `a.show-more` "Показать еще"
+  control that fetches `/fragment/<n>` and appends its paragraphs to the
+  container in place; the control is removed after the last fragment.
+
+Every response is delayed by `latency_ms` to imitate the network.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List
+
+from benchmarks.fixtures import make_document_paragraphs, render_reader_page
+
+
+SITE_MODES = ("next", "more")
+
+_SHOW_MORE_JS = """
+<script>
+document.addEventListener('click', async (event) => {
+  const control = event.target.closest('.show-more');
+  if (!control) return;
+  event.preventDefault();
+  const next = Number(control.dataset.next);
+  const response = await fetch('/fragment/' + next);
+  const html = await response.text();
+  document.querySelector('.reader_article_body').insertAdjacentHTML('beforeend', html);
+  if (next >= Number(control.dataset.last)) {
+    control.remove();
+  } else {
+    control.dataset.next = String(next + 1);
+  }
+});
+</script>
+"""
+
+
+class SyntheticSite:
+    """Threaded HTTP server for a synthetic paginated document; use as a context manager."""
+
+    def __init__(
+        self,
+        pages: int = 20,
+        paragraphs_per_page: int = 40,
+        mode: str = "next",
+        latency_ms: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        if mode not in SITE_MODES:
+            raise ValueError(f"Unknown site mode {mode!r}; expected one of {SITE_MODES}")
+        self.pages = pages
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.requests = 0
+        # Article headings take a paragraph of their own, so generate a little extra and slice
+        paragraphs = make_document_paragraphs(pages * paragraphs_per_page // 4 + 1, seed=seed)
+        paragraphs = paragraphs[: pages * paragraphs_per_page]
+        self.parts: List[List[str]] = [
+            paragraphs[idx * paragraphs_per_page : (idx + 1) * paragraphs_per_page] for idx in range(pages)
+        ]
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="synthetic-site", daemon=True)
+
+    @property
+    def paragraphs(self) -> List[str]:
+        return [paragraph for part in self.parts for paragraph in part]
+
+    @property
+    def start_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/doc/1"
+
+    @property
+    def page_url_template(self) -> str:
+        """URL of page N in "next" mode, for iterate_page_paragraphs_parallel."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/doc/{{page}}"
+
+    def render_page(self, number: int) -> str:
+        if self.mode == "next":
+            control = (
+                f'<a class="show-more" href="/doc/{number + 1}">Следующая</a>' if number < self.pages else ""
+            )
+            return render_reader_page(self.parts[number - 1], title=f"Документ, страница {number}", extra_body=control)
+        control = (
+            f'<a class="show-more" href="#" data-next="2" data-last="{self.pages}">Показать еще</a>'
+            if self.pages > 1
+            else ""
+        )
+        return render_reader_page(self.parts[0], extra_body=control + _SHOW_MORE_JS)
+
+    def render_fragment(self, number: int) -> str:
+        return "\n".join(f'<p class="doc__text">{p}</p>' for p in self.parts[number - 1])
+
+    def _handler(self):
+        site = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 - http.server naming
+                kind, _, number = self.path.strip("/").partition("/")
+                try:
+                    number = int(number)
+                except ValueError:
+                    number = 0
+                if not 1 <= number <= site.pages or (kind, site.mode) not in (
+                    ("doc", "next"),
+                    ("doc", "more"),
+                    ("fragment", "more"),
+                ) or (kind == "doc" and site.mode == "more" and number != 1):
+                    self.send_error(404)
+                    return
+                if site.latency_ms:
+                    time.sleep(site.latency_ms / 1000.0)
+                with site._lock:
+                    site.requests += 1
+                body = (site.render_page(number) if kind == "doc" else site.render_fragment(number)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - http.server signature
+                pass
+
+        return _Handler
+
+    def __enter__(self) -> "SyntheticSite":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
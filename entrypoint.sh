@@ -11,10 +11,44 @@ HEADLESS="${HEADLESS:-1}"
 MAX_PAGES="${MAX_PAGES:-}"
 ARTICLE_REGEX="${ARTICLE_REGEX:-}"
 NO_ARTICLE_GROUPING="${NO_ARTICLE_GROUPING:-}"
+MAX_CHUNK_TOKENS="${MAX_CHUNK_TOKENS:-}"
 NO_RECREATE="${NO_RECREATE:-}"
+PIPELINED="${PIPELINED:-}"
+QUEUE_SIZE="${QUEUE_SIZE:-}"
+EMBED_BATCH_TOKENS="${EMBED_BATCH_TOKENS:-}"
+EMBEDDING_BACKEND="${EMBEDDING_BACKEND:-}"
+EMBEDDING_THREADS="${EMBEDDING_THREADS:-}"
+EMBEDDING_WORKERS="${EMBEDDING_WORKERS:-}"
+UPSERT_PARALLEL="${UPSERT_PARALLEL:-}"
+COLLECTION_PROFILE="${COLLECTION_PROFILE:-}"
+METRICS_PORT="${METRICS_PORT:-}"
+METRICS_FILE="${METRICS_FILE:-}"
+NO_RESOURCE_BLOCKING="${NO_RESOURCE_BLOCKING:-}"
+MANIFEST="${MANIFEST:-}"
+CONCURRENCY="${CONCURRENCY:-}"
+PER_HOST_LIMIT="${PER_HOST_LIMIT:-}"
+FETCHER="${FETCHER:-}"
+NEXT_URL_TEMPLATE="${NEXT_URL_TEMPLATE:-}"
+PAGE_CACHE_DIR="${PAGE_CACHE_DIR:-}"
+REPLAY="${REPLAY:-}"
+EMBEDDING_CACHE_DIR="${EMBEDDING_CACHE_DIR:-}"
+EMBEDDING_CACHE_MAX_MB="${EMBEDDING_CACHE_MAX_MB:-}"
+CHECKPOINT_DIR="${CHECKPOINT_DIR:-}"
+RESUME="${RESUME:-}"
 
-cmd=(python main.py "$DOC_ID" "$START_URL" \
-  --qdrant-url "$QDRANT_URL" \
+if [[ -n "$MANIFEST" ]]; then
+  cmd=(python main.py batch "$MANIFEST")
+  if [[ -n "$CONCURRENCY" ]]; then
+    cmd+=("--concurrency" "$CONCURRENCY")
+  fi
+  if [[ -n "$PER_HOST_LIMIT" ]]; then
+    cmd+=("--per-host-limit" "$PER_HOST_LIMIT")
+  fi
+else
+  cmd=(python main.py "$DOC_ID" "$START_URL")
+fi
+
+cmd+=(--qdrant-url "$QDRANT_URL" \
   --next-selector "$NEXT_SELECTOR" \
   --next-text "$NEXT_TEXT" \
   --content-selector "$CONTENT_SELECTOR")
@@ -28,9 +62,69 @@ fi
 if [[ "$NO_ARTICLE_GROUPING" == "1" || "$NO_ARTICLE_GROUPING" == "true" ]]; then
   cmd+=("--no-article-grouping")
 fi
+if [[ -n "$MAX_CHUNK_TOKENS" ]]; then
+  cmd+=("--max-chunk-tokens" "$MAX_CHUNK_TOKENS")
+fi
 if [[ "$NO_RECREATE" == "1" || "$NO_RECREATE" == "true" ]]; then
   cmd+=("--no-recreate")
 fi
+if [[ "$PIPELINED" == "1" || "$PIPELINED" == "true" ]]; then
+  cmd+=("--pipelined")
+fi
+if [[ -n "$QUEUE_SIZE" ]]; then
+  cmd+=("--queue-size" "$QUEUE_SIZE")
+fi
+if [[ -n "$EMBED_BATCH_TOKENS" ]]; then
+  cmd+=("--embed-batch-tokens" "$EMBED_BATCH_TOKENS")
+fi
+if [[ -n "$EMBEDDING_BACKEND" ]]; then
+  cmd+=("--embedding-backend" "$EMBEDDING_BACKEND")
+fi
+if [[ -n "$EMBEDDING_THREADS" ]]; then
+  cmd+=("--embedding-threads" "$EMBEDDING_THREADS")
+fi
+if [[ -n "$EMBEDDING_WORKERS" ]]; then
+  cmd+=("--embedding-workers" "$EMBEDDING_WORKERS")
+fi
+if [[ -n "$UPSERT_PARALLEL" ]]; then
+  cmd+=("--upsert-parallel" "$UPSERT_PARALLEL")
+fi
+if [[ -n "$COLLECTION_PROFILE" ]]; then
+  cmd+=("--collection-profile" "$COLLECTION_PROFILE")
+fi
+if [[ -n "$METRICS_PORT" ]]; then
+  cmd+=("--metrics-port" "$METRICS_PORT")
+fi
+if [[ -n "$METRICS_FILE" ]]; then
+  cmd+=("--metrics-file" "$METRICS_FILE")
+fi
+if [[ -n "$FETCHER" ]]; then
+  cmd+=("--fetcher" "$FETCHER")
+fi
+if [[ -n "$NEXT_URL_TEMPLATE" ]]; then
+  cmd+=("--next-url-template" "$NEXT_URL_TEMPLATE")
+fi
+if [[ -n "$PAGE_CACHE_DIR" ]]; then
+  cmd+=("--page-cache-dir" "$PAGE_CACHE_DIR")
+fi
+if [[ "$REPLAY" == "1" || "$REPLAY" == "true" ]]; then
+  cmd+=("--replay")
+fi
+if [[ -n "$EMBEDDING_CACHE_DIR" ]]; then
+  cmd+=("--embedding-cache-dir" "$EMBEDDING_CACHE_DIR")
+fi
+if [[ -n "$EMBEDDING_CACHE_MAX_MB" ]]; then
+  cmd+=("--embedding-cache-max-mb" "$EMBEDDING_CACHE_MAX_MB")
+fi
+if [[ -n "$CHECKPOINT_DIR" ]]; then
+  cmd+=("--checkpoint-dir" "$CHECKPOINT_DIR")
+fi
+if [[ "$RESUME" == "1" || "$RESUME" == "true" ]]; then
+  cmd+=("--resume")
+fi
+if [[ "$NO_RESOURCE_BLOCKING" == "1" || "$NO_RESOURCE_BLOCKING" == "true" ]]; then
+  cmd+=("--no-resource-blocking")
+fi
 if [[ "$HEADLESS" == "1" || "$HEADLESS" == "true" ]]; then
   cmd+=("--headless")
 fi
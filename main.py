@@ -1,14 +1,37 @@
 import argparse
+import dataclasses
+import json
+import sys
+import time
+from typing import List, Optional
 
 from loguru import logger
 
-from app.ingest import ingest_document_to_qdrant
+from app.collection import COLLECTION_PROFILES, DEFAULT_COLLECTION_PROFILE, connect
+from app.checkpoint import DEFAULT_CHECKPOINT_DIR
+from app.chunking import DEFAULT_CHUNK_OVERLAP_TOKENS, DEFAULT_MAX_CHUNK_TOKENS
+from app.embed_batching import DEFAULT_EMBED_BATCH_TOKENS, DEFAULT_EMBED_MAX_DELAY_S
+from app.embedders import DEFAULT_ONNX_CACHE_DIR, DENSE_BACKENDS, make_dense_embeddings
+from app.embedding_cache import DEFAULT_EMBEDDING_CACHE_DIR, DEFAULT_EMBEDDING_CACHE_MAX_MB
+from app.fetch_modes import FETCHER_MODES
+from app.metrics import start_metrics_server
+from app.options import ChunkOptions, CrawlOptions, EmbeddingOptions, StorageOptions
+from app.page_cache import DEFAULT_PAGE_CACHE_DIR
+from app.qdrant_writer import DEFAULT_UPSERT_BATCH_SIZE, DEFAULT_UPSERT_PARALLEL
+from app.resources import DEFAULT_BLOCKED_DOMAINS, DEFAULT_BLOCKED_TYPES, ResourcePolicy
+from app.startup import STARTUP
 
+# app.ingest and app.batch pull in LangChain, the Qdrant client and Playwright;
+# they are imported by the subcommand that needs them, after argument parsing.
+# The modules imported here keep those imports inside their functions.
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Parse a doc and ingest paragraphs into Qdrant")
-    parser.add_argument("doc_id", help="Unique document id for collection naming and payload")
-    parser.add_argument("start_url", help="Start URL")
+
+def _csv_list(value: str) -> list[str]:
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+
+def _add_ingest_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options shared by single-document and batch ingestion."""
     parser.add_argument("--next-selector", type=str, default=".show-more")
     parser.add_argument("--next-text", type=str, default="Следующая")
     parser.add_argument("--content-selector", type=str, default=".reader_article_body")
@@ -18,37 +41,313 @@ def main() -> None:
                         help="Regex to detect article headings; use '' to disable")
     parser.add_argument("--no-article-grouping", action="store_true",
                         help="Do not group paragraphs into articles; single document chunk")
+    parser.add_argument("--max-chunk-tokens", type=int, default=DEFAULT_MAX_CHUNK_TOKENS,
+                        help="Split longer articles into parts on '1.' / 'а)' boundaries; 0 disables splitting")
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=DEFAULT_CHUNK_OVERLAP_TOKENS,
+                        help="Tokens of trailing text repeated at the start of the next part")
     parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--no-incremental", action="store_true",
+                        help="Re-extract all paragraphs after each 'show more' instead of only new ones")
+
+    # Page fetching
+    parser.add_argument("--fetcher", choices=FETCHER_MODES, default="browser",
+                        help="browser: Playwright; http: plain GET requests for server-rendered pages; "
+                             "auto: HTTP with fallback to the browser for JS-rendered content")
+    parser.add_argument("--next-url-template", type=str, default=None,
+                        help="URL of page N, e.g. 'http://site/doc/?page={page}' (HTTP fetching, parallel crawl)")
+    parser.add_argument("--parallel-pages", type=int, default=1,
+                        help="Load this many pages at once in the browser; needs --next-url-template")
+
+    # Resource blocking during crawl
+    parser.add_argument("--block-resource-types", type=str, default=",".join(DEFAULT_BLOCKED_TYPES),
+                        help="Comma-separated Playwright resource types to abort; '' to block none")
+    parser.add_argument("--block-domains", type=str, default="",
+                        help="Comma-separated extra domains to abort (added to the built-in tracker list)")
+    parser.add_argument("--allow-domains", type=str, default="",
+                        help="Comma-separated domains that are never blocked")
+    parser.add_argument("--block-third-party", action="store_true",
+                        help="Abort subresources from hosts other than the start URL's")
+    parser.add_argument("--no-resource-blocking", action="store_true",
+                        help="Load every resource, disable request interception")
 
     # Qdrant connection
     parser.add_argument("--qdrant-url", type=str, default=None)
     parser.add_argument("--qdrant-host", type=str, default=None)
     parser.add_argument("--qdrant-port", type=int, default=None)
     parser.add_argument("--qdrant-grpc-port", type=int, default=None)
-    
 
     parser.add_argument("--collection-prefix", type=str, default="docs_")
-    parser.add_argument("--no-recreate", action="store_true", help="Do not delete previous chunks for the doc")
 
-    args = parser.parse_args()
+    # Collection storage and indexing
+    parser.add_argument("--collection-profile", choices=sorted(COLLECTION_PROFILES), default=DEFAULT_COLLECTION_PROFILE,
+                        help="plain: Qdrant defaults; bulk: build HNSW after the load; "
+                             "low-memory: bulk + on-disk vectors + int8 quantization")
+    parser.add_argument("--on-disk-vectors", action="store_true", help="Keep original vectors on disk")
+    parser.add_argument("--int8-quantization", action="store_true", help="Add int8 scalar quantization (kept in RAM)")
+    parser.add_argument("--hnsw-m", type=int, default=None, help="HNSW graph degree (Qdrant default: 16)")
+    parser.add_argument("--hnsw-ef-construct", type=int, default=None,
+                        help="HNSW build-time beam width (Qdrant default: 100)")
+    parser.add_argument("--no-recreate", action="store_true",
+                        help="Synchronize the existing collection: upsert only changed articles, delete vanished ones")
+
+    # Pipelined ingestion
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Run crawl, chunk, embed and upsert as concurrent stages")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Max pages buffered between pipeline stages")
+
+    # Dense embedding batching
+    parser.add_argument("--embed-batch-tokens", type=int, default=DEFAULT_EMBED_BATCH_TOKENS,
+                        help="Max padded tokens (batch size x longest chunk) per FRIDA call")
+    parser.add_argument("--embed-max-delay", type=float, default=DEFAULT_EMBED_MAX_DELAY_S,
+                        help="Seconds a chunk may wait for more chunks before it is embedded")
+
+    # Dense model runtime
+    parser.add_argument("--embedding-backend", choices=DENSE_BACKENDS, default="torch",
+                        help="torch: sentence-transformers; onnx: ONNX Runtime export; onnx-int8: quantized export")
+    parser.add_argument("--onnx-cache-dir", type=str, default=DEFAULT_ONNX_CACHE_DIR,
+                        help="Directory of exported ONNX models")
+    parser.add_argument("--embedding-threads", type=int, default=None,
+                        help="Intra-op threads of the dense model (default: runtime's choice)")
+    parser.add_argument("--embedding-workers", type=int, default=1,
+                        help="Embed in this many processes, each with its own model copy pinned to its own cores")
+
+    # Bulk upload to Qdrant
+    parser.add_argument("--upsert-batch-size", type=int, default=DEFAULT_UPSERT_BATCH_SIZE,
+                        help="Points per upsert request")
+    parser.add_argument("--upsert-parallel", type=int, default=DEFAULT_UPSERT_PARALLEL,
+                        help="Upsert requests in flight at once")
+    parser.add_argument("--upsert-wait", action="store_true",
+                        help="Wait until Qdrant has applied each upsert, not just logged it")
+
+    # Raw page cache and offline replay
+    parser.add_argument("--page-cache-dir", type=str, default=None,
+                        help=f"Record crawled pages in this on-disk store (e.g. {DEFAULT_PAGE_CACHE_DIR}); off by default")
+    parser.add_argument("--replay", action="store_true",
+                        help="Read pages from --page-cache-dir instead of crawling (start_url is ignored)")
+
+    # Embedding cache
+    parser.add_argument("--embedding-cache-dir", type=str, default=None,
+                        help=f"Keep dense and sparse vectors in a persistent cache in this directory "
+                             f"(e.g. {DEFAULT_EMBEDDING_CACHE_DIR}); off by default")
+    parser.add_argument("--embedding-cache-max-mb", type=int, default=DEFAULT_EMBEDDING_CACHE_MAX_MB,
+                        help="Size limit of the embedding cache; least recently used vectors are evicted")
+
+    # Checkpoint / resume
+    parser.add_argument("--checkpoint-dir", type=str, default=None,
+                        help=f"Save per-document crawl checkpoints in this directory (e.g. {DEFAULT_CHECKPOINT_DIR}); "
+                             f"off by default")
+    parser.add_argument("--checkpoint-every", type=int, default=10,
+                        help="Save a checkpoint every N pages (with --checkpoint-dir); 0 disables checkpoints")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted ingest from its last checkpoint")
+
+    # Per-stage metrics
+    parser.add_argument("--metrics-file", type=str, default=None,
+                        help="Append each document's JSON metrics summary to this file")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on http://0.0.0.0:PORT/metrics while ingesting")
+
+
+
+def _check_ingest_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Reject option combinations that ingest_document_to_qdrant would not honour."""
+    if args.replay and not args.page_cache_dir:
+        parser.error("--replay requires --page-cache-dir")
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume requires --checkpoint-dir")
+    if args.resume and args.checkpoint_every <= 0:
+        parser.error("--resume requires checkpoints: --checkpoint-every must be positive")
+
+
+def _ingest_kwargs(args: argparse.Namespace) -> dict:
+    """Map parsed options onto ingest_document_to_qdrant arguments (option groups and run settings)."""
+    resource_policy = None
+    if not args.no_resource_blocking:
+        resource_policy = ResourcePolicy(
+            blocked_types=frozenset(_csv_list(args.block_resource_types)),
+            blocked_domains=DEFAULT_BLOCKED_DOMAINS + tuple(_csv_list(args.block_domains)),
+            allowed_domains=tuple(_csv_list(args.allow_domains)),
+            block_third_party=args.block_third_party,
+        )
+
+    profile = COLLECTION_PROFILES[args.collection_profile]
+    profile = dataclasses.replace(
+        profile,
+        on_disk=profile.on_disk or args.on_disk_vectors,
+        int8=profile.int8 or args.int8_quantization,
+        hnsw_m=args.hnsw_m if args.hnsw_m is not None else profile.hnsw_m,
+        hnsw_ef_construct=args.hnsw_ef_construct if args.hnsw_ef_construct is not None else profile.hnsw_ef_construct,
+    )
+
+    return dict(
+        crawl=CrawlOptions(
+            next_selector=args.next_selector,
+            next_text=args.next_text,
+            content_selector=args.content_selector,
+            headless=args.headless,
+            max_pages=args.max_pages,
+            incremental=not args.no_incremental,
+            resource_policy=resource_policy,
+            fetcher=args.fetcher,
+            next_url_template=args.next_url_template,
+            parallel_pages=args.parallel_pages,
+            page_cache_dir=args.page_cache_dir,
+            replay=args.replay,
+        ),
+        chunking=ChunkOptions(
+            article_regex=(args.article_regex if args.article_regex else None),
+            disable_article_grouping=args.no_article_grouping,
+            max_chunk_tokens=(args.max_chunk_tokens or None),
+            chunk_overlap_tokens=args.chunk_overlap_tokens,
+        ),
+        embedding=EmbeddingOptions(
+            backend=args.embedding_backend,
+            onnx_cache_dir=args.onnx_cache_dir,
+            threads=args.embedding_threads,
+            workers=args.embedding_workers,
+            batch_tokens=args.embed_batch_tokens,
+            max_delay=args.embed_max_delay,
+            cache_dir=args.embedding_cache_dir,
+            cache_max_mb=args.embedding_cache_max_mb,
+        ),
+        storage=StorageOptions(
+            qdrant_url=args.qdrant_url,
+            qdrant_host=args.qdrant_host,
+            qdrant_port=args.qdrant_port,
+            recreate=not args.no_recreate,
+            collection_profile=profile,
+            upsert_batch_size=args.upsert_batch_size,
+            upsert_parallel=args.upsert_parallel,
+            upsert_wait=args.upsert_wait,
+        ),
+        pipelined=args.pipelined,
+        queue_size=args.queue_size,
+        checkpoint_dir=(args.checkpoint_dir if args.checkpoint_every > 0 else None),
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        metrics_file=args.metrics_file,
+    )
+
 
+def _single_main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="Parse a doc and ingest paragraphs into Qdrant")
+    parser.add_argument("doc_id", help="Unique document id for collection naming and payload")
+    parser.add_argument("start_url", help="Start URL")
+    _add_ingest_arguments(parser)
+    args = parser.parse_args(argv)
+    _check_ingest_arguments(parser, args)
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    started = time.perf_counter()
+    from app.ingest import ingest_document_to_qdrant
+
+    STARTUP.record("imports", time.perf_counter() - started)
     ingest_document_to_qdrant(
         doc_id=args.doc_id,
         start_url=args.start_url,
-        recreate=not args.no_recreate,
-        next_selector=args.next_selector,
-        next_text=args.next_text,
-        headless=args.headless,
-        max_pages=args.max_pages,
-        content_selector=args.content_selector,
-        article_regex=(args.article_regex if args.article_regex else None),
-        disable_article_grouping=args.no_article_grouping,
-        qdrant_url=args.qdrant_url,
-        qdrant_host=args.qdrant_host,
-        qdrant_port=args.qdrant_port,
+        **_ingest_kwargs(args),
     )
 
 
+def _batch_main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="Ingest every document of a JSONL/CSV manifest with a shared browser and models",
+    )
+    parser.add_argument("manifest", help="JSONL or CSV file with doc_id, start_url and optional overrides")
+    parser.add_argument("--concurrency", type=int, default=2, help="Documents crawled at the same time")
+    parser.add_argument("--per-host-limit", type=int, default=2, help="Max concurrent documents per host")
+    _add_ingest_arguments(parser)
+    args = parser.parse_args(argv)
+    _check_ingest_arguments(parser, args)
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    started = time.perf_counter()
+    from app.batch import ingest_manifest, load_manifest
+
+    STARTUP.record("imports", time.perf_counter() - started)
+    results = ingest_manifest(
+        load_manifest(args.manifest),
+        concurrency=args.concurrency,
+        per_host_limit=args.per_host_limit,
+        **_ingest_kwargs(args),
+    )
+    if not all(r.ok for r in results):
+        sys.exit(1)
+
+
+def _query_main(argv: List[str]) -> None:
+    from app.query import (
+        DEFAULT_PREFETCH_LIMIT,
+        DEFAULT_QUERY_CACHE_SIZE,
+        DEFAULT_QUERY_CACHE_TTL_S,
+        DEFAULT_QUERY_LIMIT,
+        HybridSearcher,
+        serve,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="main.py query",
+        description="Hybrid (dense + sparse, RRF) search over an ingested document, or an HTTP search endpoint",
+    )
+    parser.add_argument("doc_id", nargs="?", help="Document (collection) to search; not needed with --serve")
+    parser.add_argument("text", nargs="?", help="Query text; not needed with --serve")
+    parser.add_argument("--limit", type=int, default=DEFAULT_QUERY_LIMIT)
+    parser.add_argument("--article", type=str, default=None, help="Only chunks of this article number")
+    parser.add_argument("--chapter", type=str, default=None, help="Only chunks of this chapter number")
+    parser.add_argument("--prefetch-limit", type=int, default=DEFAULT_PREFETCH_LIMIT,
+                        help="Candidates per dense/sparse search before fusion")
+    parser.add_argument("--serve", action="store_true", help="Serve GET /search and /stats over HTTP")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_QUERY_CACHE_SIZE,
+                        help="Cached query embeddings and result lists")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_QUERY_CACHE_TTL_S,
+                        help="Seconds a cached result list stays valid")
+    parser.add_argument("--qdrant-url", type=str, default=None)
+    parser.add_argument("--qdrant-host", type=str, default=None)
+    parser.add_argument("--qdrant-port", type=int, default=None)
+    parser.add_argument("--embedding-backend", choices=DENSE_BACKENDS, default="torch")
+    parser.add_argument("--onnx-cache-dir", type=str, default=DEFAULT_ONNX_CACHE_DIR)
+    parser.add_argument("--embedding-threads", type=int, default=None)
+    args = parser.parse_args(argv)
+    if not args.serve and not (args.doc_id and args.text):
+        parser.error("doc_id and text are required unless --serve is given")
+
+    from langchain_qdrant import FastEmbedSparse
+
+    searcher = HybridSearcher(
+        connect(args.qdrant_url, args.qdrant_host, args.qdrant_port),
+        make_dense_embeddings(args.embedding_backend, onnx_cache_dir=args.onnx_cache_dir, threads=args.embedding_threads),
+        FastEmbedSparse(model_name="Qdrant/bm25"),
+        prefetch_limit=args.prefetch_limit,
+        cache_size=args.cache_size,
+        cache_ttl_s=args.cache_ttl,
+    )
+    searcher.warm_up()
+    if args.serve:
+        serve(searcher, host=args.host, port=args.port)
+        return
+    hits = searcher.search(
+        args.doc_id, args.text, limit=args.limit, article_number=args.article, chapter_number=args.chapter
+    )
+    print(json.dumps(hits, ensure_ascii=False, indent=2))
+    logger.info(f"Время запроса: {searcher.latency.summary()['p50_ms']} мс")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["batch"]:
+        _batch_main(argv[1:])
+    elif argv[:1] == ["query"]:
+        _query_main(argv[1:])
+    else:
+        _single_main(argv)
+
+
 if __name__ == "__main__":
     main()
 
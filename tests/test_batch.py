@@ -0,0 +1,49 @@
+import threading
+import time
+
+from app.batch import BatchResult, _host, _run_per_host
+
+
+def _recording_run(delay_s=0.02):
+    lock = threading.Lock()
+    active = {}
+    peaks = {"total": 0}
+
+    def run(doc):
+        host = _host(doc["start_url"])
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peaks[host] = max(peaks.get(host, 0), active[host])
+            peaks["total"] = max(peaks["total"], sum(active.values()))
+        time.sleep(delay_s)
+        with lock:
+            active[host] -= 1
+        return BatchResult(doc["doc_id"], doc["start_url"], ok=True)
+
+    return run, peaks
+
+
+def _docs(host, count):
+    return [{"doc_id": f"{host}{idx}", "start_url": f"http://{host}/{idx}"} for idx in range(count)]
+
+
+def test_busy_host_does_not_hold_up_other_hosts():
+    documents = _docs("busy", 8) + [doc for idx in range(3) for doc in _docs(f"other{idx}", 1)]
+    run, peaks = _recording_run()
+    results = _run_per_host(documents, concurrency=4, per_host_limit=1, run=run)
+    assert [result.doc_id for result in results] == [doc["doc_id"] for doc in documents]
+    assert peaks["busy"] == 1
+    # The other hosts run next to the busy one instead of queueing behind it
+    assert peaks["total"] == 4
+
+
+def test_concurrency_caps_all_hosts():
+    documents = [doc for idx in range(6) for doc in _docs(f"host{idx}", 2)]
+    run, peaks = _recording_run()
+    results = _run_per_host(documents, concurrency=3, per_host_limit=2, run=run)
+    assert len(results) == len(documents)
+    assert peaks["total"] == 3
+
+
+def test_empty_manifest():
+    assert _run_per_host([], concurrency=2, per_host_limit=1, run=lambda doc: None) == []
@@ -0,0 +1,80 @@
+from app.checkpoint import Checkpoint, clear_checkpoint, load_checkpoint, save_checkpoint
+from app.ingest import _resume_position, _skip_pages
+
+
+def _checkpoint(pages_done, resume_url, resume_skip):
+    return Checkpoint(
+        doc_id="doc/1",
+        start_url="https://example.org/doc",
+        pages_done=pages_done,
+        resume_url=resume_url,
+        resume_skip=resume_skip,
+        chunker={"pages_done": pages_done},
+        seen_ids=["a", "b"],
+        uploaded=3,
+    )
+
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint = _checkpoint(5, "https://example.org/doc?page=5", 1)
+    save_checkpoint(str(tmp_path), checkpoint)
+    loaded = load_checkpoint(str(tmp_path), "doc/1")
+    assert loaded == checkpoint
+    assert loaded.saved_at
+    clear_checkpoint(str(tmp_path), "doc/1")
+    assert load_checkpoint(str(tmp_path), "doc/1") is None
+    # Clearing a missing checkpoint is not an error
+    clear_checkpoint(str(tmp_path), "doc/1")
+
+
+def test_resume_position_of_navigated_pages():
+    urls = ["u1", "u2", "u3"]
+    assert _resume_position(urls, 1) == ("u1", 1)
+    assert _resume_position(urls, 3) == ("u3", 1)
+
+
+def test_resume_position_skips_pages_sharing_a_url():
+    # "Show more" pages keep the URL they were expanded from
+    urls = ["u1", "u2", "u2", "u2", "u3"]
+    assert _resume_position(urls, 2) == ("u2", 1)
+    assert _resume_position(urls, 4) == ("u2", 3)
+    assert _resume_position(urls, 5) == ("u3", 1)
+
+
+def test_resume_position_without_url():
+    assert _resume_position(["u1", None], 2) is None
+
+
+def test_skip_pages():
+    assert list(_skip_pages([["a"], ["b"], ["c"]], 2)) == [["c"]]
+    assert list(_skip_pages([["a"]], 3)) == []
+    assert list(_skip_pages([["a"], ["b"]], 0)) == [["a"], ["b"]]
+
+
+def _crawl(site, checkpoint, stop):
+    """Pages 1..n consumed by one crawl (page n is site[n - 1]) and the URLs it recorded."""
+    page_offset = checkpoint.page_offset if checkpoint else 0
+    if checkpoint:
+        # The crawler re-opens resume_url and yields every page from there on
+        assert site.index(checkpoint.resume_url) == page_offset
+        pages = _skip_pages(range(page_offset + 1, len(site) + 1), checkpoint.resume_skip)
+    else:
+        pages = iter(range(1, len(site) + 1))
+    consumed = []
+    for page in pages:
+        consumed.append(page)
+        if page == stop:
+            break
+    return consumed, site[page_offset:]
+
+
+def test_resumed_crawl_continues_after_the_last_consumed_page():
+    site = ["u1", "u2", "u3", "u3", "u3", "u4", "u5"]
+    checkpoint = None
+    consumed = []
+    for stop in (4, 6, len(site)):
+        pages, crawl_urls = _crawl(site, checkpoint, stop)
+        consumed.extend(pages)
+        page_offset = checkpoint.page_offset if checkpoint else 0
+        checkpoint = _checkpoint(stop, *_resume_position(crawl_urls, stop - page_offset))
+    assert consumed == list(range(1, len(site) + 1))
@@ -0,0 +1,75 @@
+from app.chunking import ArticleSplitter
+
+
+def _count_words(text):
+    """One token per word and one per blank-line separator."""
+    return len(text.split()) + text.count("\n\n")
+
+
+def _words(prefix, n):
+    return " ".join(f"{prefix}{idx}" for idx in range(n))
+
+
+HEADING = "Статья 7. Порядок"
+
+
+def _split(paragraphs, max_tokens, overlap_tokens=0):
+    splitter = ArticleSplitter(max_tokens, overlap_tokens, count_tokens=_count_words)
+    return splitter.split("\n\n".join([HEADING] + paragraphs), HEADING)
+
+
+def _body(part):
+    assert part.startswith(HEADING + "\n\n")
+    return part[len(HEADING) + 2 :].split("\n\n")
+
+
+def test_text_that_fits_is_returned_unchanged():
+    text = "\n\n".join([HEADING, _words("a", 5)])
+    assert ArticleSplitter(100, count_tokens=_count_words).split(text, HEADING) == [text]
+
+
+def test_parts_fit_the_budget_including_separators():
+    paragraphs = [_words(f"p{idx}_", 4) for idx in range(30)]
+    parts = _split(paragraphs, max_tokens=20)
+    assert len(parts) > 1
+    assert all(_count_words(part) <= 20 for part in parts)
+    # Without overlap every paragraph lands in exactly one part, in order
+    assert [para for part in parts for para in _body(part)] == paragraphs
+
+
+def test_cuts_prefer_part_boundaries():
+    paragraphs = []
+    for number in range(1, 6):
+        paragraphs.append(f"{number}. " + _words(f"h{number}_", 3))
+        paragraphs.extend(_words(f"b{number}{idx}_", 3) for idx in range(2))
+    parts = _split(paragraphs, max_tokens=26)
+    assert len(parts) > 1
+    for part in parts:
+        assert _body(part)[0][0].isdigit()
+
+
+def test_consecutive_parts_share_trailing_paragraphs():
+    paragraphs = [_words(f"p{idx}_", 3) for idx in range(20)]
+    parts = _split(paragraphs, max_tokens=24, overlap_tokens=8)
+    assert all(_count_words(part) <= 24 for part in parts)
+    for previous, current in zip(parts, parts[1:]):
+        previous_body, current_body = _body(previous), _body(current)
+        shared = [para for para in current_body if para in previous_body]
+        assert shared and shared == previous_body[-len(shared) :]
+        assert sum(_count_words(para) for para in shared) + len(shared) - 1 <= 8
+        # Every part brings something new
+        assert len(shared) < len(current_body)
+    # Dropping the repeated paragraphs gives the article back
+    seen = []
+    for part in parts:
+        seen.extend(para for para in _body(part) if para not in seen)
+    assert seen == paragraphs
+
+
+def test_long_paragraph_is_cut_at_sentence_ends():
+    sentences = [f"{_words(f's{idx}_', 5)}." for idx in range(6)]
+    parts = _split([" ".join(sentences)], max_tokens=16)
+    assert len(parts) > 1
+    for part in parts:
+        assert _count_words(part) <= 16
+        assert _body(part)[0].endswith(".")
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.collection import COLLECTION_PROFILES, DEFAULT_INDEXING_THRESHOLD, bulk_load
+
+
+class _Client:
+    """Keeps the indexing threshold of one collection and records updates."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.updates = []
+
+    def get_collection(self, collection_name):
+        optimizer_config = SimpleNamespace(indexing_threshold=self.threshold)
+        return SimpleNamespace(config=SimpleNamespace(optimizer_config=optimizer_config))
+
+    def update_collection(self, collection_name, optimizers_config):
+        self.threshold = optimizers_config.indexing_threshold
+        self.updates.append(self.threshold)
+
+
+def test_bulk_load_restores_the_previous_threshold():
+    client = _Client(5000)
+    with bulk_load(client, "doc", COLLECTION_PROFILES["bulk"]):
+        assert client.threshold == 0
+    assert client.updates == [0, 5000]
+
+
+def test_bulk_load_restores_the_threshold_after_a_failure():
+    client = _Client(5000)
+    with pytest.raises(RuntimeError):
+        with bulk_load(client, "doc", COLLECTION_PROFILES["low-memory"]):
+            raise RuntimeError("boom")
+    assert client.threshold == 5000
+
+
+def test_bulk_load_repairs_a_collection_left_unindexed():
+    client = _Client(0)
+    with bulk_load(client, "doc", COLLECTION_PROFILES["bulk"]):
+        pass
+    assert client.threshold == DEFAULT_INDEXING_THRESHOLD
+
+
+def test_bulk_load_without_deferred_indexing_changes_nothing():
+    client = _Client(5000)
+    with bulk_load(client, "doc", COLLECTION_PROFILES["plain"]):
+        pass
+    assert client.updates == []
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.embedding_pool import EmbeddingPool
+
+
+class _FakeModel:
+    """Embeds a text as [len(text), 1.0]; "sleep:<s>" takes s seconds, "crash" kills the worker."""
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    @staticmethod
+    def _embed(text):
+        if text == "crash":
+            os._exit(3)
+        if text.startswith("sleep:"):
+            time.sleep(float(text[len("sleep:"):]))
+        return [float(len(text)), 1.0]
+
+
+def _fake_model():
+    return _FakeModel()
+
+
+def _shm_blocks():
+    shm = Path("/dev/shm")
+    return {entry.name for entry in shm.iterdir() if entry.name.startswith("psm_")} if shm.is_dir() else set()
+
+
+@pytest.fixture
+def pool():
+    pool = EmbeddingPool(2, cores=[0], model_factory=_fake_model)
+    yield pool
+    pool.close()
+
+
+def _run_in_thread(fn, *args):
+    outcome = {}
+
+    def _target():
+        try:
+            outcome["result"] = fn(*args)
+        except Exception as exc:  # noqa: BLE001 - inspected by the test
+            outcome["error"] = exc
+
+    thread = threading.Thread(target=_target)
+    thread.start()
+    return thread, outcome
+
+
+def _busy_worker(pool, timeout_s=10.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        with pool._lock:
+            if pool._in_flight:
+                return next(iter(pool._in_flight))
+        time.sleep(0.01)
+    raise AssertionError("no task was dispatched")
+
+
+def test_results_keep_input_order(pool):
+    texts = ["x" * (idx % 17 + 1) for idx in range(100)]
+    assert pool.embed_documents(texts) == [[float(len(text)), 1.0] for text in texts]
+    assert pool.embed_query("abc") == [3.0, 1.0]
+
+
+def test_killed_idle_worker_does_not_fail_other_calls(pool):
+    thread, outcome = _run_in_thread(pool.embed_documents, ["sleep:2.5"])
+    busy = _busy_worker(pool)
+    pool._processes[1 - busy].kill()
+    thread.join(timeout=15)
+    assert outcome == {"result": [[9.0, 1.0]]}
+    # The surviving worker keeps serving
+    assert pool.embed_query("abcd") == [4.0, 1.0]
+
+
+def test_killed_busy_worker_fails_only_its_call(pool):
+    thread, outcome = _run_in_thread(pool.embed_documents, ["sleep:30"])
+    busy = _busy_worker(pool)
+    pool._processes[busy].kill()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert pool.embed_query("ab") == [2.0, 1.0]
+
+
+def test_worker_crash_inside_a_call(pool):
+    with pytest.raises(RuntimeError, match="died"):
+        pool.embed_query("crash")
+    assert pool.embed_documents(["a", "bb"]) == [[1.0, 1.0], [2.0, 1.0]]
+
+
+def test_all_workers_dead_fails_new_calls(pool):
+    for process in pool._processes:
+        process.kill()
+        process.join()
+    time.sleep(1.5)
+    with pytest.raises(RuntimeError, match="died"):
+        pool.embed_query("a")
+
+
+def test_shared_memory_blocks_are_unlinked():
+    before = _shm_blocks()
+    with EmbeddingPool(2, cores=[0], model_factory=_fake_model) as pool:
+        pool.embed_documents(["t" * idx for idx in range(1, 200)])
+        # A result that arrives after its caller was failed must not leak its block
+        thread, outcome = _run_in_thread(pool.embed_documents, ["sleep:0.5"])
+        _busy_worker(pool)
+        pool._fail_pending("test")
+        thread.join(timeout=10)
+        assert isinstance(outcome.get("error"), RuntimeError)
+        time.sleep(1.0)
+    assert _shm_blocks() - before == set()
@@ -0,0 +1,49 @@
+import httpx
+
+from app.http_fetcher import iterate_page_paragraphs_http, parse_paragraphs_html
+from app.parser import END_OF_DOCUMENT
+
+
+def _site(pages, requested):
+    """Pages addressed by ?page=N; out-of-range numbers serve the last page again."""
+
+    def handler(request):
+        requested.append(str(request.url))
+        number = min(int(request.url.params.get("page", "1")), pages)
+        link = f'<a class="next" href="?page={number + 1}">Следующая</a>' if number < pages else ""
+        return httpx.Response(200, text=f'<div class="body"><p>Страница {number}.</p></div>{link}')
+
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def _crawl(client, ends, **kwargs):
+    return list(
+        iterate_page_paragraphs_http(
+            "http://site/doc?page=1",
+            next_selector=".next",
+            content_selector=".body",
+            next_url_template="http://site/doc?page={page}",
+            client=client,
+            on_end=ends.append,
+            **kwargs,
+        )
+    )
+
+
+def test_template_crawl_ends_at_the_page_without_next_control():
+    requested, ends = [], []
+    pages = _crawl(_site(3, requested), ends)
+    assert pages == [["Страница 1."], ["Страница 2."], ["Страница 3."]]
+    assert ends == [END_OF_DOCUMENT]
+    assert len(requested) == 3
+
+
+def test_template_crawl_stops_at_max_pages():
+    requested, ends = [], []
+    assert len(_crawl(_site(5, requested), ends, max_pages=2)) == 2
+    assert ends == ["max_pages"]
+
+
+def test_line_breaks_are_kept_like_inner_text():
+    html = '<div class="body"><p> Первая  строка <br> вторая <b>стро</b>ка<br></p><p> </p></div>'
+    assert parse_paragraphs_html(html, ".body") == ["Первая строка\nвторая строка"]
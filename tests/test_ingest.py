@@ -0,0 +1,108 @@
+import re
+import uuid
+
+from app.chunking import ArticleSplitter
+from app.ingest import _iterate_chunk_batches, _merge_page_seam, _split_long_chunks, point_id
+
+
+def test_point_id_is_a_stable_uuid():
+    first = point_id("doc", "2", "7")
+    assert str(uuid.UUID(first)) == first
+    assert point_id("doc", "2", "7") == first
+
+
+def test_point_id_depends_on_every_key_part():
+    base = point_id("doc", "2", "7")
+    assert point_id("other", "2", "7") != base
+    assert point_id("doc", "3", "7") != base
+    assert point_id("doc", "2", "8") != base
+    assert point_id("doc", "2", "7", occurrence=2) != base
+    assert point_id("doc", "2", "7", part_index=1) != base
+    assert point_id("doc", "2", "7", part_index=1) != point_id("doc", "2", "7", part_index=2)
+
+
+def test_point_id_fields_do_not_run_together():
+    assert point_id("doc", "12", None) != point_id("doc", "1", "2")
+    assert point_id("doc", None, None) == point_id("doc", "", "")
+
+
+def _count_words(text):
+    return len(text.split()) + text.count("\n\n")
+
+
+_SPLITTER = ArticleSplitter(12, count_tokens=_count_words)
+_LONG_ARTICLE = ["Статья 1. Длинная"] + [f"Абзац {idx} первой статьи." for idx in range(8)]
+_SHORT_ARTICLE = ["Статья 2. Короткая", "Один абзац."]
+
+
+def test_split_long_chunks_numbers_parts_from_one():
+    texts, payloads = _split_long_chunks(
+        ["\n\n".join(_LONG_ARTICLE), "\n\n".join(_SHORT_ARTICLE)],
+        [{"article_number": "1"}, {"article_number": "2"}],
+        _SPLITTER,
+    )
+    count = len(texts) - 1
+    assert count > 1
+    assert [payload.get("part_index") for payload in payloads] == [*range(1, count + 1), None]
+    assert all(payload["part_count"] == count for payload in payloads[:-1])
+    assert "part_count" not in payloads[-1]
+
+
+def test_chunk_ids_of_split_article():
+    pages = [_LONG_ARTICLE, _SHORT_ARTICLE]
+    batches = _iterate_chunk_batches(pages, re.compile(r"^Статья\s+\d+"), "doc", splitter=_SPLITTER)
+    ids = [chunk_id for batch in batches for chunk_id in batch.ids]
+    parts = len(ids) - 1
+    assert ids == [point_id("doc", None, "1", part_index=idx) for idx in range(1, parts + 1)] + [
+        point_id("doc", None, "2")
+    ]
+    # Parts get IDs of their own: the point of the article before it was split is replaced
+    assert point_id("doc", None, "1") not in ids
+
+
+def test_page_seam_joins_hyphenated_word():
+    previous = ["Первый абзац.", "Настоящий порядок приме-"]
+    rest = _merge_page_seam(previous, ["няется с 1 января.", "Второй абзац."])
+    assert previous == ["Первый абзац.", "Настоящий порядок применяется с 1 января."]
+    assert rest == ["Второй абзац."]
+
+
+def test_page_seam_joins_continued_sentence():
+    previous = ["Настоящий порядок применяется к организациям,"]
+    rest = _merge_page_seam(previous, ["указанным в статье 3.", "Второй абзац."])
+    assert previous == ["Настоящий порядок применяется к организациям, указанным в статье 3."]
+    assert rest == ["Второй абзац."]
+
+
+def test_page_seam_joins_word_split_between_letters():
+    previous = ["Настоящий порядок приме"]
+    _merge_page_seam(previous, ["няется с 1 января."])
+    assert previous == ["Настоящий порядок применяется с 1 января."]
+
+
+def test_page_seam_keeps_paragraph_after_terminator():
+    previous = ["Первый абзац."]
+    page = ["Второй абзац.", "Третий абзац."]
+    assert _merge_page_seam(previous, page) == ["Второй абзац.", "Третий абзац."]
+    assert previous == ["Первый абзац."]
+
+
+def test_page_seam_trims_repeated_overlap():
+    tail = "Порядок применяется ко всем организациям, указанным в статье 3."
+    previous = ["Первый абзац. " + tail]
+    rest = _merge_page_seam(previous, [tail + " Второе предложение.", "Следующий абзац."])
+    assert rest == [" Второе предложение.", "Следующий абзац."]
+    assert previous == ["Первый абзац. " + tail]
+
+
+def test_page_seam_drops_head_that_is_only_overlap():
+    tail = "Порядок применяется ко всем организациям, указанным в статье 3."
+    previous = [tail]
+    assert _merge_page_seam(previous, [tail, "Следующий абзац."]) == ["Следующий абзац."]
+
+
+def test_page_seam_with_an_empty_side_changes_nothing():
+    previous = ["Абзац без точки"]
+    assert _merge_page_seam(previous, []) == []
+    assert _merge_page_seam([], ["Абзац."]) == ["Абзац."]
+    assert previous == ["Абзац без точки"]
@@ -0,0 +1,30 @@
+import pytest
+
+from app.options import ChunkOptions, CrawlOptions, EmbeddingOptions, StorageOptions, fold_legacy_options
+
+
+def test_missing_groups_get_defaults():
+    crawl = CrawlOptions(max_pages=3)
+    assert fold_legacy_options(crawl, None, None, None, {}) == (
+        crawl,
+        ChunkOptions(),
+        EmbeddingOptions(),
+        StorageOptions(),
+    )
+
+
+def test_flat_keywords_of_the_old_signature_still_apply():
+    legacy = {"max_pages": 5, "max_chunk_tokens": 64, "embedding_workers": 2, "recreate": False}
+    with pytest.warns(DeprecationWarning, match="embedding_workers"):
+        crawl, chunking, embedding, storage = fold_legacy_options(
+            CrawlOptions(headless=True), None, None, None, legacy
+        )
+    assert (crawl.max_pages, crawl.headless) == (5, True)
+    assert chunking.max_chunk_tokens == 64
+    assert embedding.workers == 2
+    assert storage.recreate is False
+
+
+def test_unknown_keyword_is_rejected():
+    with pytest.raises(TypeError, match="max_page"):
+        fold_legacy_options(None, None, None, None, {"max_page": 5})